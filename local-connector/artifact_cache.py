@@ -0,0 +1,228 @@
+"""
+Disk-backed, content-addressed cache for converted PDFs, transformed
+variants and small derived values such as page counts.
+
+Entries are keyed by a hash of the source file's contents plus the options
+that produced them, so the same class notes uploaded by many students are
+converted once. The cache keeps to a byte budget by evicting the least
+recently used entries, never removing an entry a job is still printing, and
+can optionally expire entries a fixed time after they were created.
+
+The folder itself is the index: entries only appear under their final name
+through an atomic rename, a file's mtime is its creation time and its atime
+its last use, so the cache survives restarts and crashes without a separate
+index file to keep consistent.
+"""
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_key(digest, *options):
+    """Cache key for something derived from the content `digest` with the given options."""
+    return hashlib.sha256('|'.join([digest, *map(str, options)]).encode()).hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, root, max_bytes, ttl=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict() # key -> (path, size, created_at), least recently used first
+        self._leases = collections.Counter()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        """Rebuilds the index from disk, oldest files first. Half-written files are removed."""
+        found = []
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                if '.tmp' in name:
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_atime, name.split('.')[0], path, stat.st_size, stat.st_mtime))
+        for _, key, path, size, created_at in sorted(found):
+            self._entries[key] = (path, size, created_at)
+            self.total_bytes += size
+        self.purge_expired()
+        self._evict()
+
+    def _path_for(self, key, suffix):
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    @contextlib.contextmanager
+    def _key_lock(self, key):
+        """Serializes producers of the same key so each artifact is built once."""
+        with self._lock:
+            lock, users = self._key_locks.get(key, (threading.Lock(), 0))
+            self._key_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._key_locks[key]
+                if users == 1:
+                    del self._key_locks[key]
+                else:
+                    self._key_locks[key] = (lock, users - 1)
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry[2] > self.ttl
+
+    def _lookup(self, key, lease):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry[0]) or (self._expired(entry, now) and not self._leases.get(key)):
+                del self._entries[key]
+                self.total_bytes -= entry[1]
+                expired_path = entry[0]
+                entry = None
+            else:
+                self._entries.move_to_end(key)
+                if lease:
+                    self._leases[key] += 1
+        if entry is None:
+            self._remove_file(expired_path)
+            return None
+        try:
+            os.utime(entry[0], (now, entry[2])) # Records the use in atime, keeping mtime as the creation time
+        except OSError:
+            pass
+        return entry[0]
+
+    def _remove_file(self, path):
+        try:
+            if os.path.exists(path): os.remove(path)
+        except OSError as e:
+            print(f"⚠️ Could not remove cached file {path}: {e}")
+
+    def purge_expired(self):
+        """Removes entries older than the TTL. Returns how many were removed."""
+        if self.ttl is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if self._expired(entry, now) and not self._leases.get(key)]
+            removed = [self._entries.pop(key) for key in expired]
+            self.total_bytes -= sum(entry[1] for entry in removed)
+        for entry in removed:
+            self._remove_file(entry[0])
+        return len(removed)
+
+    def _store(self, key, tmp_path, suffix, lease):
+        path = self._path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        size = stat.st_size
+        with self._lock:
+            self._entries[key] = (path, size, stat.st_mtime)
+            self.total_bytes += size
+            if lease:
+                self._leases[key] += 1
+        self._evict()
+        return path
+
+    def _release(self, key):
+        with self._lock:
+            self._leases[key] -= 1
+            if self._leases[key] <= 0:
+                del self._leases[key]
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            victims = []
+            for key, (path, size, _) in self._entries.items():
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if self._leases.get(key):
+                    continue
+                victims.append(key)
+                self.total_bytes -= size
+            removed = [self._entries.pop(key)[0] for key in victims]
+        for path in removed:
+            self._remove_file(path)
+
+    @contextlib.contextmanager
+    def get_or_create(self, key, producer, suffix='.pdf'):
+        """
+        Yields the path of the cached file for `key`, calling producer(tmp_path)
+        to build it on a miss. The file is protected from eviction until the
+        with-block exits, so it can be handed straight to the printer.
+        """
+        path = self._lookup(key, lease=True)
+        if path is None:
+            with self._key_lock(key):
+                path = self._lookup(key, lease=True) # Another worker may have just built it
+                if path is None:
+                    self.misses += 1
+                    # Keep the real suffix last; some converters pick the format from it.
+                    tmp_path = self._path_for(key, f".{uuid.uuid4().hex}.tmp{suffix}")
+                    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+                    try:
+                        producer(tmp_path)
+                        path = self._store(key, tmp_path, suffix, lease=True)
+                    finally:
+                        if os.path.exists(tmp_path): os.remove(tmp_path)
+                else:
+                    self.hits += 1
+        else:
+            self.hits += 1
+        try:
+            yield path
+        finally:
+            self._release(key)
+
+    def get_or_create_value(self, key, producer):
+        """Returns a small JSON value for `key`, calling producer() to compute it on a miss."""
+        path = self._lookup(key, lease=False)
+        if path is None:
+            with self._key_lock(key):
+                path = self._lookup(key, lease=False)
+                if path is None:
+                    self.misses += 1
+                    value = producer()
+                    tmp_path = self._path_for(key, f".{uuid.uuid4().hex}.tmp.json")
+                    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(value, f)
+                    self._store(key, tmp_path, '.json', lease=False)
+                    return value
+        self.hits += 1
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError): # Evicted or damaged between lookup and read
+            return producer()
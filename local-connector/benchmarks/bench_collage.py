@@ -0,0 +1,52 @@
+"""
+Compares the raster and vector collage renderers on file size and render
+time for every layout.
+
+    python benchmarks/bench_collage.py [copies]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PIL import Image, ImageDraw
+
+from imaging import create_image_layout_pdf
+
+LAYOUTS = ['2-up', '4-up', '9-up', 'contact-sheet']
+
+
+def make_photo(path, width=4000, height=3000):
+    """A synthetic photo with gradients and shapes, so JPEG has real work to do."""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for n in range(40):
+        draw.ellipse((n * 90, n * 60, n * 90 + 600, n * 60 + 400), outline=(n * 6, 255 - n * 6, 120), width=12)
+    image.save(path, 'JPEG', quality=92)
+
+
+def main(copies=100):
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    try:
+        photo_path = os.path.join(work_dir, 'photo.jpg')
+        make_photo(photo_path)
+        print(f"{'layout':<14} {'fit':<8} {'mode':<7} {'seconds':>8} {'size (KB)':>10}")
+        for layout_type in LAYOUTS:
+            for fit in ('contain', 'cover'):
+                for mode in ('raster', 'vector'):
+                    output_path = os.path.join(work_dir, f"{layout_type}_{fit}_{mode}.pdf")
+                    started = time.perf_counter()
+                    create_image_layout_pdf(photo_path, copies, {'type': layout_type, 'fit': fit}, 'color',
+                                            'portrait', output_path, render_mode=mode)
+                    elapsed = time.perf_counter() - started
+                    size_kb = os.path.getsize(output_path) / 1024
+                    print(f"{layout_type:<14} {fit:<8} {mode:<7} {elapsed:>8.2f} {size_kb:>10.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
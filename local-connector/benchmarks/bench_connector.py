@@ -0,0 +1,212 @@
+"""
+Runs the whole connector offline on a synthetic workload and saves the
+results as JSON, so runs can be compared over time.
+
+    python benchmarks/bench_connector.py [jobs] [jobs_per_minute] [results.json]
+
+Synthetic PrintJob documents (see workload.py) are delivered to
+on_new_job_snapshot() as the Firestore listener would, at random arrival
+times. Behind the connector's own code run in-process fakes: FakeFirestore
+for job documents, leases and status writes, FakeDriveSource for Drive,
+FakeConverter for Word and SimulatedPrinter for the printers. Client and
+Windows libraries that aren't installed are replaced by empty stubs
+(install_import_stubs), so it runs on Linux and macOS too. Jobs run through
+the real journal, outbox, dispatcher, pipeline, caches, CPU pool and spool
+merging.
+
+Reports jobs per minute, end-to-end latency percentiles (from the snapshot
+to the final status reaching Firestore), per-stage percentiles, peak RSS of
+the connector process and peak disk used by its temp files and caches.
+"""
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from fakes import FakeDocumentChange, FakeFirestore, FakeFirestoreModule, install_import_stubs
+from workload import Workload
+
+install_import_stubs() # Before local_connector is imported, on machines without Firebase, the Drive client or pywin32
+
+PRINTERS = [('front-desk', 'Front Desk'), ('back-office', 'Back Office')]
+CAPABILITIES = ['bw', 'color', 'A4', 'A3', 'duplex', 'single-sided']
+FIRESTORE_LATENCY = 0.02 # seconds per request
+CONVERT_SECONDS = 0.5 # per Word document
+PAGES_PER_MINUTE = 600
+PRINTER_WARMUP_SECONDS = 0.3
+FINAL_STATUSES = ('completed', 'reprint-completed', 'page-count-completed', 'error')
+SAMPLE_INTERVAL = 0.05 # seconds between samples of job statuses, memory and disk
+
+
+def peak_rss_bytes():
+    """Peak resident memory of this process, or None where it can't be read."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset # Windows
+    except (ImportError, AttributeError):
+        return None
+
+
+def disk_usage(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass # Removed while walking
+    return total
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+    return {f"p{int(q * 100)}": round(values[min(len(values) - 1, int(q * len(values)))], 3) for q in (0.5, 0.95, 0.99)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=False).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def start_connector(lc, db, work_dir):
+    """Starts the connector as main() does, with fakes for every outside service. Returns the Connector."""
+    from converters import FakeConverter
+    from drive_store import DriveFileStore, FakeDriveSource
+    from print_backends import SimulatedPrinter
+
+    os.chdir(work_dir) # The connector keeps its files relative to the working directory
+    lc.firestore = FakeFirestoreModule
+    connector = lc.Connector(
+        db=db,
+        drive_store=DriveFileStore(FakeDriveSource(os.path.join(work_dir, 'drive')),
+                                   lc.ArtifactCache(lc.DRIVE_CACHE_DIR, lc.DRIVE_CACHE_MAX_BYTES)),
+        print_backend=SimulatedPrinter(pages_per_minute=PAGES_PER_MINUTE, warmup_seconds=PRINTER_WARMUP_SECONDS, timeout=None),
+        converter_factory=lambda: FakeConverter(convert_seconds=CONVERT_SECONDS),
+        listen=False,
+    )
+    connector.start()
+    for printer_id, name in PRINTERS:
+        lc.printer_router.set_printer(printer_id, name, CAPABILITIES)
+    return connector
+
+
+def run(jobs, jobs_per_minute, work_dir, seed=1):
+    import local_connector as lc
+
+    workload = Workload(os.path.join(work_dir, 'drive'), PRINTERS, seed=seed)
+    workload_jobs = workload.jobs(jobs)
+    db = FakeFirestore(latency=FIRESTORE_LATENCY)
+    for job_id, job_data in workload_jobs:
+        db.docs[('print_jobs', job_id)] = dict(job_data)
+    connector = start_connector(lc, db, work_dir)
+
+    delivered, finished = {}, {}
+    peaks = {'temp_bytes': 0, 'disk_bytes': 0}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            now = time.perf_counter()
+            for job_id, doc in db.documents('print_jobs').items():
+                if job_id in delivered and job_id not in finished and doc.get('status') in FINAL_STATUSES:
+                    finished[job_id] = (now, doc.get('status'))
+            peaks['temp_bytes'] = max(peaks['temp_bytes'], disk_usage(lc.TEMP_DIR))
+            peaks['disk_bytes'] = max(peaks['disk_bytes'], disk_usage(work_dir) - disk_usage(workload.drive_dir))
+            if len(finished) == len(workload_jobs):
+                return
+            time.sleep(SAMPLE_INTERVAL)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for job_id, job_data in workload_jobs:
+        time.sleep(rng.expovariate(jobs_per_minute / 60.0))
+        delivered[job_id] = time.perf_counter()
+        lc.on_new_job_snapshot(None, [FakeDocumentChange(job_id, dict(job_data))], None)
+    sampler.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    connector.stop()
+
+    latencies = {job_id: finished[job_id][0] - delivered[job_id] for job_id in finished}
+    print_latencies = [seconds for job_id, seconds in latencies.items() if job_id.startswith('job-')]
+    count_latencies = [seconds for job_id, seconds in latencies.items() if job_id.startswith('count-')]
+    statuses = {}
+    for _, status in finished.values():
+        statuses[status] = statuses.get(status, 0) + 1
+    stages = {}
+    for stage in ('queue_wait', 'download', 'convert', 'image', 'collage', 'inspect', 'transform', 'merge', 'spool', 'count'):
+        if lc.stage_seconds.count(stage=stage):
+            stages[stage] = {f"p{int(q * 100)}": round(lc.stage_seconds.quantile(q, stage=stage), 3) for q in (0.5, 0.95, 0.99)}
+    return {
+        'jobs': len(workload_jobs),
+        'seconds': round(elapsed, 2),
+        'jobs_per_minute': round(len(workload_jobs) / elapsed * 60, 1),
+        'statuses': statuses,
+        'print_job_latency': percentiles(print_latencies),
+        'page_count_latency': percentiles(count_latencies),
+        'stages': stages,
+        'pages_printed': lc.print_backend.pages_printed,
+        'spool_submissions': lc.print_backend.submissions,
+        'peak_rss_mb': round(peak_rss_bytes() / 2 ** 20, 1) if peak_rss_bytes() else None,
+        'peak_temp_mb': round(peaks['temp_bytes'] / 2 ** 20, 1),
+        'peak_disk_mb': round(peaks['disk_bytes'] / 2 ** 20, 1),
+        'firestore': db.stats(),
+        'startup_seconds': {phase: round(seconds, 3) for phase, seconds in lc.startup_seconds.items()},
+    }
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    jobs_per_minute = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    output = os.path.abspath(sys.argv[3]) if len(sys.argv) > 3 else None
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    cwd = os.getcwd()
+    try:
+        results = run(jobs, jobs_per_minute, work_dir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report = {
+        'benchmark': 'connector',
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'settings': {'jobs': jobs, 'jobs_per_minute': jobs_per_minute, 'firestore_latency': FIRESTORE_LATENCY,
+                     'convert_seconds': CONVERT_SECONDS, 'pages_per_minute': PAGES_PER_MINUTE,
+                     'printer_warmup_seconds': PRINTER_WARMUP_SECONDS, 'printers': len(PRINTERS)},
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
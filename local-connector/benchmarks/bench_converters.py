@@ -0,0 +1,63 @@
+"""
+Compares starting a converter for every document (the old behaviour) with
+reusing instances from a ConverterPool.
+
+    python benchmarks/bench_converters.py [fake|libreoffice] [documents]
+
+The fake backend simulates a 0.5 s start-up and a 50 ms conversion. The
+libreoffice backend converts real .txt files and needs soffice installed.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from converters import ConverterPool, FakeConverter, LibreOfficeConverter
+
+
+def make_factory(backend):
+    if backend == 'libreoffice':
+        return LibreOfficeConverter
+    return lambda: FakeConverter(startup_seconds=0.5, convert_seconds=0.05)
+
+
+def main(backend='fake', documents=10):
+    factory = make_factory(backend)
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    try:
+        inputs = []
+        for n in range(documents):
+            path = os.path.join(work_dir, f"doc_{n}.txt")
+            with open(path, 'w') as f:
+                f.write(f"Class notes, chapter {n}\n" * 200)
+            inputs.append(path)
+
+        started = time.perf_counter()
+        for path in inputs:
+            converter = factory()
+            converter.open()
+            try:
+                converter.convert(path, path + '.cold.pdf')
+            finally:
+                converter.close()
+        cold = time.perf_counter() - started
+
+        pool = ConverterPool(factory, size=1, max_conversions=50)
+        started = time.perf_counter()
+        for path in inputs:
+            pool.convert(path, path + '.pooled.pdf')
+        pooled = time.perf_counter() - started
+        pool.close()
+
+        print(f"Backend: {backend}, documents: {documents}")
+        print(f"New converter per document: {cold:.2f} s ({cold / documents * 1000:.0f} ms/doc)")
+        print(f"Pooled converter:           {pooled:.2f} s ({pooled / documents * 1000:.0f} ms/doc)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'fake', int(sys.argv[2]) if len(sys.argv) > 2 else 10)
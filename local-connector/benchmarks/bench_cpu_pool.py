@@ -0,0 +1,92 @@
+"""
+Compares running collages and image conversions on the print worker threads
+with running them in a CpuPool of worker processes.
+
+    python benchmarks/bench_cpu_pool.py [jobs] [processes]
+
+Each job renders a 9-up raster collage or converts a photo to PDF, on 4
+worker threads as in the connector. Meanwhile a heartbeat thread standing in
+for the Firestore listener wakes every 10 ms; the longest it waited shows how
+long the GIL was held away from it. Reports jobs per minute and that delay.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_collage import make_photo
+from cpu_pool import CpuPool
+from imaging import create_image_layout_pdf, image_to_pdf
+
+WORKER_THREADS = 4
+HEARTBEAT_SECONDS = 0.01
+
+
+class Heartbeat:
+    """Records how late a thread that sleeps HEARTBEAT_SECONDS at a time wakes up."""
+
+    def __init__(self):
+        self.max_delay = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            time.sleep(HEARTBEAT_SECONDS)
+            self.max_delay = max(self.max_delay, time.perf_counter() - started - HEARTBEAT_SECONDS)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run(pool, jobs, photo_path, work_dir):
+    def job(n):
+        output_path = os.path.join(work_dir, f"job-{n}.pdf")
+        if n % 2:
+            pool.run(image_to_pdf, photo_path, output_path)
+        else:
+            pool.run(create_image_layout_pdf, photo_path, 9, {'type': '9-up'}, 'color', 'portrait',
+                     output_path, render_mode='raster')
+
+    with Heartbeat() as heartbeat:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(WORKER_THREADS) as threads:
+            list(threads.map(job, range(jobs)))
+        elapsed = time.perf_counter() - started
+    return elapsed, heartbeat.max_delay
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else min(4, max((os.cpu_count() or 2) - 1, 1))
+    print(f"{jobs} jobs on {WORKER_THREADS} worker threads, {os.cpu_count()} CPU(s)")
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    try:
+        photo_path = os.path.join(work_dir, 'photo.jpg')
+        make_photo(photo_path)
+        for name, workers in (("threads", 0), (f"{processes} processes", processes)):
+            pool = CpuPool(workers)
+            started = time.perf_counter()
+            pool.start()
+            warm_up = time.perf_counter() - started
+            elapsed, max_delay = run(pool, jobs, photo_path, work_dir)
+            pool.close()
+            print(f"{name:<12} {jobs / elapsed * 60:7.1f} jobs/min, listener delayed up to {max_delay * 1000:6.1f} ms"
+                  + (f" (workers started in {warm_up:.2f}s)" if workers else ""))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
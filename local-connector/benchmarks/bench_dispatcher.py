@@ -0,0 +1,67 @@
+"""
+Replays a burst of ready jobs through the JobDispatcher against a fake
+Firestore and fake printers, and reports throughput and peak thread count.
+
+    python benchmarks/bench_dispatcher.py [jobs]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dispatcher import JobDispatcher
+from fakes import FakeDocumentChange, FakeFirestore, FakePrinter
+
+PRINTERS = ['HP_LaserJet_1', 'HP_LaserJet_2', 'Epson_Color']
+
+
+def main(job_count=500):
+    db = FakeFirestore()
+    printers = {name: FakePrinter(pages_per_minute=6000) for name in PRINTERS}
+    dispatcher = JobDispatcher(workers_per_printer=1, page_count_workers=2, max_queue_per_printer=20)
+    processed_jobs = set()
+    peak_threads = threading.active_count()
+
+    def process_job(job_id, job_data):
+        job_ref = db.collection('print_jobs').document(job_id)
+        job_ref.update({'status': 'printing'})
+        printers[job_data['printerId']].print_pages(job_data['pages'])
+        job_ref.update({'status': 'completed'})
+        processed_jobs.discard(job_id)
+
+    changes = []
+    for n in range(job_count):
+        job_id = f"job-{n:04d}"
+        job_data = {'status': 'ready', 'orderType': 'print', 'printerId': PRINTERS[n % len(PRINTERS)], 'pages': 1 + n % 5}
+        db.collection('print_jobs').document(job_id).set(job_data)
+        changes.append(FakeDocumentChange(job_id, job_data))
+
+    started = time.perf_counter()
+    # The same shape of loop as on_new_job_snapshot, fed one burst of changes.
+    for change in changes:
+        job_id, job_data = change.document.id, change.document.to_dict()
+        if job_id in processed_jobs:
+            continue
+        processed_jobs.add(job_id)
+        dispatcher.submit_print(job_data['printerId'], job_id, process_job, job_id, job_data)
+    listener_seconds = time.perf_counter() - started
+
+    while dispatcher.deferred_count() or any(p.depth() for p in dispatcher.pools()):
+        peak_threads = max(peak_threads, threading.active_count())
+        dispatcher.retry_deferred()
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    dispatcher.stop(timeout=1)
+
+    completed = sum(1 for (c, _), d in db.docs.items() if c == 'print_jobs' and d['status'] == 'completed')
+    print(f"Jobs: {job_count}, completed: {completed}")
+    print(f"Listener callback time: {listener_seconds * 1000:.1f} ms")
+    print(f"Wall time: {elapsed:.2f} s ({completed / elapsed * 60:.0f} jobs/min)")
+    print(f"Peak threads: {peak_threads}")
+    print(f"Max concurrent jobs on one printer: {max(p.max_concurrent for p in printers.values())}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,75 @@
+"""
+Compares one plain streaming GET (how MediaIoBaseDownload fetches a file)
+with the RangedDownloader against a local HTTP stand-in for Drive. Every
+connection is throttled, and a second round cuts off every few requests
+part-way through to show resuming instead of failing the job.
+
+    python benchmarks/bench_downloader.py [megabytes] [workers]
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import requests
+
+from fakes import FakeFileServer
+from ranged_download import RangedDownloader, make_session
+
+BYTES_PER_SECOND_PER_CONNECTION = 8 * 1024 * 1024
+PART_SIZE = 4 * 1024 * 1024
+DROP_EVERY = 3 # With faults, requests 1, 4, 7, ... are cut off
+DROP_AFTER = 1024 * 1024
+
+
+def single_stream(url, local_path):
+    """One GET read to the end; any interruption fails the download."""
+    md5 = hashlib.md5()
+    with requests.get(url, stream=True, timeout=(10, 60)) as response, open(local_path, 'wb') as f:
+        response.raise_for_status()
+        received = 0
+        for chunk in response.iter_content(256 * 1024):
+            f.write(chunk)
+            md5.update(chunk)
+            received += len(chunk)
+        if received != int(response.headers['Content-Length']):
+            raise Exception(f"connection closed after {received} bytes")
+    return md5.hexdigest()
+
+
+def run(name, fn, expected_md5):
+    started = time.perf_counter()
+    try:
+        ok = fn() == expected_md5
+        result = "ok" if ok else "CHECKSUM MISMATCH"
+    except Exception as e:
+        result = f"failed: {e}"
+    print(f"   {name:<22} {time.perf_counter() - started:6.2f} s   {result}")
+
+
+def main(megabytes=64, workers=4):
+    payload = os.urandom(megabytes * 1024 * 1024)
+    expected_md5 = hashlib.md5(payload).hexdigest()
+    local_path = os.path.join(tempfile.mkdtemp(prefix='printease_bench_'), 'download.pdf')
+    print(f"{megabytes} MB file, {BYTES_PER_SECOND_PER_CONNECTION // (1024 * 1024)} MB/s per connection, {workers} workers")
+
+    for faults in (False, True):
+        server = FakeFileServer(payload, BYTES_PER_SECOND_PER_CONNECTION,
+                                drop_every=DROP_EVERY if faults else 0, drop_after=DROP_AFTER)
+        print(f"{'with' if faults else 'without'} dropped connections:")
+        downloader = RangedDownloader(make_session(workers), workers=workers, part_size=PART_SIZE,
+                                      parallel_threshold=PART_SIZE, retry_backoff=0.05)
+        try:
+            run('single stream', lambda: single_stream(server.url, local_path), expected_md5)
+            run('ranged + resume', lambda: downloader.download(server.url, local_path, len(payload), expected_md5), expected_md5)
+            print(f"   ranged downloader resumed {downloader.retries} time(s); server cut {server.dropped} of {server.requests} requests")
+        finally:
+            server.close()
+    os.remove(local_path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 64, int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,103 @@
+"""
+Replays a timing trace through the wait time model and compares its error
+with the old flat estimate of AVG_SECONDS_PER_JOB per job.
+
+    python benchmarks/bench_estimator.py [timing_trace.jsonl] [queue_length]
+
+Without a trace file (the connector writes timing_trace.jsonl as it runs),
+a synthetic trace is generated from a simulated shop: quick test prints,
+class notes, duplex theses and photo collages on one printer. Every job is
+predicted before the model sees its timings, as it would be in production.
+"""
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from estimator import WaitTimeEstimator
+
+AVG_SECONDS_PER_JOB = 120 # The constant the model replaces
+SYNTHETIC_JOBS = 400
+
+
+def synthetic_file(rng):
+    roll = rng.random()
+    if roll < 0.35:
+        pages, kind, color, duplex = rng.randint(1, 5), 'pdf', rng.random() < 0.3, False
+    elif roll < 0.75:
+        pages, kind, color, duplex = rng.randint(10, 40), rng.choice(['pdf', 'word']), rng.random() < 0.2, rng.random() < 0.5
+    elif roll < 0.9:
+        pages, kind, color, duplex = rng.randint(100, 300), rng.choice(['pdf', 'word']), False, True
+    else:
+        pages, kind, color, duplex = rng.randint(1, 4), 'image', True, False
+    copies = rng.choice([1, 1, 1, 2, 3])
+    paper = 'A3' if rng.random() < 0.05 else 'A4'
+
+    # A 30 ppm mono / 15 ppm color printer, slower when duplexing or on A3
+    ppm = (15 if color else 30) / (1.3 if duplex else 1.0) / (2 if paper == 'A3' else 1)
+    spool = 6 + pages * copies * 60 / ppm
+    download = 0.5 + pages * 0.02
+    convert = {'pdf': 0.3, 'word': 3 + pages * 0.15, 'image': 1.5}[kind]
+    noise = lambda: rng.uniform(0.85, 1.15)
+    return {
+        'kind': kind, 'pageCount': pages, 'pages': pages * copies,
+        'printType': 'color' if color else 'bw', 'duplex': duplex, 'paperSize': paper,
+        'download': round(download * noise(), 3), 'convert': round(convert * noise(), 3), 'spool': round(spool * noise(), 3),
+    }
+
+
+def synthetic_trace(count, seed=7):
+    rng = random.Random(seed)
+    trace = []
+    for _ in range(count):
+        files = [synthetic_file(rng) for _ in range(rng.choice([1, 1, 1, 2, 3]))]
+        overhead = 4 + (12 if rng.random() < 0.2 else 0) # Status writes, sometimes a cover page
+        total = overhead + sum(max(f['spool'], f['download'] + f['convert']) for f in files)
+        trace.append({'printerId': 'bench-printer', 'files': files, 'total': round(total, 3)})
+    return trace
+
+
+def load_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def mean_absolute_error(pairs):
+    return sum(abs(predicted - actual) for predicted, actual in pairs) / max(len(pairs), 1)
+
+
+def main(trace_path=None, queue_length=5):
+    trace = load_trace(trace_path) if trace_path else synthetic_trace(SYNTHETIC_JOBS)
+    print(f"{len(trace)} jobs from {trace_path or 'a synthetic trace'}; queues of {queue_length} jobs")
+
+    estimator = WaitTimeEstimator()
+    job_model, job_constant, wait_model, wait_constant = [], [], [], []
+    for n, record in enumerate(trace):
+        printer_id = record.get('printerId')
+        # Per job: how long will this one take?
+        actual = record['total']
+        job_model.append((estimator.predict(printer_id, record['files']), actual))
+        job_constant.append((AVG_SECONDS_PER_JOB, actual))
+
+        # Per queue: when will the next few jobs on this printer be done?
+        queue = [r for r in trace[n:] if r.get('printerId') == printer_id][:queue_length]
+        if len(queue) == queue_length:
+            completions, _ = estimator.completion_times(printer_id, [(r['files'], None) for r in queue])
+            actual_done = sum(r['total'] for r in queue)
+            wait_model.append((completions[-1], actual_done))
+            wait_constant.append((queue_length * AVG_SECONDS_PER_JOB, actual_done))
+
+        estimator.observe(printer_id, record)
+
+    print(f"{'':<22}{'model':>10}{'constant':>10}")
+    print(f"{'job duration MAE':<22}{mean_absolute_error(job_model):>9.1f}s{mean_absolute_error(job_constant):>9.1f}s")
+    print(f"{'queue wait MAE':<22}{mean_absolute_error(wait_model):>9.1f}s{mean_absolute_error(wait_constant):>9.1f}s")
+    tail = len(trace) // 2
+    print(f"{'job MAE, second half':<22}{mean_absolute_error(job_model[tail:]):>9.1f}s{mean_absolute_error(job_constant[tail:]):>9.1f}s")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].isdigit() else None,
+         int(sys.argv[-1]) if len(sys.argv) > 1 and sys.argv[-1].isdigit() else 5)
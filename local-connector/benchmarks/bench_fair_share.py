@@ -0,0 +1,114 @@
+"""
+One printer, one customer who submits a lot at once and a stream of
+walk-ins with a few pages each: how long do the walk-ins wait?
+
+    python benchmarks/bench_fair_share.py [walk_ins] [milliseconds_per_second]
+
+Two loads: ten 400-page orders, and 150 five-page orders (a class's handouts
+sent one by one). Jobs run on the connector's own JobDispatcher, as sleeps
+of 2 s per page plus 8 s per submission, on a clock sped up so that one
+simulated second takes `milliseconds_per_second` (default 0.5). Unbound
+orders are sent in 100-page chunks when chunking is on, calling
+yield_turn() in between as process_print_job does. Compared:
+- shortest-expected-job-first alone, the connector's previous behaviour;
+- the same with chunked spooling;
+- fair share per customer (deficit round-robin) with and without chunks.
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dispatcher import JobDispatcher
+from pdf_transform import parse_page_range
+from spool_plan import plan_spool_chunks
+
+SECONDS_PER_PAGE = 2.0
+SECONDS_PER_SUBMISSION = 8.0
+LOADS = [('ten 400-page orders', 10, 400), ('150 five-page orders', 150, 5)]
+CHUNK_PAGES = 100
+QUANTUM = 60
+MAX_QUEUE = 20 # MAX_QUEUED_JOBS_PER_PRINTER; jobs beyond it are parked
+RETRY_INTERVAL = 1.0 # Simulated seconds between the main loop's retry_deferred() calls
+CONFIGURATIONS = [
+    ('sejf', None, 0),
+    ('sejf + chunks', None, CHUNK_PAGES),
+    ('fair share', QUANTUM, 0),
+    ('fair share + chunks', QUANTUM, CHUNK_PAGES),
+]
+
+
+def workload(walk_ins, heavy_orders, heavy_pages, seed=5):
+    """[(arrival second, customer, pages)]: the heavy orders at once, then walk-ins and a few class-notes jobs."""
+    rng = random.Random(seed)
+    jobs = [(0.0, 'heavy', heavy_pages) for _ in range(heavy_orders)]
+    clock = 0.0
+    for n in range(walk_ins):
+        clock += rng.expovariate(1 / 240) # One every four minutes on average
+        pages = rng.randint(20, 60) if rng.random() < 0.2 else rng.randint(1, 5)
+        jobs.append((clock, f"walk-in-{n}", pages))
+    return jobs
+
+
+def run(jobs, quantum, chunk_pages, scale):
+    dispatcher = JobDispatcher(workers_per_printer=1, max_queue_per_printer=MAX_QUEUE, fair_share_quantum=quantum)
+    finished = {}
+    started = time.monotonic()
+    done = threading.Event()
+
+    def main_loop():
+        while not done.wait(RETRY_INTERVAL * scale):
+            dispatcher.retry_deferred()
+
+    def now():
+        return (time.monotonic() - started) / scale
+
+    def print_job(n, pages):
+        for i, (page_range, copies) in enumerate(plan_spool_chunks(pages, 1, chunk_pages)):
+            chunk = len(parse_page_range(page_range, pages)) if page_range else pages
+            if i:
+                dispatcher.yield_turn('printer', SECONDS_PER_SUBMISSION + SECONDS_PER_PAGE * chunk)
+            time.sleep((SECONDS_PER_SUBMISSION + SECONDS_PER_PAGE * chunk) * scale)
+        finished[n] = now()
+
+    threading.Thread(target=main_loop, daemon=True).start()
+    for n, (arrival, customer, pages) in enumerate(jobs):
+        delay = arrival * scale - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+        expected = SECONDS_PER_SUBMISSION + SECONDS_PER_PAGE * pages
+        turn = SECONDS_PER_SUBMISSION + SECONDS_PER_PAGE * min(pages, chunk_pages) if chunk_pages else None
+        dispatcher.submit_print('printer', n, print_job, n, pages, expected_seconds=expected, enqueued_at=time.monotonic(),
+                                share_key=customer, turn_seconds=turn)
+    dispatcher.wait_idle(poll_interval=0.01)
+    done.set()
+    dispatcher.stop(timeout=1)
+    return {n: finished[n] - arrival for n, (arrival, _, _) in enumerate(jobs)}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    walk_ins = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    scale = (float(sys.argv[2]) if len(sys.argv) > 2 else 0.5) / 1000
+    for load, heavy_orders, heavy_pages in LOADS:
+        jobs = workload(walk_ins, heavy_orders, heavy_pages)
+        small = [n for n, (_, customer, pages) in enumerate(jobs) if customer != 'heavy' and pages <= 5]
+        heavy = [n for n, (_, customer, _) in enumerate(jobs) if customer == 'heavy']
+        print(f"\nOne customer sends {load}, {walk_ins} walk-ins follow; seconds from a walk-in's arrival to its last page")
+        print(f"{'':<22}{'small p50':>10}{'p95':>8}{'p99':>8}{'max':>8}{'heavy done':>12}")
+        for name, quantum, chunk_pages in CONFIGURATIONS:
+            latency = run(jobs, quantum, chunk_pages, scale)
+            small_latency = [latency[n] for n in small]
+            print(f"{name:<22}{percentile(small_latency, 0.5):>10.0f}{percentile(small_latency, 0.95):>8.0f}"
+                  f"{percentile(small_latency, 0.99):>8.0f}{max(small_latency):>8.0f}{max(latency[n] for n in heavy):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
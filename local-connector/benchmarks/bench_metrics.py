@@ -0,0 +1,67 @@
+"""
+Measures what the stage metrics cost on the hot path and how close their
+bucket-estimated percentiles come to the exact ones.
+
+    python benchmarks/bench_metrics.py [observations]
+
+Observations are log-normal stage times spread over 5 stages, 4 printers
+and 3 file types, recorded from 4 threads at once, as the print workers do.
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from metrics import Metrics, stage_timer
+
+THREADS = 4
+STAGES = ['download', 'convert', 'transform', 'merge', 'spool']
+PRINTERS = ['front-desk', 'back-office', 'network', 'plotter']
+FILE_TYPES = ['pdf', 'word', 'image']
+
+
+def main():
+    observations = int(sys.argv[1]) if len(sys.argv) > 1 else 400000
+    rng = random.Random(2)
+    samples = [(rng.choice(STAGES), rng.choice(PRINTERS), rng.choice(FILE_TYPES), rng.lognormvariate(0, 1.2))
+               for _ in range(observations)]
+    metrics = Metrics()
+    histogram = metrics.histogram('printease_stage_seconds', 'Seconds per stage.', ('stage', 'printer', 'file_type'))
+
+    def record(chunk):
+        for stage, printer, file_type, seconds in chunk:
+            histogram.observe(seconds, stage=stage, printer=printer, file_type=file_type)
+
+    chunks = [samples[n::THREADS] for n in range(THREADS)]
+    threads = [threading.Thread(target=record, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    print(f"observe(): {elapsed / observations * 1e6:.2f} µs per call from {THREADS} threads")
+
+    stages = {}
+    started = time.perf_counter()
+    for _ in range(observations // 10):
+        with stage_timer(stages, 'spool'):
+            pass
+    print(f"stage_timer(): {(time.perf_counter() - started) / (observations // 10) * 1e6:.2f} µs per block")
+
+    started = time.perf_counter()
+    body = metrics.render()
+    print(f"render(): {(time.perf_counter() - started) * 1000:.1f} ms for {body.count(chr(10))} lines")
+
+    values = sorted(seconds for stage, _, _, seconds in samples if stage == 'spool')
+    print(f"{'spool':<8} {'exact':>8} {'estimate':>9}")
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        print(f"p{int(q * 100):<7} {exact:>8.2f} {histogram.quantile(q, stage='spool'):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares job status writes made directly by the print workers with writes
+queued in the StatusOutbox, against a fake Firestore with injected latency,
+random failures and a short outage.
+
+    python benchmarks/bench_outbox.py [jobs] [latency_ms] [failure_rate]
+
+Each job writes 'printing', prints for 50 ms and writes 'completed', on
+4 workers. Reports how long printing took, how many status writes were
+lost and how many requests reached Firestore.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fakes import FakeFirestore
+from outbox import StatusOutbox
+
+WORKERS = 4
+PRINT_SECONDS = 0.05
+OUTAGE = (0.5, 1.5) # seconds into the run when Firestore goes away and comes back
+
+
+def make_db(jobs, latency, failure_rate):
+    db = FakeFirestore(latency=latency, failure_rate=failure_rate, seed=3)
+    for n in range(jobs):
+        db.docs[('print_jobs', f"job-{n}")] = {'status': 'ready'}
+    return db
+
+
+def schedule_outage(db):
+    def outage():
+        time.sleep(OUTAGE[0])
+        db.offline = True
+        time.sleep(OUTAGE[1] - OUTAGE[0])
+        db.offline = False
+    threading.Thread(target=outage, daemon=True).start()
+
+
+def run(jobs, write):
+    lost = 0
+    lock = threading.Lock()
+
+    def job(n):
+        nonlocal lost
+        for status in ('printing', None, 'completed'):
+            if status is None:
+                time.sleep(PRINT_SECONDS)
+                continue
+            try:
+                write(f"job-{n}", {'status': status})
+            except Exception:
+                with lock:
+                    lost += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(WORKERS) as pool:
+        list(pool.map(job, range(jobs)))
+    return time.perf_counter() - started, lost
+
+
+def report(name, elapsed, lost, db, jobs, extra=""):
+    completed = sum(1 for doc in db.docs.values() if doc['status'] == 'completed')
+    print(f"{name:<8} printing took {elapsed:6.2f}s, {lost:3} writes lost, {completed}/{jobs} jobs completed, "
+          f"{db.requests:4} requests{extra}")
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 150) / 1000
+    failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    print(f"{jobs} jobs, {WORKERS} workers, {latency * 1000:.0f} ms per request, {failure_rate:.0%} failures, "
+          f"outage from {OUTAGE[0]}s to {OUTAGE[1]}s")
+
+    db = make_db(jobs, latency, failure_rate)
+    schedule_outage(db)
+    elapsed, lost = run(jobs, lambda job_id, fields: db.collection('print_jobs').document(job_id).update(fields))
+    report("direct", elapsed, lost, db, jobs)
+
+    db = make_db(jobs, latency, failure_rate)
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = StatusOutbox(db, os.path.join(tmp, 'outbox.db'), min_backoff=0.2, max_backoff=1.0)
+        schedule_outage(db)
+        elapsed, lost = run(jobs, lambda job_id, fields: outbox.update('print_jobs', job_id, fields))
+        started = time.perf_counter()
+        outbox.flush()
+        drained = time.perf_counter() - started
+        outbox.close()
+    report("outbox", elapsed, lost, db, jobs,
+           f" ({outbox.updates} updates in {outbox.commits} commits, {outbox.failures} retried, drained {drained:.2f}s later)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Checks and times the page counts given at checkout.
+
+    python benchmarks/bench_page_count.py [repeats]
+
+Counts generated PDFs with fast_page_count(), which reads only the xref
+table and the page tree root, and with PyPDF2's trailer lookup, and checks
+both against the pages written. Besides plain PDFs of 1 to 5000 pages, the
+cases include page trees whose /Count is an indirect reference ('/Count
+12 0 R'), which the fast path must leave to PyPDF2 rather than misread as
+a page count of 1.
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from converters import write_blank_pdf
+from page_count import count_pdf_pages_with_reader, fast_page_count
+
+SIZES = [1, 12, 300, 5000]
+
+
+def write_pdf_with_indirect_count(output_path, pages, count_object=40):
+    """A PDF whose page tree root says '/Count <count_object> 0 R', with the count stored in that object."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               2: f"<< /Type /Pages /Kids [{' '.join(f'{n + 3} 0 R' for n in range(pages))}] /Count {count_object} 0 R >>".encode(),
+               count_object: str(pages).encode()}
+    for n in range(pages):
+        objects[n + 3] = b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>"
+    size = max(objects) + 1
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n".encode() + objects[number] + b"\nendobj\n"
+    xref_offset = len(out)
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for number in range(1, size):
+        out += f"{offsets[number]:010d} 00000 n \n".encode() if number in offsets else b"0000000000 65535 f \n"
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(output_path, 'wb') as f:
+        f.write(out)
+
+
+def timed(count, path, repeats):
+    """(pages, median milliseconds) of `count` on the file at `path`."""
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        pages = count(path)
+        seconds.append(time.perf_counter() - started)
+    return pages, statistics.median(seconds) * 1000
+
+
+def count_with_reader(path):
+    with open(path, 'rb') as f:
+        return count_pdf_pages_with_reader(f)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    cases = []
+    try:
+        for pages in SIZES:
+            path = os.path.join(work_dir, f"plain_{pages}.pdf")
+            write_blank_pdf(path, pages)
+            cases.append((f"{pages} pages", path, pages))
+        for pages, count_object in ((12, 40), (3, 7), (250, 1000)):
+            path = os.path.join(work_dir, f"indirect_{pages}.pdf")
+            write_pdf_with_indirect_count(path, pages, count_object)
+            cases.append((f"{pages} pages, /Count {count_object} 0 R", path, pages))
+
+        print(f"{'case':<30}{'fast':>8}{'ms':>9}{'PyPDF2':>8}{'ms':>9}")
+        wrong = 0
+        for name, path, pages in cases:
+            fast_pages, fast_ms = timed(fast_page_count, path, repeats)
+            reader_pages, reader_ms = timed(count_with_reader, path, repeats)
+            wrong += (fast_pages != pages) + (reader_pages != pages)
+            print(f"{name:<30}{fast_pages:>8}{fast_ms:>9.2f}{reader_pages:>8}{reader_ms:>9.2f}"
+                  + ("" if fast_pages == reader_pages == pages else f"   WRONG, expected {pages}"))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if wrong:
+        sys.exit(f"{wrong} wrong page count(s)")
+
+
+if __name__ == '__main__':
+    main()
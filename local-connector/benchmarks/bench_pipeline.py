@@ -0,0 +1,87 @@
+"""
+Measures printer idle time between spools with simulated stage latencies,
+comparing strictly sequential file handling with the staged pipeline plus
+prefetching of the next job's first files.
+
+    python benchmarks/bench_pipeline.py [files_per_job] [jobs]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pipeline import Prefetcher, StagedPipeline
+
+DOWNLOAD_SECONDS = 0.30
+CONVERT_SECONDS = 0.20
+SPOOL_SECONDS = 0.40
+PREFETCH_NEXT_JOB_FILES = 2
+
+
+def download(item):
+    time.sleep(DOWNLOAD_SECONDS)
+    return item
+
+
+def convert(item):
+    time.sleep(CONVERT_SECONDS)
+    return item
+
+
+class PrinterClock:
+    """Records when the printer is busy, to report the gaps between spools."""
+
+    def __init__(self):
+        self.spools = []
+
+    def spool(self):
+        started = time.perf_counter()
+        time.sleep(SPOOL_SECONDS)
+        self.spools.append((started, time.perf_counter()))
+
+    def idle_seconds(self):
+        return sum(max(0.0, nxt[0] - prev[1]) for prev, nxt in zip(self.spools, self.spools[1:]))
+
+
+def run_sequential(jobs, files_per_job):
+    printer = PrinterClock()
+    started = time.perf_counter()
+    for _ in range(jobs):
+        for n in range(files_per_job):
+            convert(download(n))
+            printer.spool()
+    return time.perf_counter() - started, printer.idle_seconds()
+
+
+def run_pipelined(jobs, files_per_job):
+    printer = PrinterClock()
+    prefetcher = Prefetcher(workers=1)
+    started = time.perf_counter()
+    for job in range(jobs):
+        def download_stage(n, job=job):
+            item = prefetcher.claim((job, n)) or download(n)
+            if n == files_per_job - 1 and job + 1 < jobs:
+                for k in range(min(PREFETCH_NEXT_JOB_FILES, files_per_job)):
+                    prefetcher.start((job + 1, k), lambda k=k: ('converted', convert(download(k))))
+            return item
+
+        def convert_stage(item):
+            return item if isinstance(item, tuple) else convert(item)
+
+        with StagedPipeline(range(files_per_job), [download_stage, convert_stage], depth=2) as pipeline:
+            for _ in pipeline:
+                printer.spool()
+    prefetcher.stop()
+    return time.perf_counter() - started, printer.idle_seconds()
+
+
+def main(files_per_job=5, jobs=3):
+    print(f"{jobs} jobs x {files_per_job} files; download {DOWNLOAD_SECONDS}s, convert {CONVERT_SECONDS}s, spool {SPOOL_SECONDS}s")
+    for name, runner in (('sequential', run_sequential), ('pipelined', run_pipelined)):
+        elapsed, idle = runner(jobs, files_per_job)
+        print(f"{name:<11} wall {elapsed:6.2f} s   printer idle between spools {idle:6.2f} s")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5, int(sys.argv[2]) if len(sys.argv) > 2 else 3)
@@ -0,0 +1,68 @@
+"""
+Exercises the print backends without paper.
+
+    python benchmarks/bench_print_backend.py [jobs] [pages_per_minute]
+
+1. A print command that hangs (a stand-in for a stuck SumatraPDF) is killed
+   after the backend's timeout instead of blocking its worker.
+2. `jobs` PDFs are printed on two SimulatedPrinter devices by four workers;
+   the measured throughput should match the simulated speed.
+"""
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from converters import write_blank_pdf
+from print_backends import PrintError, SimulatedPrinter, SumatraBackend
+
+WORKERS = 4
+PRINTERS = ['front-desk', 'back-office']
+HANG_TIMEOUT = 2
+
+
+def hung_command(work_dir):
+    """An executable that never exits, in place of SumatraPDF."""
+    path = os.path.join(work_dir, 'hung-print')
+    with open(path, 'w') as f:
+        f.write(f"#!{sys.executable}\nimport time\ntime.sleep(3600)\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    pages_per_minute = float(sys.argv[2]) if len(sys.argv) > 2 else 1200
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    try:
+        pdf_path = os.path.join(work_dir, 'job.pdf')
+        write_blank_pdf(pdf_path, pages=5)
+
+        backend = SumatraBackend(sumatra_path=hung_command(work_dir), timeout=HANG_TIMEOUT, timeout_per_mb=0)
+        backend.open()
+        started = time.perf_counter()
+        try:
+            backend.print_pdf('front-desk', pdf_path, 'hung job')
+        except PrintError as e:
+            print(f"Hung print command: {e} (worker free again after {time.perf_counter() - started:.1f}s)")
+
+        printer = SimulatedPrinter(pages_per_minute=pages_per_minute, warmup_seconds=0.2)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(WORKERS) as pool:
+            list(pool.map(lambda n: printer.print_pdf(PRINTERS[n % len(PRINTERS)], pdf_path, f"job-{n}", copies=2),
+                          range(jobs)))
+        elapsed = time.perf_counter() - started
+        expected = jobs * (printer.warmup_seconds + 10 * printer.seconds_per_page) / len(PRINTERS)
+        print(f"Simulated: {printer.submissions} submissions, {printer.pages_printed} pages on {len(PRINTERS)} printers "
+              f"in {elapsed:.1f}s (model: {expected:.1f}s), {printer.pages_printed / elapsed * 60:.0f} pages/min")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
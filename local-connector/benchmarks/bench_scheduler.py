@@ -0,0 +1,84 @@
+"""
+Simulates one printer's queue under a mixed workload and compares customer
+wait (time from a job arriving to it starting) for FIFO against
+shortest-expected-job-first with aging.
+
+    python benchmarks/bench_scheduler.py [jobs] [load]
+
+`load` is the fraction of time the printer is busy (default 0.85). The
+simulation runs on a virtual clock, so it takes well under a second. The
+scheduler uses the connector's own IndexedHeap and priority_key, and the
+real print times it sees are the expected times with +/-30% noise.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scheduler import IndexedHeap, priority_key
+
+SECONDS_PER_PAGE = 2.0
+SECONDS_PER_JOB = 8.0
+AGING_RATES = (0.05, 0.1, 0.25, 1.0)
+
+
+def job_pages(rng):
+    roll = rng.random()
+    if roll < 0.55: return rng.randint(1, 3) # Tickets, forms, test prints
+    if roll < 0.90: return rng.randint(10, 40) # Class notes
+    return rng.randint(200, 500) # Theses and scanned books
+
+
+def workload(count, load, seed=11):
+    rng = random.Random(seed)
+    jobs = [(SECONDS_PER_JOB + SECONDS_PER_PAGE * job_pages(rng)) for _ in range(count)]
+    mean_service = sum(jobs) / count
+    clock, arrivals = 0.0, []
+    for expected in jobs:
+        clock += rng.expovariate(load / mean_service)
+        arrivals.append((clock, expected, expected * rng.uniform(0.7, 1.3)))
+    return arrivals
+
+
+def simulate(arrivals, policy, aging_rate):
+    """Returns [(expected_seconds, wait_seconds)] per job."""
+    heap = IndexedHeap()
+    waits = []
+    clock, n = 0.0, 0
+    while n < len(arrivals) or len(heap):
+        if not len(heap) and arrivals[n][0] > clock:
+            clock = arrivals[n][0] # Printer idle until the next job arrives
+        while n < len(arrivals) and arrivals[n][0] <= clock:
+            arrived, expected, actual = arrivals[n]
+            heap.push(n, priority_key(policy, expected, arrived, aging_rate), (arrived, expected, actual))
+            n += 1
+        _, _, (arrived, expected, actual) = heap.pop()
+        waits.append((expected, clock - arrived))
+        clock += actual
+    return waits
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def report(name, waits):
+    all_waits = [w for _, w in waits]
+    large = [w for expected, w in waits if expected > SECONDS_PER_JOB + SECONDS_PER_PAGE * 100]
+    print(f"{name:<18}{sum(all_waits) / len(all_waits):>9.0f}s{percentile(all_waits, 0.95):>9.0f}s"
+          f"{max(all_waits):>9.0f}s{sum(large) / max(len(large), 1):>11.0f}s{max(large, default=0):>10.0f}s")
+
+
+def main(count=5000, load=0.85):
+    arrivals = workload(count, load)
+    print(f"{count} jobs, printer {load:.0%} busy; waits until a job starts printing")
+    print(f"{'policy':<18}{'mean':>10}{'p95':>10}{'max':>10}{'big mean':>12}{'big max':>10}")
+    report('fifo', simulate(arrivals, 'fifo', 0))
+    for aging_rate in AGING_RATES:
+        report(f"sejf aging {aging_rate:g}", simulate(arrivals, 'sejf', aging_rate))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, float(sys.argv[2]) if len(sys.argv) > 2 else 0.85)
@@ -0,0 +1,106 @@
+"""
+Measures the wall-clock time of multi-file orders when every file (and the
+cover page) is its own spool submission, and when runs of files with the
+same printer settings are merged into one submission.
+
+    python benchmarks/bench_spool_merge.py [orders] [submission_seconds]
+
+Each submission costs `submission_seconds` (SumatraPDF start, driver
+handshake, printer warm-up) on a FakePrinter, then its pages at 600 pages per
+minute. Merging runs the real merge_pdfs() on generated PDFs, so its cost is
+included in the merged times.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PyPDF2 import PdfWriter
+
+from fakes import FakePrinter
+from pdf_transform import merge_pdfs
+from spool_plan import COVER_FILE_INFO, plan_spool_groups
+
+A4 = (595, 842)
+
+
+def make_pdf(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(*A4)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def make_order(rng, work_dir, n):
+    """A bound order of 3-12 documents with one duplex setting, and the odd color page among black and white ones."""
+    duplex = rng.choice(['one-sided', 'one-sided', 'duplex-long-edge'])
+    files = []
+    for i in range(rng.randint(3, 12)):
+        pages = rng.choice([1, 1, 2, 3, 5, 12, 30])
+        path = os.path.join(work_dir, f"order{n}_file{i}.pdf")
+        make_pdf(path, pages)
+        files.append(({
+            'pageCount': pages,
+            'copies': rng.choice([1, 1, 1, 2, 3]),
+            'duplex': duplex,
+            'printType': rng.choice(['bw'] * 4 + ['color']),
+            'paperSize': 'A4',
+            'orientation': 'portrait',
+        }, path))
+    cover_path = os.path.join(work_dir, f"order{n}_cover.pdf")
+    make_pdf(cover_path, 1)
+    return [(COVER_FILE_INFO, cover_path)] + files
+
+
+def print_order(order, printer, max_pages, work_dir):
+    """Returns (seconds, submissions, pages spooled). Merged duplex runs include the blank backs of odd-length files."""
+    indexed = list(enumerate(order))
+    groups = plan_spool_groups([(i, file_info) for i, (file_info, _) in indexed], max_pages)
+    started = time.perf_counter()
+    pages_printed = 0
+    for indexes in groups:
+        members = [order[i] for i in indexes]
+        if len(members) == 1:
+            file_info, path = members[0]
+            pages = file_info.get('pageCount', 1) * file_info.get('copies', 1)
+        else:
+            merged_path = os.path.join(work_dir, 'merged.pdf')
+            duplex = members[0][0].get('duplex', 'one-sided') != 'one-sided'
+            pages = merge_pdfs([(path, file_info.get('copies', 1)) for file_info, path in members], merged_path, duplex)
+        printer.print_pages(pages)
+        pages_printed += pages
+    return time.perf_counter() - started, len(groups), pages_printed
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    submission_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    rng = random.Random(11)
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    try:
+        jobs = [make_order(rng, work_dir, n) for n in range(orders)]
+        print(f"{orders} bound orders, {sum(len(order) for order in jobs)} submissions unmerged, "
+              f"{submission_seconds}s per submission, 600 pages/min")
+        print(f"{'mode':<9} {'total (s)':>10} {'median/order':>13} {'p90/order':>10} {'submissions':>12} {'pages spooled':>14}")
+        for name, max_pages in (("separate", 0), ("merged", 500)):
+            printer = FakePrinter(pages_per_minute=600, warmup_seconds=submission_seconds)
+            results = [print_order(order, printer, max_pages, work_dir) for order in jobs]
+            seconds = [r[0] for r in results]
+            print(f"{name:<9} {sum(seconds):>10.1f} {percentile(seconds, 0.5):>13.2f} {percentile(seconds, 0.9):>10.2f} "
+                  f"{sum(r[1] for r in results):>12} {sum(r[2] for r in results):>14}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Measures the connector's cold start.
+
+    python benchmarks/bench_startup.py [repeats]
+
+1. `import local_connector` in a fresh interpreter: how long it takes, how
+   many modules it loads and whether any client library or Windows module
+   (Firestore, gRPC, the Drive API, win32) came with it. It should be none.
+2. What a CPU worker process pays before its first task: spawn re-runs the
+   connector script as __mp_main__, then the worker imports PIL and PyPDF2.
+3. Connector.start() against the fakes of bench_connector.py, per phase.
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CONNECTOR_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, CONNECTOR_DIR)
+
+HEAVY_MODULES = ('firebase_admin', 'google', 'googleapiclient', 'grpc', 'requests', 'win32print', 'win32con',
+                 'win32com', 'pythoncom')
+
+# Run in a fresh interpreter; prints seconds, module count and heavy modules as JSON
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import local_connector
+print(json.dumps([time.perf_counter() - started, len(sys.modules),
+                  sorted({m.split('.')[0] for m in sys.modules} & set(HEAVY_MODULES))]))
+"""
+WORKER_PROBE = """
+import json, runpy, sys, time
+started = time.perf_counter()
+runpy.run_path('local_connector.py', run_name='__mp_main__')
+main_seconds = time.perf_counter() - started
+import cpu_pool
+cpu_pool._warm_up()
+print(json.dumps([main_seconds, time.perf_counter() - started, len(sys.modules),
+                  sorted({m.split('.')[0] for m in sys.modules} & set(HEAVY_MODULES))]))
+"""
+
+
+def probe(code, repeats):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{code}"], cwd=CONNECTOR_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return runs
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    runs = probe(IMPORT_PROBE, repeats)
+    print(f"import local_connector: {statistics.median(r[0] for r in runs) * 1000:.0f} ms median of {repeats}, "
+          f"{runs[0][1]} modules, heavy: {', '.join(runs[0][2]) or 'none'}")
+
+    runs = probe(WORKER_PROBE, repeats)
+    print(f"CPU worker: script {statistics.median(r[0] for r in runs) * 1000:.0f} ms, "
+          f"ready {statistics.median(r[1] for r in runs) * 1000:.0f} ms median, "
+          f"{runs[0][2]} modules, heavy: {', '.join(runs[0][3]) or 'none'}")
+
+    from bench_connector import start_connector
+    from fakes import FakeFirestore
+    import local_connector as lc
+
+    work_dir = tempfile.mkdtemp(prefix='printease_bench_')
+    cwd = os.getcwd()
+    try:
+        connector = start_connector(lc, FakeFirestore(), work_dir)
+        connector.stop()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("Connector.start() with fakes: " + ', '.join(f"{phase} {seconds * 1000:.0f} ms"
+                                                     for phase, seconds in lc.startup_seconds.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Runs several connector processes against one shared fake Firestore and
+checks that every job is printed exactly once, even when a connector dies
+in the middle of a job.
+
+    python benchmarks/demo_leasing.py [jobs] [lease_seconds]
+
+Three connectors share a shop: 'pc-front' owns the front desk printer,
+'pc-back' the back office printer, and all three have the network printer
+installed. 'pc-spare' crashes while printing its third job; its lease
+lapses and another connector with the network printer takes the job over.
+Each connector claims jobs with the connector's own JobLeases, polling
+where the real connector uses a listener.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fakes import FakeFirestore, RemoteFirestore, fake_transactional, serve_fake_firestore
+from leasing import JobLeases
+
+AUTHKEY = b'printease-demo'
+NODES = {
+    'pc-front': (['front-desk', 'network'], None),
+    'pc-back': (['back-office', 'network'], None),
+    'pc-spare': (['network'], 3), # Crashes while printing its third job
+}
+SECONDS_PER_PAGE = 0.02
+
+
+def print_job(db, leases, node, job_id, job, attempt, crash=False):
+    """Prints page by page while the lease holds. Returns False if it was lost."""
+    job_ref = db.collection('print_jobs').document(job_id)
+    job_ref.update({'status': 'printing'})
+    log_ref = db.collection('print_log').document(f"{job_id}-{node}-{attempt}")
+    log_ref.set({'job': job_id, 'node': node, 'started': time.time(), 'finished': None})
+    for page in range(job['pages']):
+        if not leases.holds(job_id):
+            return False
+        if crash and page == job['pages'] // 2:
+            log_ref.update({'crashed': time.time()})
+            os._exit(1) # Like a power cut: nothing is released
+        time.sleep(SECONDS_PER_PAGE)
+    log_ref.update({'finished': time.time()})
+    job_ref.update({'status': 'completed', 'printedBy': node, **leases.release_fields()})
+    leases.release(job_id)
+    return True
+
+
+def run_node(address, node, printers, crash_after, lease_seconds):
+    db = RemoteFirestore(address, AUTHKEY)
+    leases = JobLeases(db, node, fake_transactional, lease_seconds=lease_seconds)
+    leases.start()
+    printed, lost_claims, attempt = 0, 0, 0
+    while True:
+        ready = db.collection('print_jobs').where('status', '==', 'ready').where('printerId', 'in', printers).get()
+        running = db.collection('print_jobs').where('status', '==', 'printing').where('printerId', 'in', printers).get()
+        if not ready and not running:
+            break
+        candidates = ready + running
+        random.shuffle(candidates)
+        claimed = False
+        for snapshot in candidates:
+            if not leases.claim(snapshot.id, ('ready',), ('printing',)):
+                lost_claims += 1
+                continue
+            claimed = True
+            attempt += 1
+            if print_job(db, leases, node, snapshot.id, snapshot.to_dict(), attempt, crash=attempt == crash_after):
+                printed += 1
+            break
+        if not claimed:
+            time.sleep(0.1) # Everything left is leased by someone else
+    leases.stop()
+    db.collection('nodes').document(node).set({'printed': printed, 'lostClaims': lost_claims, 'renewals': leases.renewals})
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    lease_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+    rng = random.Random(5)
+    firestore = FakeFirestore(latency=0.005)
+    for n in range(jobs):
+        printer = rng.choice(['front-desk', 'back-office', 'network', 'network'])
+        firestore.docs[('print_jobs', f"job-{n:03}")] = {'status': 'ready', 'printerId': printer, 'pages': rng.randint(5, 40)}
+    address = serve_fake_firestore(firestore, AUTHKEY)
+
+    print(f"{jobs} jobs, {len(NODES)} connectors, {lease_seconds}s leases")
+    started = time.perf_counter()
+    processes = [multiprocessing.Process(target=run_node, args=(address, node, printers, crash_after, lease_seconds))
+                 for node, (printers, crash_after) in NODES.items()]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    job_docs = firestore.documents('print_jobs')
+    log = list(firestore.documents('print_log').values())
+    completed = [entry for entry in log if entry['finished']]
+    interrupted = [entry for entry in log if not entry['finished']]
+    per_job = {}
+    for entry in completed:
+        per_job[entry['job']] = per_job.get(entry['job'], 0) + 1
+    # Nobody may start a job another connector is still printing
+    overlaps = sum(1 for entry in interrupted for other in log
+                   if other['job'] == entry['job'] and other is not entry and other['started'] < entry.get('crashed', 0))
+
+    print(f"Finished in {elapsed:.1f}s")
+    for node, (printers, _) in NODES.items():
+        stats = firestore.documents('nodes').get(node)
+        print(f"  {node:<9} printers {', '.join(printers):<24} " +
+              (f"printed {stats['printed']:3} jobs, {stats['lostClaims']} claims lost to other connectors, {stats['renewals']} lease renewals"
+               if stats else "crashed"))
+    for entry in interrupted:
+        taker = next((e['node'] for e in completed if e['job'] == entry['job']), None)
+        takeover = next((e['started'] for e in completed if e['job'] == entry['job']), None)
+        print(f"  {entry['job']} was interrupted on {entry['node']} and finished by {taker}"
+              + (f", {takeover - entry['crashed']:.1f}s after the crash" if takeover else ""))
+    not_completed = [job_id for job_id, doc in job_docs.items() if doc['status'] != 'completed']
+    printed_twice = [job_id for job_id, count in per_job.items() if count > 1]
+    print(f"Jobs completed: {jobs - len(not_completed)}/{jobs}, printed more than once: {len(printed_twice)}, "
+          f"taken over too early: {overlaps}, leases left behind: {sum(1 for doc in job_docs.values() if doc.get('lease'))}")
+    print(f"Firestore: {firestore.stats()}")
+    if not_completed or printed_twice or overlaps:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+"""
+In-process stand-ins for the services the connector talks to, so the
+benchmarks can run on any machine without Firebase, Drive or a printer.
+"""
+import datetime
+import importlib
+import importlib.util
+import random
+import sys
+import threading
+import time
+import types
+
+# Client and Windows libraries the connector may import at module level, with the submodules it uses
+STUBBED_MODULES = {
+    'firebase_admin': ('credentials', 'firestore'),
+    'google': ('oauth2', 'oauth2.service_account', 'auth', 'auth.transport', 'auth.transport.requests'),
+    'googleapiclient': ('discovery', 'errors', 'http'),
+    'win32print': (),
+    'win32con': (),
+    'win32com': ('client',),
+    'pythoncom': (),
+}
+
+
+class StubModule(types.ModuleType):
+    """An empty module standing in for a library that isn't installed. Anything imported from it refuses to be called."""
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        def unavailable(*args, **kwargs):
+            raise RuntimeError(f"{self.__name__}.{name} is a benchmark stub; the library is not installed")
+        return unavailable
+
+
+def _importable(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def install_import_stubs():
+    """
+    Puts a StubModule in sys.modules for every library in STUBBED_MODULES
+    that isn't installed, so `import local_connector` works on any machine
+    whatever it imports at module level. The benchmarks replace the services
+    these libraries provide with fakes, so nothing in them is ever called.
+    Installed libraries are left alone.
+    """
+    for package, submodules in STUBBED_MODULES.items():
+        for name in (package,) + tuple(f"{package}.{submodule}" for submodule in submodules):
+            if name in sys.modules or _importable(name):
+                continue
+            module = StubModule(name)
+            module.__path__ = [] # A package, so its submodules can be imported
+            sys.modules[name] = module
+            parent, _, child = name.rpartition('.')
+            if parent:
+                setattr(sys.modules.get(parent) or importlib.import_module(parent), child, module)
+
+
+class FakeUnavailable(Exception):
+    """What the fake raises for an injected failure, like google.api_core's ServiceUnavailable."""
+
+
+class FakeAborted(Exception):
+    """A transaction read a document that changed before it committed, like google.api_core's Aborted."""
+
+
+class FakeWriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data, update_time=None):
+        self.id = doc_id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self.collection_name = collection
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        data, version, update_time = self._store.read(self.collection_name, self.id)
+        if transaction is not None:
+            transaction._reads[(self.collection_name, self.id)] = version
+        return FakeDocumentSnapshot(self.id, data, update_time)
+
+    def set(self, data):
+        return self._store.commit([(self.collection_name, self.id, dict(data), False)], batch=False)[0]
+
+    def update(self, data):
+        return self._store.commit([(self.collection_name, self.id, dict(data), True)], batch=False)[0]
+
+
+class FakeQuery:
+    """Supports the '==' and 'in' filters the connector uses."""
+
+    def __init__(self, store, name, filters=()):
+        self._store = store
+        self.name = name
+        self._filters = tuple(filters)
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None: # where(filter=FieldFilter(...)), as the connector writes it
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return FakeQuery(self._store, self.name, self._filters + ((field, op, value),))
+
+    def get(self):
+        return [FakeDocumentSnapshot(doc_id, data, update_time)
+                for doc_id, data, update_time in self._store.query(self.name, self._filters)]
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id):
+        return FakeDocumentReference(self._store, self.name, doc_id)
+
+
+class FakeWriteBatch:
+    """Collects writes and applies them together on commit(), like a Firestore WriteBatch."""
+
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def set(self, doc_ref, data):
+        self._writes.append((doc_ref.collection_name, doc_ref.id, dict(data), False))
+
+    def update(self, doc_ref, data):
+        self._writes.append((doc_ref.collection_name, doc_ref.id, dict(data), True))
+
+    def commit(self):
+        return self._store.commit(self._writes)
+
+
+class FakeTransaction(FakeWriteBatch):
+    """Commits only if nothing it read was written by someone else meanwhile, like Firestore's optimistic transactions."""
+
+    def __init__(self, store):
+        super().__init__(store)
+        self._reads = {} # (collection, doc_id) -> version read
+
+    def _reset(self):
+        self._reads, self._writes = {}, []
+
+    def _commit(self):
+        return self._store.commit(self._writes, preconditions=list(self._reads.items()))
+
+
+def fake_transactional(fn, max_attempts=5):
+    """Stands in for firestore.transactional: runs fn(transaction, ...) until it commits without contention."""
+    def run(transaction, *args, **kwargs):
+        for _ in range(max_attempts):
+            transaction._reset()
+            result = fn(transaction, *args, **kwargs)
+            try:
+                transaction._commit()
+                return result
+            except FakeAborted:
+                continue
+        raise FakeAborted(f"Transaction contended {max_attempts} times")
+    return run
+
+
+class FakeFieldFilter:
+    def __init__(self, field_path, op_string, value):
+        self.field_path = field_path
+        self.op_string = op_string
+        self.value = value
+
+
+class FakeFirestoreModule:
+    """Stands in for the firebase_admin.firestore module, for code that uses its sentinels and decorators directly."""
+    SERVER_TIMESTAMP = object()
+    FieldFilter = FakeFieldFilter
+    transactional = staticmethod(fake_transactional)
+
+
+class FakeClient:
+    """The client half of the fake: references and batches that send every request to `_backend()`."""
+
+    def _backend(self):
+        return self
+
+    def collection(self, name):
+        return FakeCollection(self._backend(), name)
+
+    def batch(self):
+        return FakeWriteBatch(self._backend())
+
+    def transaction(self):
+        return FakeTransaction(self._backend())
+
+
+class FakeFirestore(FakeClient):
+    """
+    A dict-backed Firestore that records every request. Each request (a
+    read, query, write or commit) takes `latency` seconds and fails with
+    FakeUnavailable with probability `failure_rate`, or always while
+    `offline`. Serve it to other processes with serve_fake_firestore().
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.docs = {}
+        self.versions = {} # (collection, doc_id) -> number of writes, for transactions
+        self.requests = 0
+        self.writes = 0 # Documents written
+        self.reads = 0
+        self.commits = 0 # Batches and transactions
+        self.failures = 0
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.offline = False
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            failed = self.offline or (self.failure_rate and self._random.random() < self.failure_rate)
+            if failed:
+                self.failures += 1
+        if failed:
+            raise FakeUnavailable("503 The service is currently unavailable.")
+
+    def read(self, collection, doc_id):
+        """Returns (data, version, update_time)."""
+        self.round_trip()
+        with self._lock:
+            self.reads += 1
+            data = self.docs.get((collection, doc_id))
+            return (dict(data) if data is not None else None), self.versions.get((collection, doc_id), 0), None
+
+    def query(self, collection, filters):
+        self.round_trip()
+        matches = []
+        with self._lock:
+            for (c, doc_id), data in self.docs.items():
+                if c == collection and all(
+                        data.get(field) == value if op == '==' else data.get(field) in value for field, op, value in filters):
+                    matches.append((doc_id, dict(data), None))
+            self.reads += len(matches)
+        return matches
+
+    def commit(self, writes, preconditions=(), batch=True):
+        """Applies [(collection, doc_id, data, merge)] atomically. Raises FakeAborted if a precondition version changed."""
+        self.round_trip()
+        with self._lock:
+            for key, version in preconditions:
+                if self.versions.get(tuple(key), 0) != version:
+                    raise FakeAborted(f"{key[0]}/{key[1]} changed during the transaction")
+            for collection, doc_id, _, merge in writes:
+                if merge and (collection, doc_id) not in self.docs:
+                    raise KeyError(f"No document to update: {collection}/{doc_id}")
+            results = []
+            update_time = datetime.datetime.now(datetime.timezone.utc)
+            for collection, doc_id, data, merge in writes:
+                key = (collection, doc_id)
+                if merge:
+                    self.docs[key].update(data)
+                else:
+                    self.docs[key] = dict(data)
+                self.versions[key] = self.versions.get(key, 0) + 1
+                results.append(FakeWriteResult(update_time))
+            self.writes += len(writes)
+            if batch:
+                self.commits += 1
+            return results
+
+    # For other processes, which only see methods
+    def set_offline(self, offline):
+        self.offline = offline
+
+    def documents(self, collection):
+        with self._lock:
+            return {doc_id: dict(data) for (c, doc_id), data in self.docs.items() if c == collection}
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'reads': self.reads, 'writes': self.writes,
+                    'commits': self.commits, 'failures': self.failures}
+
+
+class RemoteFirestore(FakeClient):
+    """A client for a FakeFirestore served by serve_fake_firestore() in another process."""
+
+    def __init__(self, address, authkey):
+        from multiprocessing.managers import BaseManager
+
+        class Manager(BaseManager):
+            pass
+        Manager.register('firestore')
+        self._manager = Manager(address=address, authkey=authkey)
+        self._manager.connect()
+        self._proxy = self._manager.firestore()
+
+    def _backend(self):
+        return self._proxy
+
+    def __getattr__(self, name):
+        return getattr(self._proxy, name)
+
+
+def serve_fake_firestore(firestore, authkey=b'printease'):
+    """Serves a FakeFirestore to other processes on localhost from a background thread. Returns its address."""
+    from multiprocessing.managers import BaseManager
+
+    class Manager(BaseManager):
+        pass
+    Manager.register('firestore', callable=lambda: firestore)
+    server = Manager(address=('127.0.0.1', 0), authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, name='fake-firestore', daemon=True).start()
+    return server.address
+
+
+class FakeChangeType:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeDocumentChange:
+    """Mimics the change objects handed to an on_snapshot callback."""
+
+    def __init__(self, doc_id, data, change_type='ADDED'):
+        self.type = FakeChangeType(change_type)
+        self.document = FakeDocumentSnapshot(doc_id, data)
+
+
+class FakePrinter:
+    """A printer that takes a fixed start-up time plus a per-page time."""
+
+    def __init__(self, pages_per_minute=600, warmup_seconds=0.0):
+        self.seconds_per_page = 60.0 / pages_per_minute
+        self.warmup_seconds = warmup_seconds
+        self.pages_printed = 0
+        self.max_concurrent = 0
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def print_pages(self, pages):
+        with self._lock:
+            self._busy += 1
+            self.max_concurrent = max(self.max_concurrent, self._busy)
+        try:
+            time.sleep(self.warmup_seconds + pages * self.seconds_per_page)
+        finally:
+            with self._lock:
+                self._busy -= 1
+                self.pages_printed += pages
+
+
+class FakeFileServer:
+    """
+    Serves one in-memory file over HTTP on localhost with Range support, as a
+    stand-in for Drive's alt=media endpoint. Each connection is throttled to
+    `bytes_per_second`, like a single TCP stream over a modest uplink, and
+    every `drop_every`-th request, starting with the first, is cut off after `drop_after` bytes.
+    """
+
+    def __init__(self, payload, bytes_per_second=None, drop_every=0, drop_after=256 * 1024, ranges=True):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.payload = payload
+        self.requests = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    drop = drop_every and (server.requests - 1) % drop_every == 0
+                    if drop:
+                        server.dropped += 1
+                start, end = 0, len(payload)
+                header = self.headers.get('Range')
+                if ranges and header and header.startswith('bytes='):
+                    first, _, last = header[6:].partition('-')
+                    start = int(first)
+                    end = int(last) + 1 if last else len(payload)
+                    if start >= len(payload):
+                        self.send_response(416)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end - 1}/{len(payload)}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Length', str(end - start))
+                self.end_headers()
+                limit = start + drop_after if drop else end
+                chunk_size = 64 * 1024
+                position = start
+                try:
+                    while position < min(end, limit):
+                        chunk = payload[position:min(position + chunk_size, end, limit)]
+                        self.wfile.write(chunk)
+                        position += len(chunk)
+                        if bytes_per_second:
+                            time.sleep(len(chunk) / bytes_per_second)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                if drop:
+                    self.close_connection = True
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                pass # Clients hang up on purpose when a transfer is cut off
+
+        self.httpd = Server(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/file"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
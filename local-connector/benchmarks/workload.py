@@ -0,0 +1,118 @@
+"""
+Synthetic print orders shaped like the website's PrintJob / FileInJob
+documents (src/lib/types.ts), with the files they refer to written to a
+folder that FakeDriveSource serves as Drive.
+
+The mix follows what a campus shop sees: mostly black and white PDFs and
+Word documents with the occasional page range or duplex setting, photos in
+every imageLayout, some bound orders, some reprints of popular files and a
+stream of page count requests from checkout.
+"""
+import os
+import random
+
+from converters import write_blank_pdf
+
+LAYOUTS = {'full-page': 1, '2-up': 2, '4-up': 4, '9-up': 9, 'contact-sheet': 35}
+PAGE_RANGES = ['', '', '', 'all', '1-3', '2,4-6', '1-2,5']
+DUPLEX = ['one-sided', 'one-sided', 'one-sided', 'duplex-long-edge', 'duplex-short-edge']
+BYTES_PER_WORD_PAGE = 3000 # What FakeConverter turns into one page
+
+
+def make_photo(path, width=1600, height=1200):
+    """A synthetic photo with gradients and shapes, smaller than bench_collage's so workloads build quickly."""
+    from PIL import Image, ImageDraw
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for n in range(20):
+        draw.ellipse((n * 70, n * 50, n * 70 + 400, n * 50 + 300), outline=(n * 12, 255 - n * 12, 120), width=8)
+    image.save(path, 'JPEG', quality=90)
+
+
+class Workload:
+    """
+    Generates jobs and the Drive files behind them into `drive_dir`, where
+    each file is named by its Drive ID. `shared_files` of the documents are
+    reused across orders, as popular class notes are.
+    """
+
+    def __init__(self, drive_dir, printers, seed=1, shared_files=8):
+        self.drive_dir = drive_dir
+        self.printers = printers # [(printer_id, name)]
+        self.rng = random.Random(seed)
+        self.shared = []
+        self._next_file = 0
+        os.makedirs(drive_dir, exist_ok=True)
+        for _ in range(shared_files):
+            self.shared.append(self._document())
+
+    def _file_id(self, ext):
+        self._next_file += 1
+        return f"drive-{self._next_file:05}{ext}"
+
+    def _document(self):
+        """Writes a PDF or Word document and returns (file_id, isWordFile, pages)."""
+        pages = self.rng.choice([1, 2, 3, 5, 8, 12, 20, 40])
+        if self.rng.random() < 0.35:
+            file_id = self._file_id('.docx')
+            with open(os.path.join(self.drive_dir, file_id), 'wb') as f:
+                f.write(self.rng.randbytes(pages * BYTES_PER_WORD_PAGE - 100))
+            return file_id, True, pages
+        file_id = self._file_id('.pdf')
+        if self.rng.random() < 0.2: # Landscape slides
+            write_blank_pdf(os.path.join(self.drive_dir, file_id), pages, width=842, height=595)
+        else:
+            write_blank_pdf(os.path.join(self.drive_dir, file_id), pages)
+        return file_id, False, pages
+
+    def _photo(self):
+        file_id = self._file_id('.jpg')
+        make_photo(os.path.join(self.drive_dir, file_id))
+        return file_id
+
+    def file_in_job(self):
+        """One FileInJob."""
+        if self.rng.random() < 0.25:
+            file_id = self._photo()
+            layout = self.rng.choice(list(LAYOUTS))
+            return {
+                'fileName': file_id, 'originalFileName': f"photo_{file_id}", 'googleDriveFileId': file_id,
+                'isWordFile': False, 'isImageFile': True, 'pageCount': 1, 'pageRange': '',
+                'copies': self.rng.choice([1, 2, 4, 9, 12]) if layout != 'full-page' else self.rng.choice([1, 1, 2]),
+                'printType': 'color', 'paperSize': 'A4', 'orientation': self.rng.choice(['portrait', 'landscape']),
+                'duplex': 'one-sided',
+                'imageLayout': {'type': layout, 'photosPerPage': LAYOUTS[layout], 'fit': self.rng.choice(['contain', 'cover'])},
+            }
+        file_id, is_word, pages = self.rng.choice(self.shared) if self.rng.random() < 0.3 else self._document()
+        return {
+            'fileName': file_id, 'originalFileName': f"notes_{file_id}", 'googleDriveFileId': file_id,
+            'isWordFile': is_word, 'isImageFile': False, 'pageCount': pages,
+            'pageRange': self.rng.choice(PAGE_RANGES), 'copies': self.rng.choice([1, 1, 1, 2, 3]),
+            'printType': self.rng.choice(['bw', 'bw', 'bw', 'color']), 'paperSize': self.rng.choice(['A4'] * 9 + ['A3']),
+            'orientation': self.rng.choice(['portrait', 'portrait', 'landscape']), 'duplex': self.rng.choice(DUPLEX),
+        }
+
+    def print_job(self, n):
+        """A PrintJob document in the 'ready' state."""
+        printer_id, name = self.rng.choice(self.printers)
+        files = [self.file_in_job() for _ in range(self.rng.choice([1, 1, 1, 2, 3, 5]))]
+        return {
+            'orderType': 'print', 'status': 'ready', 'printerId': printer_id, 'name': name,
+            'cost': 0, 'username': f"student{n}", 'orderId': f"ORD-{n:05}",
+            'binding': self.rng.choice(['none'] * 6 + ['spiral', 'soft']),
+            'files': files, 'isReprint': self.rng.random() < 0.05,
+        }
+
+    def page_count_request(self, n):
+        file_id, _, _ = self._document()
+        return {'orderType': 'print', 'status': 'page-count-request', 'googleDriveFileId': file_id, 'fileName': file_id}
+
+    def jobs(self, count, page_count_share=0.3):
+        """Returns [(job_id, job document)], a mix of print jobs and page count requests."""
+        jobs = []
+        for n in range(count):
+            if self.rng.random() < page_count_share:
+                jobs.append((f"count-{n:05}", self.page_count_request(n)))
+            else:
+                jobs.append((f"job-{n:05}", self.print_job(n)))
+        return jobs
@@ -0,0 +1,190 @@
+"""
+Per-file progress of print jobs for the PrintEase Local Connector.
+
+A job that failed at file 7 of 10 used to be marked 'error' with nothing to
+say how far it got, so the admin's reprint downloaded, converted and printed
+all ten files again, cover page included. Each print job now carries its
+progress on its document, as `progress`:
+
+    {'files': [{'state': 'spooled'}, {'state': 'printing', 'parts': 2, 'chunkPages': 100},
+               {'state': 'converted'}, {'state': 'pending'}, ...],
+     'cover': {'state': 'spooled'} or None,
+     'uncertain': [{'file': 1, 'pageRange': '201-300', 'copies': 1}],
+     'selection': [...] or None,
+     'complete': False}
+
+File states go pending -> downloaded -> converted -> printing -> spooled.
+'printing' counts the page-range parts of a chunked file that reached the
+spooler; 'skipped' marks files a reprint selection left out. A file that is
+being handed to the spooler has a 'sending' entry with the part's page range.
+
+- A retry, takeover or reprint of an unfinished job starts at the first file
+  that is not spooled, and at the first part of it not yet printed.
+- A reprint of a job that completed prints it again in full, or only the
+  files and pages listed in the document's `reprintSelection`, given in the
+  same shape as `uncertain`. Page ranges count the pages as printed, after
+  the file's own page range; copies default to the file's.
+- The 'sending' entry is in the journal before every submission, and on the
+  document too when another connector could take the job over. A part found
+  'sending' when the job is resumed may have printed before the crash, so it
+  counts as printed and is listed in `uncertain` instead of being sent twice.
+"""
+import copy
+import threading
+
+DONE_STATES = ('spooled', 'skipped')
+
+
+def parse_selection(entries, file_count):
+    """
+    Checks a `reprintSelection` and returns it as a list of {'file', 'pageRange',
+    'copies'} in file order, or None if there is none. Raises ValueError.
+    """
+    if not entries:
+        return None
+    if not isinstance(entries, list):
+        raise ValueError("reprintSelection must be a list of files.")
+    selection = {}
+    for entry in entries:
+        index = entry.get('file') if isinstance(entry, dict) else entry
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < file_count:
+            raise ValueError(f"reprintSelection refers to file {index!r}; the job has {file_count} file(s).")
+        copies = entry.get('copies') if isinstance(entry, dict) else None
+        if copies is not None and (not isinstance(copies, int) or copies < 1):
+            raise ValueError(f"reprintSelection asks for {copies!r} copies of file {index}.")
+        page_range = (entry.get('pageRange') if isinstance(entry, dict) else None) or ''
+        selection[index] = {'file': index, 'pageRange': '' if page_range.lower() == 'all' else page_range, 'copies': copies}
+    return [selection[index] for index in sorted(selection)]
+
+
+class JobProgress:
+    """
+    Progress of one run of a print job. Pipeline threads update it while the
+    job's worker spools, so every method takes the lock; to_dict() is what
+    the journal and the job document store.
+    """
+
+    def __init__(self, files, cover=None, uncertain=(), selection=None):
+        self.files = files # One entry per job file, as in the document
+        self.cover = cover
+        self.uncertain = list(uncertain)
+        self.selection = selection
+        self.save_lock = threading.Lock() # Keeps saved copies in the order they were taken
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, file_count, has_cover, selection=None):
+        """A fresh run, of the whole job or of the files in `selection`."""
+        selected = {entry['file'] for entry in selection} if selection else None
+        files = [{'state': 'pending' if selected is None or index in selected else 'skipped'} for index in range(file_count)]
+        return cls(files, {'state': 'pending'} if has_cover and not selection else None, selection=selection)
+
+    @classmethod
+    def from_dict(cls, data, file_count):
+        """The progress saved by an earlier run, or None if it is missing, finished or for different files."""
+        if not isinstance(data, dict) or data.get('complete') or len(data.get('files') or ()) != file_count:
+            return None
+        return cls([dict(entry) for entry in data['files']], dict(data['cover']) if data.get('cover') else None,
+                   [dict(entry) for entry in data.get('uncertain') or ()], data.get('selection'))
+
+    def to_dict(self, complete=False):
+        with self._lock:
+            return copy.deepcopy({'files': self.files, 'cover': self.cover, 'uncertain': self.uncertain,
+                                  'selection': self.selection, 'complete': complete})
+
+    def _entry(self, index):
+        return self.cover if index == -1 else self.files[index]
+
+    # === RESUMING ===
+    def settle(self):
+        """
+        Counts parts that were being sent when the last run stopped as printed
+        and lists them in `uncertain`. Returns the entries added.
+        """
+        added = []
+        with self._lock:
+            for index, entry in [(-1, self.cover)] + list(enumerate(self.files)):
+                sending = entry.pop('sending', None) if entry else None
+                if not sending:
+                    continue
+                if sending['last']:
+                    entry['state'] = 'spooled'
+                    entry.pop('parts', None)
+                    entry.pop('chunkPages', None)
+                else:
+                    entry.update(state='printing', parts=entry.get('parts', 0) + 1)
+                if index >= 0:
+                    added.append({'file': index, 'pageRange': sending['pageRange'], 'copies': sending['copies']})
+            self.uncertain.extend(added)
+        return added
+
+    def is_done(self, index):
+        with self._lock:
+            entry = self._entry(index)
+            return entry is None or entry['state'] in DONE_STATES
+
+    def remaining(self):
+        """Indexes of the job files still to print."""
+        with self._lock:
+            return [index for index, entry in enumerate(self.files) if entry['state'] not in DONE_STATES]
+
+    def started(self):
+        """True if anything of the job reached the spooler in an earlier run."""
+        with self._lock:
+            return any(entry and (entry['state'] in ('printing', 'spooled') or entry.get('sending'))
+                       for entry in [self.cover] + self.files)
+
+    def parts_done(self, index):
+        """(parts printed, chunk size they were planned with) of a file printed in parts."""
+        with self._lock:
+            entry = self._entry(index)
+            return entry.get('parts', 0), entry.get('chunkPages')
+
+    def selected(self, index):
+        """The selection entry for a job file, or None when the whole file prints as ordered."""
+        for entry in self.selection or ():
+            if entry['file'] == index:
+                return entry
+        return None
+
+    # === UPDATES ===
+    def mark(self, index, state):
+        """Records that a file was downloaded or converted; it never moves a file back."""
+        with self._lock:
+            entry = self._entry(index)
+            if entry['state'] == 'pending' or (entry['state'] == 'downloaded' and state == 'converted'):
+                entry['state'] = state
+
+    def sending(self, parts, part, last, chunk_pages=None):
+        """
+        Files about to go to the spooler together, as [(index, page_range,
+        copies)]; `part` counts from 0 within a file printed in parts.
+        """
+        with self._lock:
+            for index, page_range, copies in parts:
+                entry = self._entry(index)
+                entry.update(state='printing', sending={'pageRange': page_range, 'copies': copies, 'last': last})
+                if chunk_pages:
+                    entry.update(parts=part, chunkPages=chunk_pages)
+
+    def sent(self, indexes):
+        """The submission announced by sending() was accepted by the spooler."""
+        with self._lock:
+            for index in indexes:
+                entry = self._entry(index)
+                sending = entry.pop('sending')
+                if sending['last']:
+                    entry['state'] = 'spooled'
+                    entry.pop('parts', None)
+                    entry.pop('chunkPages', None)
+                elif 'chunkPages' in entry:
+                    entry['parts'] = entry.get('parts', 0) + 1
+
+    def not_sent(self, indexes):
+        """The submission announced by sending() failed; the part will be sent again by a retry."""
+        with self._lock:
+            for index in indexes:
+                entry = self._entry(index)
+                entry.pop('sending', None)
+                if not entry.get('parts'):
+                    entry['state'] = 'converted'
@@ -0,0 +1,376 @@
+"""
+Document to PDF converters for the PrintEase Local Connector.
+
+Starting Word costs several seconds, so converters are kept alive in a
+ConverterPool and reused across jobs. Each pool worker owns one converter,
+checks it is still healthy before every job, recycles it after a fixed
+number of conversions and replaces it outright if a conversion hangs.
+
+Backends:
+- WordConverter: Microsoft Word over COM (Windows only).
+- LibreOfficeConverter: LibreOffice in headless mode (Windows or Linux).
+- FakeConverter: writes a blank PDF, for benchmarks and offline runs.
+"""
+import csv
+import io
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+
+class ConversionError(Exception):
+    pass
+
+
+class DocumentConverter:
+    """Converts one document file to a PDF. Subclasses implement convert()."""
+
+    name = 'converter'
+
+    def open(self):
+        """Starts the backend. Called on the pool worker thread that will use it."""
+
+    def convert(self, input_path, output_path):
+        raise NotImplementedError
+
+    def is_healthy(self):
+        return True
+
+    def close(self):
+        """Shuts the backend down cleanly."""
+
+    def kill(self):
+        """Stops a backend that no longer responds. Called from another thread."""
+        self.close()
+
+
+# === MICROSOFT WORD ===
+WD_FORMAT_PDF = 17
+WD_DO_NOT_SAVE_CHANGES = 0
+
+def _running_word_pids():
+    """Returns the PIDs of all WINWORD.EXE processes."""
+    result = subprocess.run(
+        ['tasklist', '/FI', 'IMAGENAME eq WINWORD.EXE', '/FO', 'CSV', '/NH'],
+        capture_output=True, text=True, check=False,
+    )
+    pids = set()
+    for row in csv.reader(io.StringIO(result.stdout)):
+        if len(row) > 1 and row[1].isdigit():
+            pids.add(int(row[1]))
+    return pids
+
+
+class WordConverter(DocumentConverter):
+    name = 'word'
+    _launch_lock = threading.Lock()
+
+    def __init__(self):
+        self.word = None
+        self.pid = None
+
+    def open(self):
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize() # COM must be initialized on the thread that uses Word
+        try:
+            # DispatchEx always starts a separate Word process, so pool workers never share one.
+            # The launch is serialized so the new process can be told apart from the others.
+            with self._launch_lock:
+                before = _running_word_pids()
+                self.word = win32com.client.DispatchEx("Word.Application")
+                started = _running_word_pids() - before
+            self.pid = started.pop() if len(started) == 1 else self._pid_from_window()
+            if self.pid is None:
+                print("⚠️ Could not tell which WINWORD.EXE process was started; a hung Word can't be killed.")
+            self.word.Visible = False
+            self.word.DisplayAlerts = 0
+        except Exception:
+            self.kill() # A Word that started but could not be set up would be left running
+            self.word = None
+            pythoncom.CoUninitialize()
+            raise
+
+    def _pid_from_window(self):
+        """The PID of this converter's Word, from its main window, for when another Word started at the same time."""
+        try:
+            import win32process
+            return win32process.GetWindowThreadProcessId(self.word.Hwnd)[1] or None
+        except Exception:
+            return None
+
+    def convert(self, input_path, output_path):
+        doc = self.word.Documents.Open(os.path.abspath(input_path), ReadOnly=True, AddToRecentFiles=False)
+        try:
+            doc.SaveAs(os.path.abspath(output_path), FileFormat=WD_FORMAT_PDF)
+        finally:
+            doc.Close(WD_DO_NOT_SAVE_CHANGES)
+
+    def is_healthy(self):
+        try:
+            self.word.Documents.Count
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        import pythoncom
+        try:
+            if self.word:
+                self.word.Quit()
+        except Exception as e:
+            print(f"⚠️ Could not close Word cleanly: {e}")
+            self.kill()
+        finally:
+            self.word = None
+            pythoncom.CoUninitialize()
+
+    def kill(self):
+        if self.pid:
+            subprocess.run(['taskkill', '/F', '/PID', str(self.pid)], capture_output=True, check=False)
+            self.pid = None
+
+
+# === LIBREOFFICE ===
+def find_soffice():
+    """Locate the LibreOffice executable."""
+    for name in ('soffice', 'libreoffice'):
+        path = shutil.which(name)
+        if path: return path
+    for base in (os.environ.get("ProgramFiles", ""), os.environ.get("ProgramFiles(x86)", "")):
+        path = os.path.join(base, "LibreOffice", "program", "soffice.exe")
+        if base and os.path.exists(path): return path
+    return None
+
+
+class LibreOfficeConverter(DocumentConverter):
+    """
+    Runs LibreOffice headless. Each worker keeps its own user profile, so
+    workers can convert in parallel and later runs skip the first-start setup.
+    """
+
+    name = 'libreoffice'
+
+    def __init__(self, soffice_path=None, timeout=180):
+        self.soffice_path = soffice_path or find_soffice()
+        self.timeout = timeout
+        self.profile_dir = None
+        self.process = None
+
+    def open(self):
+        if not self.soffice_path:
+            raise ConversionError("LibreOffice (soffice) not found. Please install it.")
+        self.profile_dir = tempfile.mkdtemp(prefix='printease_lo_')
+
+    def convert(self, input_path, output_path):
+        out_dir = tempfile.mkdtemp(prefix='printease_lo_out_', dir=os.path.dirname(os.path.abspath(output_path)))
+        profile_url = 'file:///' + self.profile_dir.replace('\\', '/').lstrip('/')
+        command = [
+            self.soffice_path, f"-env:UserInstallation={profile_url}",
+            '--headless', '--norestore', '--nolockcheck',
+            '--convert-to', 'pdf', '--outdir', out_dir, os.path.abspath(input_path),
+        ]
+        try:
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            try:
+                _, stderr = self.process.communicate(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                raise ConversionError(f"LibreOffice timed out after {self.timeout}s")
+            produced = os.path.join(out_dir, os.path.splitext(os.path.basename(input_path))[0] + '.pdf')
+            if self.process.returncode != 0 or not os.path.exists(produced):
+                raise ConversionError(f"LibreOffice Error: {stderr.strip() if stderr else 'no PDF produced'}")
+            os.replace(produced, output_path)
+        finally:
+            self.process = None
+            for name in os.listdir(out_dir):
+                os.remove(os.path.join(out_dir, name))
+            os.rmdir(out_dir)
+
+    def kill(self):
+        process = self.process
+        if process and process.poll() is None:
+            process.kill()
+
+
+# === FAKE ===
+def write_blank_pdf(output_path, pages=1, width=595, height=842):
+    """Writes a minimal valid PDF with the given number of empty pages."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    kids = []
+    for n in range(pages):
+        kids.append(f"{n + 3} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] >>".encode())
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(output_path, 'wb') as f:
+        f.write(out)
+
+
+class FakeConverter(DocumentConverter):
+    """
+    Writes a blank PDF instead of converting. One page is produced per
+    bytes_per_page of input, and the delays simulate start-up and
+    per-document conversion cost.
+    """
+
+    name = 'fake'
+
+    def __init__(self, startup_seconds=0.0, convert_seconds=0.0, bytes_per_page=3000):
+        self.startup_seconds = startup_seconds
+        self.convert_seconds = convert_seconds
+        self.bytes_per_page = bytes_per_page
+
+    def open(self):
+        time.sleep(self.startup_seconds)
+
+    def convert(self, input_path, output_path):
+        time.sleep(self.convert_seconds)
+        pages = max(1, -(-os.path.getsize(input_path) // self.bytes_per_page))
+        write_blank_pdf(output_path, pages)
+
+
+CONVERTER_BACKENDS = {
+    'word': WordConverter,
+    'libreoffice': LibreOfficeConverter,
+    'fake': FakeConverter,
+}
+
+
+# === POOL ===
+class _ConversionRequest:
+    def __init__(self, input_path, output_path):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.worker = None
+        self.error = None
+        self.cancelled = False
+        self.picked = threading.Event()
+        self.done = threading.Event()
+
+
+class _ConverterWorker:
+    def __init__(self, pool, number):
+        self.pool = pool
+        self.name = f"converter-{number}"
+        self.abandoned = False
+        self.converter = None
+        self.conversions = 0
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def _start_converter(self):
+        self.converter = self.pool.factory()
+        self.converter.open()
+        self.conversions = 0
+
+    def _stop_converter(self):
+        if self.converter:
+            try:
+                self.converter.close()
+            except Exception as e:
+                print(f"⚠️ {self.name}: error while closing converter: {e}")
+            self.converter = None
+
+    def _run(self):
+        try:
+            self._start_converter() # Warm up before the first job arrives
+        except Exception as e:
+            print(f"⚠️ {self.name}: could not start {self.pool.factory.__name__}: {e}")
+            self.converter = None
+
+        while not self.pool.stopping.is_set() and not self.abandoned:
+            try:
+                request = self.pool.requests.get(timeout=1)
+            except queue.Empty:
+                continue
+            if request.cancelled:
+                continue
+            request.worker = self
+            request.picked.set()
+            try:
+                if self.converter and (self.conversions >= self.pool.max_conversions or not self.converter.is_healthy()):
+                    print(f"♻️  {self.name}: recycling converter after {self.conversions} conversions.")
+                    self._stop_converter()
+                if not self.converter:
+                    self._start_converter()
+                self.converter.convert(request.input_path, request.output_path)
+                self.conversions += 1
+            except Exception as e:
+                request.error = e
+                if self.converter and not self.abandoned and not self.converter.is_healthy():
+                    self._stop_converter()
+            if self.abandoned:
+                return # The pool already killed this converter and started a replacement
+            request.done.set()
+        if not self.abandoned:
+            self._stop_converter()
+
+
+class ConverterPool:
+    """
+    A fixed set of long-lived converters shared by all jobs.
+
+    convert() has the same shape as DocumentConverter.convert(), so the pool
+    can be passed anywhere a converter is expected.
+    """
+
+    def __init__(self, factory, size=1, max_conversions=50, timeout=180):
+        self.factory = factory
+        self.max_conversions = max_conversions
+        self.timeout = timeout
+        self.requests = queue.Queue()
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._next_number = 1
+        self.workers = [self._new_worker() for _ in range(size)]
+
+    def _new_worker(self):
+        worker = _ConverterWorker(self, self._next_number)
+        self._next_number += 1
+        return worker
+
+    def convert(self, input_path, output_path):
+        request = _ConversionRequest(input_path, output_path)
+        self.requests.put(request)
+        while not request.picked.wait(1):
+            if self.stopping.is_set():
+                request.cancelled = True
+                raise ConversionError("Converter pool is shutting down.")
+        if not request.done.wait(self.timeout):
+            self._replace(request.worker)
+            raise ConversionError(f"Conversion of '{os.path.basename(input_path)}' timed out after {self.timeout}s")
+        if request.error:
+            raise request.error
+        return output_path
+
+    def _replace(self, worker):
+        """Abandons a hung worker, kills its backend and starts a fresh one."""
+        print(f"⚠️ {worker.name} is not responding. Killing its converter and starting a new one.")
+        worker.abandoned = True
+        try:
+            if worker.converter:
+                worker.converter.kill()
+        except Exception as e:
+            print(f"⚠️ Could not kill hung converter: {e}")
+        with self._lock:
+            self.workers = [w for w in self.workers if w is not worker] + [self._new_worker()]
+
+    def close(self, timeout=30):
+        self.stopping.set()
+        for worker in list(self.workers):
+            worker.thread.join(timeout)
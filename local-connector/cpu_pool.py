@@ -0,0 +1,106 @@
+"""
+Worker processes for the CPU-bound stages of the PrintEase Local Connector.
+
+Collage rendering, image-to-PDF conversion and PyPDF2 transforms used to
+run on the print workers' threads, sharing one GIL with the Firestore
+listener, the outbox and every other job: a large contact sheet froze them
+all. CpuPool runs these stages in a few long-lived processes instead:
+- the processes are started when the connector starts and import PIL and
+  PyPDF2 once, so a task pays only for its own work;
+- tasks receive file paths and return small results (a page count, an
+  orientation); the images and PDFs themselves never cross the process
+  boundary;
+- a worker that dies (out of memory on a huge photo, say) breaks only the
+  task it was running; the pool is restarted and the task retried once;
+- workers are replaced after `max_tasks_per_worker` tasks, so memory
+  fragmentation from large images does not build up.
+
+Processes are started with 'spawn' on every platform: forking a process
+that already runs gRPC threads for Firestore is not safe. Task functions
+must live in modules that import without side effects (imaging,
+pdf_transform).
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+
+def _warm_up():
+    """Runs once in every worker process, before its first task."""
+    from PIL import Image
+    Image.init() # Loads every image plugin now rather than on the first unusual file
+    import PyPDF2 # noqa: F401
+    import imaging # noqa: F401
+    import pdf_transform # noqa: F401
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+class CpuPool:
+    """
+    Runs functions in warm worker processes. With workers=0 they run on the
+    calling thread instead, as before.
+    """
+
+    def __init__(self, workers, max_tasks_per_worker=200):
+        self.workers = workers
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.tasks = 0
+        self.restarts = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _make_executor(self):
+        options = {'max_workers': self.workers, 'mp_context': multiprocessing.get_context('spawn'),
+                   'initializer': _warm_up}
+        if sys.version_info >= (3, 11) and self.max_tasks_per_worker:
+            options['max_tasks_per_child'] = self.max_tasks_per_worker
+        return concurrent.futures.ProcessPoolExecutor(**options)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._make_executor()
+            return self._executor
+
+    def start(self):
+        """Starts every worker and waits until they have imported their libraries. Returns their PIDs."""
+        if not self.workers:
+            return set()
+        executor = self._get_executor()
+        # Workers are spawned on demand, so keep them all busy at once until each has answered
+        barrier = [executor.submit(_worker_pid) for _ in range(self.workers * 4)]
+        return {future.result() for future in barrier}
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self.restarts += 1
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._make_executor()
+
+    def run(self, fn, *args, **kwargs):
+        """Calls fn(*args, **kwargs) in a worker process and returns its result, re-raising its exception."""
+        self.tasks += 1
+        if not self.workers:
+            return fn(*args, **kwargs)
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args, **kwargs).result()
+            except BrokenProcessPool:
+                print(f"⚠️ A CPU worker process died while running {fn.__name__}; restarting the pool.")
+                self._restart(executor)
+                if attempt:
+                    raise
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,305 @@
+"""
+Bounded job dispatcher for the PrintEase Local Connector.
+
+Every printer gets its own small pool of worker threads fed by a bounded
+queue, and page count requests get a separate pool so checkout never waits
+behind a long print run. When a queue is full the job is parked and offered
+again later, so the Firestore listener callback never blocks. Print
+queues hand out the job with the smallest expected cost first (see
+scheduler.py), optionally shared out fairly between customers; page count
+requests are served in arrival order.
+
+A long job can give its printer up between two spool submissions with
+yield_turn(): it goes back into its queue as a task for the rest of its
+work and its worker slot passes to whichever job the queue picks. When the
+queue picks it again, it carries on where it stopped, with its downloads,
+temp files and lease untouched.
+"""
+import collections
+import queue
+import threading
+import time
+
+from scheduler import PriorityTaskQueue, ScheduledTask
+
+
+class _NextTurn(ScheduledTask):
+    """Stands in a queue for a job that yielded its turn; running it wakes the job."""
+
+
+class WorkerPool:
+    """
+    A fixed number of jobs running at once, drained from one bounded priority
+    queue. Each running job holds one of `workers` slots; a job paused by
+    yield_turn() gives its slot up, and an extra thread is started while it
+    waits so the slot can be used.
+    """
+
+    def __init__(self, name, workers, max_queue, policy='fifo', aging_rate=0.1, on_start=None, fair_share_quantum=None):
+        self.name = name
+        self.tasks = PriorityTaskQueue(maxsize=max_queue, policy=policy, aging_rate=aging_rate, fair_share_quantum=fair_share_quantum)
+        self.active = 0
+        self.busy_seconds = 0.0 # Summed over workers, for utilization
+        self.on_start = on_start # Called with (pool name, job_id, seconds waited) as a task starts
+        self._workers = workers
+        self._slots = threading.Semaphore(workers)
+        self._paused = 0 # Jobs waiting in yield_turn(), each keeping its thread
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._local = threading.local() # The task running on this thread and when it last started running
+        self._threads = []
+        self._thread_count = 0
+        with self._lock:
+            for _ in range(workers):
+                self._add_thread()
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def _add_thread(self):
+        self._thread_count += 1
+        thread = threading.Thread(target=self._run, name=f"{self.name}-{self._thread_count}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def offer(self, task):
+        """Queues a ScheduledTask without blocking. Returns False when full."""
+        return self.tasks.offer(task)
+
+    def depth(self):
+        """Jobs waiting plus jobs currently running."""
+        with self.tasks.mutex:
+            return self.tasks.unfinished_tasks
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if len(self._threads) > self._workers + self._paused: # Started for a paused job that has resumed since
+                    self._threads.remove(threading.current_thread())
+                    return
+            if not self._slots.acquire(timeout=0.5):
+                continue
+            try:
+                task = self.tasks.get(timeout=0.5)
+            except queue.Empty:
+                self._slots.release()
+                continue
+            if isinstance(task, _NextTurn):
+                task.fn() # The paused job carries on in this thread's slot
+                self.tasks.task_done()
+                continue
+            self._execute(task)
+            self._slots.release()
+
+    def _execute(self, task):
+        job_id, fn, args = task.as_tuple()
+        started = self._local.started = time.monotonic()
+        self._local.task = task
+        with self._lock:
+            self.active += 1
+        try:
+            if self.on_start:
+                self.on_start(self.name, job_id, started - task.enqueued_at)
+            fn(*args)
+        except Exception as e:
+            print(f"❌ Unhandled error in {threading.current_thread().name} for job {job_id}: {e}")
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.busy_seconds += time.monotonic() - self._local.started
+            self._local.task = None
+            self.tasks.task_done()
+
+    def yield_turn(self, turn_seconds):
+        """
+        Called by a running job between two spool submissions. If other jobs
+        are waiting, puts the job back into the queue as a task costing
+        `turn_seconds` and waits until the queue hands it out again, while
+        the job the queue prefers runs in its slot. Returns whether it waited.
+        """
+        task = getattr(self._local, 'task', None)
+        if task is None or not self.tasks.qsize():
+            return False
+        turn = threading.Event()
+        with self._lock:
+            self.active -= 1
+            self.busy_seconds += time.monotonic() - self._local.started
+            self._paused += 1
+            if len(self._threads) - self._paused < self._workers:
+                self._add_thread()
+        self.tasks.requeue(_NextTurn(task.job_id, turn.set, (), task.expected_seconds, task.enqueued_at,
+                                     task.share_key, turn_seconds))
+        self._slots.release()
+        while not turn.wait(0.5):
+            if self._stop.is_set():
+                break # Shutting down: finish without a slot rather than hang
+        with self._lock:
+            self._paused -= 1
+            self.active += 1
+        self._local.started = time.monotonic()
+        return True
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+
+
+class JobDispatcher:
+    """
+    Routes jobs to a bounded worker pool per printer plus one shared pool for
+    page count requests. Jobs that do not fit are parked in arrival order and
+    re-offered by retry_deferred(), which the main loop calls regularly. With
+    fair share, each customer's jobs are bounded and parked separately, so a
+    customer who fills a queue parks only their own jobs.
+    """
+
+    def __init__(self, workers_per_printer=1, page_count_workers=2, max_queue_per_printer=20, policy='sejf', aging_rate=0.1,
+                 on_start=None, fair_share_quantum=None):
+        self.workers_per_printer = workers_per_printer
+        self.max_queue_per_printer = max_queue_per_printer
+        self.policy = policy
+        self.aging_rate = aging_rate
+        self.on_start = on_start
+        self.fair_share_quantum = fair_share_quantum # Seconds credited per customer per round; None for one shared queue
+        self.page_counts = WorkerPool('page-count', page_count_workers, max_queue_per_printer, on_start=on_start)
+        self._printers = {}
+        self._deferred = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool_for(self, printer_key):
+        with self._lock:
+            pool = self._printers.get(printer_key)
+            if pool is None:
+                pool = WorkerPool(f"printer-{printer_key}", self.workers_per_printer, self.max_queue_per_printer,
+                                  policy=self.policy, aging_rate=self.aging_rate, on_start=self.on_start,
+                                  fair_share_quantum=self.fair_share_quantum)
+                self._printers[printer_key] = pool
+            return pool
+
+    def submit_print(self, printer_key, job_id, fn, *args, expected_seconds=0.0, enqueued_at=None, share_key=None, turn_seconds=None):
+        """
+        Queues a job on its printer's pool, ordered by expected_seconds and
+        time waited, and with fair share by its share_key. Returns False if
+        it had to be parked.
+        """
+        return self._submit(('print', printer_key),
+                            ScheduledTask(job_id, fn, args, expected_seconds, enqueued_at, share_key, turn_seconds))
+
+    def submit_page_count(self, job_id, fn, *args):
+        """Queues a page count request. Returns False if it had to be parked."""
+        return self._submit(('page-count', None), ScheduledTask(job_id, fn, args))
+
+    def _parking_lane(self, target, task):
+        """Parked jobs in the same lane keep their arrival order."""
+        return (target, task.share_key) if self.fair_share_quantum is not None and target[0] == 'print' else target
+
+    def _submit(self, target, task):
+        lane = self._parking_lane(target, task)
+        with self._lock:
+            # Keep arrival order: nothing jumps ahead of jobs already parked for the same pool.
+            if any(self._parking_lane(t, parked) == lane for t, parked in self._deferred.values()):
+                self._deferred[task.job_id] = (target, task)
+                return False
+        if self._pool(target).offer(task):
+            return True
+        with self._lock:
+            self._deferred[task.job_id] = (target, task)
+        return False
+
+    def reprioritize(self, job_id, expected_seconds, *args, turn_seconds=None):
+        """
+        Updates the expected cost (and arguments, if given) of a job that has
+        not started yet, moving it within its queue. Returns False if it is
+        not waiting any more.
+        """
+        with self._lock:
+            parked = self._deferred.get(job_id)
+            if parked:
+                parked[1].expected_seconds = expected_seconds
+                parked[1].turn_seconds = turn_seconds
+                if args: parked[1].args = args
+                return True
+            pools = list(self._printers.values())
+        return any(pool.tasks.reprioritize(job_id, expected_seconds, args or None, turn_seconds) for pool in pools)
+
+    def yield_turn(self, printer_key, turn_seconds):
+        """Lets the printer's queue run other jobs before the calling job's next `turn_seconds`. See WorkerPool.yield_turn."""
+        with self._lock:
+            pool = self._printers.get(printer_key)
+        return pool.yield_turn(turn_seconds) if pool else False
+
+    def withdraw_waiting(self, printer_key):
+        """Takes every job that has not started yet off a printer, for routing elsewhere. Returns ScheduledTasks."""
+        with self._lock:
+            pool = self._printers.get(printer_key)
+            parked = [job_id for job_id, (t, _) in self._deferred.items() if t == ('print', printer_key)]
+            tasks = [self._deferred.pop(job_id)[1] for job_id in parked]
+        if pool:
+            # Jobs that yielded their turn have started here and stay
+            tasks = pool.tasks.withdraw_all(keep=lambda task: isinstance(task, _NextTurn)) + tasks
+        return tasks
+
+    def _pool(self, target):
+        kind, printer_key = target
+        return self.page_counts if kind == 'page-count' else self._pool_for(printer_key)
+
+    def retry_deferred(self):
+        """Moves parked jobs into their pools while there is room. Returns how many moved."""
+        moved = 0
+        blocked = set()
+        with self._lock:
+            parked = list(self._deferred.items())
+        for job_id, (target, task) in parked:
+            lane = self._parking_lane(target, task)
+            if lane in blocked:
+                continue
+            if self._pool(target).offer(task):
+                with self._lock:
+                    self._deferred.pop(job_id, None)
+                moved += 1
+            else:
+                blocked.add(lane)
+        return moved
+
+    def deferred_count(self):
+        with self._lock:
+            return len(self._deferred)
+
+    def queue_depth(self, printer_key):
+        """Jobs queued, running or parked for one printer."""
+        with self._lock:
+            pool = self._printers.get(printer_key)
+            parked = sum(1 for t, _ in self._deferred.values() if t == ('print', printer_key))
+        return (pool.depth() if pool else 0) + parked
+
+    def peek_next(self, printer_key):
+        """Returns the (job_id, fn, args) task that will start next on a printer, or None."""
+        with self._lock:
+            pool = self._printers.get(printer_key)
+            parked = [task for t, task in self._deferred.values() if t == ('print', printer_key)]
+        if pool is None:
+            return None
+        task = pool.tasks.peek() or (parked[0] if parked else None)
+        if isinstance(task, _NextTurn):
+            return None # A paused job is next; its files are prepared already
+        return task.as_tuple() if task else None
+
+    def pools(self):
+        with self._lock:
+            return [self.page_counts, *self._printers.values()]
+
+    def wait_idle(self, poll_interval=0.05):
+        """Blocks until every queue is drained. Used by benchmarks and shutdown."""
+        while True:
+            self.retry_deferred()
+            if self.deferred_count() == 0 and all(p.depth() == 0 for p in self.pools()):
+                return
+            time.sleep(poll_interval)
+
+    def stop(self, timeout=None):
+        for pool in self.pools():
+            pool.stop(timeout)
@@ -0,0 +1,181 @@
+"""
+Google Drive access with a local blob cache for the PrintEase Local Connector.
+
+Reprints and retries used to download every file again. DriveFileStore keeps
+downloaded files in a size-bounded ArtifactCache keyed by the Drive file ID
+and its md5Checksum, so an unchanged file is served from disk and a file
+that changed on Drive is downloaded again. Entries expire after a TTL.
+
+Drive itself sits behind the DriveSource interface: GoogleDriveSource talks
+to the real API and FakeDriveSource serves files from a local folder, so the
+store can be exercised offline.
+"""
+import hashlib
+import io
+import os
+import shutil
+
+from artifact_cache import artifact_key
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DRIVE_MEDIA_URL = "https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&supportsAllDrives=true"
+
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DriveSource:
+    """Where files come from. get_metadata() returns at least 'id', 'name' and 'md5Checksum'."""
+
+    def get_metadata(self, file_id):
+        raise NotImplementedError
+
+    def download(self, file_id, local_path, metadata=None):
+        """Writes the file to local_path. May return the MD5 hex digest it computed while downloading."""
+        raise NotImplementedError
+
+
+class GoogleDriveSource(DriveSource):
+    """
+    With an authorized requests `session`, files are fetched by the
+    RangedDownloader (parallel parts, resume, streaming MD5); without one they
+    go through MediaIoBaseDownload as a single stream.
+    """
+
+    def __init__(self, service, session=None, download_workers=4):
+        self.service = service
+        self.session = session
+        self.download_workers = download_workers
+
+    def _call(self, file_id, fn):
+        from googleapiclient.errors import HttpError
+        try:
+            return fn()
+        except HttpError as error:
+            if error.resp.status == 404:
+                raise Exception(f"File not found in Google Drive (ID: {file_id}). It may have been deleted or the ID is incorrect.")
+            raise Exception(f"Google Drive API error: {error}")
+
+    def get_metadata(self, file_id):
+        # Also confirms the file exists and we have permission before the download begins.
+        print(f"⬇️  Verifying Google Drive file (ID: {file_id})...")
+        return self._call(file_id, lambda: self.service.files().get(
+            fileId=file_id, fields='id,name,size,md5Checksum', supportsAllDrives=True).execute())
+
+    def download(self, file_id, local_path, metadata=None):
+        """Returns the MD5 of the downloaded bytes when it was computed on the way, otherwise None."""
+        size = (metadata or {}).get('size')
+        if self.session is not None and size is not None:
+            return self._download_ranged(file_id, local_path, int(size), metadata.get('md5Checksum'))
+
+        from googleapiclient.http import MediaIoBaseDownload
+
+        def run():
+            print(f"⬇️  Downloading from Google Drive...")
+            request = self.service.files().get_media(fileId=file_id, supportsAllDrives=True)
+            with io.FileIO(local_path, 'wb') as fh:
+                downloader = MediaIoBaseDownload(fh, request)
+                done = False
+                while not done:
+                    status, done = downloader.next_chunk()
+                    if status:
+                        print(f"   Download {int(status.progress() * 100)}%.")
+        self._call(file_id, run)
+        return None
+
+    def _download_ranged(self, file_id, local_path, size, md5):
+        from ranged_download import RangedDownloader
+
+        reported = [-1]
+        def progress(done, total):
+            percent = int(done * 100 / total) // 10 * 10 if total else 100
+            if percent > reported[0]:
+                reported[0] = percent
+                print(f"   Download {percent}%.")
+
+        print(f"⬇️  Downloading from Google Drive ({size / (1024 * 1024):.1f} MB)...")
+        url = DRIVE_MEDIA_URL.format(file_id=file_id)
+        downloader = RangedDownloader(self.session, workers=self.download_workers, progress=progress)
+        try:
+            return downloader.download(url, local_path, size, md5)
+        except Exception as e:
+            if 'HTTP 404' in str(e):
+                raise Exception(f"File not found in Google Drive (ID: {file_id}). It may have been deleted or the ID is incorrect.")
+            raise
+
+
+class FakeDriveSource(DriveSource):
+    """Serves the files in `folder` as if they were on Drive; the file name is the file ID."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.downloads = 0
+
+    def _path(self, file_id):
+        path = os.path.join(self.folder, file_id)
+        if not os.path.exists(path):
+            raise Exception(f"File not found in Google Drive (ID: {file_id}). It may have been deleted or the ID is incorrect.")
+        return path
+
+    def get_metadata(self, file_id):
+        path = self._path(file_id)
+        return {'id': file_id, 'name': file_id, 'size': str(os.path.getsize(path)), 'md5Checksum': file_md5(path)}
+
+    def download(self, file_id, local_path, metadata=None):
+        self.downloads += 1
+        shutil.copyfile(self._path(file_id), local_path)
+        return None
+
+
+def _link_or_copy(source_path, local_path):
+    """Hard-links a cached file into place, copying when linking is not possible."""
+    if os.path.exists(local_path):
+        os.remove(local_path)
+    try:
+        os.link(source_path, local_path)
+    except OSError:
+        shutil.copyfile(source_path, local_path)
+
+
+class DriveFileStore:
+    def __init__(self, source, cache):
+        self.source = source
+        self.cache = cache
+
+    def _download_verified(self, file_id, metadata, local_path):
+        digest = self.source.download(file_id, local_path, metadata)
+        expected = metadata.get('md5Checksum')
+        if expected and (digest or file_md5(local_path)) != expected:
+            raise Exception(f"Downloaded file (ID: {file_id}) does not match Drive's checksum.")
+
+    def fetch(self, file_id, local_path):
+        """
+        Places the file at local_path, from the local cache when Drive still
+        has the same content, otherwise by downloading (and caching) it.
+        """
+        metadata = self.source.get_metadata(file_id)
+        md5 = metadata.get('md5Checksum')
+        if not md5:
+            # Google Docs and other native files have no checksum to verify a cached copy against
+            self.source.download(file_id, local_path, metadata)
+            return local_path
+
+        downloaded = []
+        def download(tmp_path):
+            self._download_verified(file_id, metadata, tmp_path)
+            downloaded.append(True)
+
+        key = artifact_key(md5, 'drive', file_id)
+        suffix = os.path.splitext(metadata.get('name') or local_path)[1]
+        with self.cache.get_or_create(key, download, suffix=suffix) as cached_path:
+            _link_or_copy(cached_path, local_path)
+        if downloaded:
+            print(f"✅ File downloaded successfully to '{os.path.basename(local_path)}'")
+        else:
+            print(f"✅ Served '{os.path.basename(local_path)}' from the local Drive cache.")
+        return local_path
@@ -0,0 +1,218 @@
+"""
+Wait time estimation for the PrintEase Local Connector.
+
+Replaces the flat AVG_SECONDS_PER_JOB with a small throughput model per
+printer, learned online from the connector's own timings:
+- spool seconds of a file grow linearly with the pages printed, with a
+  separate line for every (color/bw, duplex/single, paper size) class;
+- preparation seconds (download + conversion) grow linearly with the
+  document's page count, per file kind (PDF, Word, image);
+- files of a job are pipelined, so a file occupies the printer for the
+  slower of its two stages; whatever else the job costs (cover page, status
+  writes, filling the pipeline) is a per-job overhead.
+
+Every line is a least-squares fit over exponentially decayed sums, so the
+model is a handful of floats per class and recent jobs count the most. It
+starts from a prior that is pulled towards the measurements as jobs finish.
+"""
+import heapq
+import json
+import math
+import os
+import threading
+
+from pdf_transform import parse_page_range
+
+DECAY = 0.1 # Weight of the newest observation
+PRIOR_WEIGHT = 2.0 # How many observations the prior is worth
+PRIOR_SAMPLE_PAGES = (1, 20) # Page counts the prior is anchored at
+
+PRIOR_JOB_OVERHEAD = 10.0 # seconds
+PRIOR_SPOOL = (8.0, 2.0) # seconds per file, seconds per page (bw, single-sided, A4)
+PRIOR_PREPARE = {'pdf': (3.0, 0.05), 'word': (8.0, 0.3), 'image': (3.0, 0.5)}
+PRIOR_COLOR_FACTOR = 2.0
+PRIOR_LARGE_PAPER_FACTOR = 2.0 # A3 and larger
+
+
+# === JOB FEATURES ===
+def file_features(file_info):
+    """The properties of one job file the model uses, in the form stored in timing traces."""
+    page_count = max(int(file_info.get('pageCount') or 1), 1)
+    copies = max(int(file_info.get('copies') or 1), 1)
+    layout = file_info.get('imageLayout') or {}
+    if file_info.get('isImageFile'):
+        kind = 'image'
+        per_page = layout.get('photosPerPage') or 1
+        pages = math.ceil(copies / per_page) if layout.get('type', 'full-page') != 'full-page' else copies
+    else:
+        kind = 'word' if file_info.get('isWordFile') else 'pdf'
+        pages = len(parse_page_range(file_info.get('pageRange', 'all'), page_count)) * copies
+    return {
+        'kind': kind,
+        'pageCount': page_count,
+        'pages': pages,
+        'printType': file_info.get('printType', 'bw'),
+        'duplex': file_info.get('duplex', 'one-sided') != 'one-sided',
+        'paperSize': file_info.get('paperSize', 'A4'),
+    }
+
+
+def job_features(job_data):
+    return [file_features(file_info) for file_info in job_data.get('files', [])]
+
+
+def spool_class(features):
+    return f"{features['printType']}|{'duplex' if features['duplex'] else 'single'}|{features['paperSize']}"
+
+
+# === MODEL ===
+class DecayedLine:
+    """Fits y = intercept + slope * x over exponentially decayed sums."""
+
+    def __init__(self, intercept, slope):
+        self.sums = [0.0] * 5 # w, wx, wxx, wy, wxy
+        weight = PRIOR_WEIGHT / len(PRIOR_SAMPLE_PAGES)
+        for x in PRIOR_SAMPLE_PAGES:
+            self._add(x, intercept + slope * x, weight)
+
+    def _add(self, x, y, weight):
+        for n, value in enumerate((1.0, x, x * x, y, x * y)):
+            self.sums[n] += weight * value
+
+    def update(self, x, y):
+        self.sums = [value * (1 - DECAY) for value in self.sums]
+        self._add(x, y, DECAY)
+
+    def coefficients(self):
+        w, wx, wxx, wy, wxy = self.sums
+        det = w * wxx - wx * wx
+        slope = max((w * wxy - wx * wy) / det, 0.0) if det > 1e-9 else 0.0
+        return (wy - slope * wx) / w, slope
+
+    def predict(self, x):
+        intercept, slope = self.coefficients()
+        return max(intercept + slope * x, 0.0)
+
+
+class PrinterModel:
+    def __init__(self):
+        self.overhead = PRIOR_JOB_OVERHEAD
+        self.spool = {}
+        self.prepare = {}
+
+    def _spool_line(self, features):
+        key = spool_class(features)
+        if key not in self.spool:
+            intercept, slope = PRIOR_SPOOL
+            factor = (PRIOR_COLOR_FACTOR if features['printType'] == 'color' else 1.0) * \
+                     (PRIOR_LARGE_PAPER_FACTOR if features['paperSize'] != 'A4' else 1.0)
+            self.spool[key] = DecayedLine(intercept, slope * factor)
+        return self.spool[key]
+
+    def _prepare_line(self, features):
+        kind = features['kind']
+        if kind not in self.prepare:
+            self.prepare[kind] = DecayedLine(*PRIOR_PREPARE.get(kind, PRIOR_PREPARE['pdf']))
+        return self.prepare[kind]
+
+    def file_seconds(self, features):
+        return max(self._spool_line(features).predict(features['pages']),
+                   self._prepare_line(features).predict(features['pageCount']))
+
+    def job_seconds(self, files):
+        return self.overhead + sum(self.file_seconds(features) for features in files)
+
+    def observe(self, record):
+        occupied = 0.0
+        for features in record['files']:
+            prepare = features.get('download', 0.0) + features.get('convert', 0.0)
+            self._spool_line(features).update(features['pages'], features['spool'])
+            self._prepare_line(features).update(features['pageCount'], prepare)
+            occupied += max(features['spool'], prepare)
+        overhead = max(record['total'] - occupied, 0.0)
+        self.overhead += DECAY * (overhead - self.overhead)
+
+
+class WaitTimeEstimator:
+    """
+    Predicts how long jobs take on each printer and when a queue will be
+    done. Feed it one timing record per finished job with observe().
+    """
+
+    def __init__(self, workers_per_printer=1):
+        self.workers_per_printer = workers_per_printer
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, printer_id):
+        if printer_id not in self._models:
+            self._models[printer_id] = PrinterModel()
+        return self._models[printer_id]
+
+    def observe(self, printer_id, record):
+        """`record` is {'files': [file_features + 'download', 'convert', 'spool' seconds], 'total': seconds}."""
+        with self._lock:
+            self._model(printer_id).observe(record)
+
+    def predict(self, printer_id, files):
+        """Expected seconds for a job, given job_features()."""
+        with self._lock:
+            return self._model(printer_id).job_seconds(files)
+
+    def completion_times(self, printer_id, jobs):
+        """
+        Expected seconds until each queued job finishes, in one pass over the
+        queue. `jobs` are (files, elapsed) in print order, where elapsed is how
+        long a running job has been printing, or None if it is waiting.
+        Returns (completion times, seconds until a newly queued job would start).
+        """
+        with self._lock:
+            model = self._model(printer_id)
+            free_at = [0.0] * max(self.workers_per_printer, 1) # When each worker is next free
+            completions = []
+            for files, elapsed in jobs:
+                seconds = model.job_seconds(files)
+                if elapsed is not None:
+                    seconds = max(seconds - elapsed, 0.0)
+                done = heapq.heappop(free_at) + seconds
+                heapq.heappush(free_at, done)
+                completions.append(done)
+            return completions, free_at[0]
+
+    def wait_time(self, printer_id, jobs):
+        return self.completion_times(printer_id, jobs)[1]
+
+    # === PERSISTENCE ===
+    def to_dict(self):
+        with self._lock:
+            return {printer_id: {
+                'overhead': model.overhead,
+                'spool': {key: line.sums for key, line in model.spool.items()},
+                'prepare': {key: line.sums for key, line in model.prepare.items()},
+            } for printer_id, model in self._models.items()}
+
+    def load_dict(self, state):
+        with self._lock:
+            for printer_id, data in state.items():
+                model = self._model(printer_id)
+                model.overhead = data['overhead']
+                for table, lines in ((model.spool, data['spool']), (model.prepare, data['prepare'])):
+                    for key, sums in lines.items():
+                        line = DecayedLine(0.0, 0.0)
+                        line.sums = list(sums)
+                        table[key] = line
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                self.load_dict(json.load(f))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Ignoring unreadable wait time model {path}: {e}")
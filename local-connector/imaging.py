@@ -0,0 +1,208 @@
+"""
+Photo collage rendering for the PrintEase Local Connector.
+
+Two render modes share the same grid and fit logic:
+- 'raster': every page is a 300 DPI bitmap of the whole sheet.
+- 'vector': the resized photo is embedded once as an image XObject and
+  every grid cell on every page draws it by reference, so the spooled PDF
+  stays small and the printer only has to decode the photo once.
+"""
+import io
+import itertools
+import os
+
+from PIL import Image
+
+# A4 paper size in inches for layout calculations
+A4_WIDTH_IN = 8.27
+A4_HEIGHT_IN = 11.69
+DPI = 300 # Standard print quality
+POINTS_PER_INCH = 72
+VECTOR_JPEG_QUALITY = 90
+
+COLLAGE_RENDER_MODES = ('raster', 'vector')
+
+
+def page_pixel_size(orientation):
+    if orientation == 'landscape':
+        return int(A4_HEIGHT_IN * DPI), int(A4_WIDTH_IN * DPI)
+    return int(A4_WIDTH_IN * DPI), int(A4_HEIGHT_IN * DPI)
+
+
+def collage_grid(layout_type, orientation):
+    """Returns (columns, rows) for a layout type."""
+    if layout_type == '2-up': return (2, 1) if orientation == 'landscape' else (1, 2)
+    if layout_type == '4-up': return 2, 2
+    if layout_type == '9-up': return 3, 3
+    if layout_type == 'contact-sheet': return (7, 5) if orientation == 'landscape' else (5, 7)
+    return 1, 1
+
+
+def fit_to_cell(image, cell_width, cell_height, fit_mode):
+    """Resizes a copy of the image to fit ('contain') or fill ('cover') one grid cell."""
+    resized_image = image.copy()
+    if fit_mode == 'contain':
+        resized_image.thumbnail((cell_width, cell_height), Image.Resampling.LANCZOS)
+    else: # 'cover'
+        img_aspect, cell_aspect = resized_image.width / resized_image.height, cell_width / cell_height
+        if img_aspect > cell_aspect:
+            new_height, new_width = cell_height, int(cell_height * img_aspect)
+        else:
+            new_width, new_height = cell_width, int(cell_width / img_aspect)
+        resized_image = resized_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        left, top = (new_width - cell_width) / 2, (new_height - cell_height) / 2
+        resized_image = resized_image.crop((left, top, left + cell_width, top + cell_height))
+    return resized_image
+
+
+def cell_positions(photo_count, grid_cols, cell_width, cell_height, image_width, image_height):
+    """Top-left pixel position of the photo in each of the first photo_count cells."""
+    for i in range(photo_count):
+        row, col = (i // grid_cols), (i % grid_cols)
+        yield (col * cell_width + (cell_width - image_width) // 2,
+               row * cell_height + (cell_height - image_height) // 2)
+
+
+def create_image_layout_pdf(image_path, copies, layout_info, print_type, orientation, output_pdf_path, render_mode='vector'):
+    """Creates a PDF with multiple copies of a single image on one or more pages."""
+    layout_type = layout_info.get('type', 'full-page')
+    fit_mode = layout_info.get('fit', 'contain')
+
+    print(f"🎨 Creating {render_mode} collage '{layout_type}' for {copies} copies of one photo...")
+
+    try:
+        page_width, page_height = page_pixel_size(orientation)
+        grid_cols, grid_rows = collage_grid(layout_type, orientation)
+        photos_per_page = grid_cols * grid_rows
+        full_pages, leftover_photos = divmod(copies, photos_per_page)
+
+        cell_width = page_width // grid_cols
+        cell_height = page_height // grid_rows
+
+        source_image = Image.open(image_path)
+        if print_type == 'bw':
+            source_image = source_image.convert('L')
+        elif source_image.mode != 'RGB':
+            source_image = source_image.convert('RGB')
+
+        # Resize the source image to fit the cell once
+        resized_image = fit_to_cell(source_image, cell_width, cell_height, fit_mode)
+        layout = (grid_cols, cell_width, cell_height, resized_image.width, resized_image.height)
+
+        if render_mode == 'vector':
+            write_vector_collage(resized_image, (page_width, page_height), layout, photos_per_page,
+                                 full_pages, leftover_photos, output_pdf_path)
+        else:
+            save_raster_collage(resized_image, (page_width, page_height), layout, photos_per_page,
+                                full_pages, leftover_photos, output_pdf_path)
+
+        print(f"✅ Saved collage PDF to '{os.path.basename(output_pdf_path)}'")
+
+    except Exception as e:
+        raise Exception(f"Failed to create image collage PDF: {e}")
+
+
+def image_to_pdf(image_path, output_pdf_path):
+    """Writes one photo centred on an A4 page, scaled down to fit if it is larger."""
+    image = Image.open(image_path)
+    a4_pixel_width = int(A4_WIDTH_IN * DPI)
+    a4_pixel_height = int(A4_HEIGHT_IN * DPI)
+    image.thumbnail((a4_pixel_width, a4_pixel_height), Image.Resampling.LANCZOS)
+
+    a4_page = Image.new('RGB', (a4_pixel_width, a4_pixel_height), 'white')
+    paste_x = (a4_pixel_width - image.width) // 2
+    paste_y = (a4_pixel_height - image.height) // 2
+    a4_page.paste(image, (paste_x, paste_y))
+    a4_page.save(output_pdf_path, "PDF", resolution=DPI)
+
+
+# === RASTER ===
+def save_raster_collage(resized_image, page_size, layout, photos_per_page, full_pages, leftover_photos, output_pdf_path):
+    def render_page(photo_count):
+        page_canvas = Image.new('RGB', page_size, 'white')
+        for position in cell_positions(photo_count, *layout):
+            page_canvas.paste(resized_image, position)
+        return page_canvas
+
+    # Every full page is identical, so one template page is rendered and handed to the
+    # PDF writer once per page, followed by the partial last page if there is one.
+    # At most two canvases exist at a time, whatever the copy count.
+    pdf_pages = iter(())
+    if full_pages:
+        pdf_pages = itertools.repeat(render_page(photos_per_page), full_pages)
+    if leftover_photos:
+        pdf_pages = itertools.chain(pdf_pages, [render_page(leftover_photos)])
+
+    first_page = next(pdf_pages, None)
+    if first_page is not None:
+        first_page.save(output_pdf_path, "PDF", resolution=DPI, save_all=True, append_images=pdf_pages)
+
+
+# === VECTOR ===
+class _PdfObjectWriter:
+    """Writes numbered PDF objects straight to a file and finishes with the xref table."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def add(self, number, body, stream=None):
+        self.offsets[number] = self.f.tell()
+        self.f.write(f"{number} 0 obj\n".encode())
+        if stream is None:
+            self.f.write(body.encode() + b"\nendobj\n")
+        else:
+            self.f.write(body.encode() + b"\nstream\n" + stream + b"\nendstream\nendobj\n")
+
+    def finish(self, root_number):
+        xref_offset = self.f.tell()
+        size = max(self.offsets) + 1
+        self.f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for number in range(1, size):
+            self.f.write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {size} /Root {root_number} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def write_vector_collage(resized_image, page_size, layout, photos_per_page, full_pages, leftover_photos, output_pdf_path):
+    page_count = full_pages + (1 if leftover_photos else 0)
+    if page_count == 0:
+        return
+
+    scale = POINTS_PER_INCH / DPI
+    page_width_pt, page_height_pt = page_size[0] * scale, page_size[1] * scale
+    image_width_pt, image_height_pt = resized_image.width * scale, resized_image.height * scale
+
+    def content_stream(photo_count):
+        ops = []
+        for x, y in cell_positions(photo_count, *layout):
+            # PDF user space starts at the bottom-left corner
+            bottom = page_height_pt - y * scale - image_height_pt
+            ops.append(f"q {image_width_pt:.3f} 0 0 {image_height_pt:.3f} {x * scale:.3f} {bottom:.3f} cm /Im0 Do Q")
+        return "\n".join(ops).encode()
+
+    jpeg = io.BytesIO()
+    resized_image.save(jpeg, 'JPEG', quality=VECTOR_JPEG_QUALITY)
+    image_data = jpeg.getvalue()
+    color_space = '/DeviceGray' if resized_image.mode == 'L' else '/DeviceRGB'
+
+    # 1 catalog, 2 page tree, 3 photo, 4 shared resources, 5/6 page contents, 7+ pages
+    full_content, partial_content = 5, 6
+    first_page_number = 7
+    kids = " ".join(f"{first_page_number + n} 0 R" for n in range(page_count))
+
+    with open(output_pdf_path, 'wb') as f:
+        pdf = _PdfObjectWriter(f)
+        pdf.add(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        pdf.add(2, f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>")
+        pdf.add(3, f"<< /Type /XObject /Subtype /Image /Width {resized_image.width} /Height {resized_image.height} "
+                   f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /DCTDecode /Length {len(image_data)} >>", image_data)
+        pdf.add(4, "<< /XObject << /Im0 3 0 R >> >>")
+        for number, photo_count in ((full_content, photos_per_page if full_pages else 0), (partial_content, leftover_photos)):
+            stream = content_stream(photo_count)
+            pdf.add(number, f"<< /Length {len(stream)} >>", stream)
+        media_box = f"[0 0 {page_width_pt:.3f} {page_height_pt:.3f}]"
+        for n in range(page_count):
+            contents = full_content if n < full_pages else partial_content
+            pdf.add(first_page_number + n, f"<< /Type /Page /Parent 2 0 R /MediaBox {media_box} /Resources 4 0 R /Contents {contents} 0 R >>")
+        pdf.finish(root_number=1)
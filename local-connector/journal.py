@@ -0,0 +1,188 @@
+"""
+Durable job journal for the PrintEase Local Connector.
+
+The connector used to remember the jobs it was handling in a set that was
+emptied when a job ended and lost on restart: a crash mid-print left the job
+'printing' forever, and a failed status write could let the listener start
+the same job twice. The journal is a SQLite database in WAL mode that
+records every job's state and, for print jobs, how far they got (see
+checkpoint.py):
+
+    queued -> running -> spooled -> done
+                     \\-> failed
+
+- A job is dispatched only when claim() succeeds, once per cycle of its
+  document: a snapshot no newer than the status write that finished the
+  job's last cycle is a replay and is ignored.
+- 'spooled' means every file was printed but the final status write has
+  not gone through yet; the connector retries the write instead of printing
+  again.
+- After a crash, 'running' jobs resume with the first file not yet spooled,
+  from the progress saved here before and after every spool submission.
+
+States of unfinished jobs and the version of finished ones are mirrored in
+dicts, so the listener's checks never touch the disk. Each transition is one
+small transaction with synchronous=FULL, so it survives power loss too.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+ACTIVE_STATES = ('queued', 'running', 'spooled')
+FINISHED_STATES = ('done', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 1,
+    printer_id TEXT,
+    printer_name TEXT,
+    final_status TEXT,
+    version REAL,
+    progress TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class JournalEntry:
+    def __init__(self, job_id, kind, state, attempt, printer_id, printer_name, final_status):
+        self.job_id = job_id
+        self.kind = kind
+        self.state = state
+        self.attempt = attempt
+        self.printer_id = printer_id
+        self.printer_name = printer_name
+        self.final_status = final_status # Status to write for a 'spooled' job
+
+
+class JobJournal:
+    """
+    `version` arguments are the document's update time in seconds, from the
+    snapshot the job was seen in or the WriteResult of a status write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._active = {} # job_id -> state, for unfinished jobs
+        self._finished = {} # job_id -> version of the status write that finished the job
+        for job_id, state, version in self._db.execute("SELECT job_id, state, version FROM jobs"):
+            if state in ACTIVE_STATES:
+                self._active[job_id] = state
+            else:
+                self._finished[job_id] = version
+
+    def _write(self, *statements):
+        """Runs (sql, params) statements in one transaction. Call with the lock held."""
+        self._db.execute("BEGIN")
+        try:
+            for sql, params in statements:
+                self._db.execute(sql, params)
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    # === LISTENER HOT PATH ===
+    def is_active(self, job_id):
+        return job_id in self._active
+
+    def state(self, job_id):
+        return self._active.get(job_id)
+
+    def claim(self, job_id, kind, version=None):
+        """
+        Records a job as queued. Returns False when it is already being
+        handled, or when the snapshot is not newer than the write that
+        finished its last cycle.
+        """
+        with self._lock:
+            if job_id in self._active:
+                return False
+            finished_version = self._finished.get(job_id)
+            if version is not None and finished_version is not None and version <= finished_version:
+                return False
+            self._write(
+                ("INSERT INTO jobs (job_id, kind, state, updated_at) VALUES (?, ?, 'queued', ?) "
+                 "ON CONFLICT (job_id) DO UPDATE SET kind = excluded.kind, state = 'queued', attempt = attempt + 1, "
+                 "printer_id = NULL, printer_name = NULL, final_status = NULL, version = NULL, progress = NULL, "
+                 "updated_at = excluded.updated_at",
+                 (job_id, kind, time.time())),
+            )
+            self._active[job_id] = 'queued'
+            self._finished.pop(job_id, None)
+            return True
+
+    # === TRANSITIONS ===
+    def job_started(self, job_id, printer_id=None, printer_name=None):
+        """The job left its queue and is printing on this printer."""
+        with self._lock:
+            self._write(("UPDATE jobs SET state = 'running', printer_id = ?, printer_name = ?, updated_at = ? WHERE job_id = ?",
+                         (printer_id, printer_name, time.time(), job_id)))
+            self._active[job_id] = 'running'
+
+    def save_progress(self, job_id, progress):
+        """Saves a print job's JobProgress.to_dict(), before and after each file or part is handed to the spooler."""
+        with self._lock:
+            self._write(("UPDATE jobs SET progress = ?, updated_at = ? WHERE job_id = ?", (json.dumps(progress), time.time(), job_id)))
+
+    def job_spooled(self, job_id, final_status):
+        """Every file is printed; `final_status` still has to be written to the job."""
+        with self._lock:
+            self._write(("UPDATE jobs SET state = 'spooled', final_status = ?, updated_at = ? WHERE job_id = ?",
+                         (final_status, time.time(), job_id)))
+            self._active[job_id] = 'spooled'
+
+    def finish(self, job_id, state='done', version=None):
+        """Ends the job's cycle as 'done' or 'failed'. Its progress is dropped; the job document keeps it."""
+        with self._lock:
+            self._write(("UPDATE jobs SET state = ?, version = ?, progress = NULL, updated_at = ? WHERE job_id = ?",
+                         (state, version, time.time(), job_id)))
+            self._active.pop(job_id, None)
+            self._finished[job_id] = version
+
+    def release(self, job_id):
+        """Forgets a job that never started, so the listener can dispatch it again."""
+        with self._lock:
+            self._write(("DELETE FROM jobs WHERE job_id = ?", (job_id,)))
+            self._active.pop(job_id, None)
+            self._finished.pop(job_id, None)
+
+    # === RECOVERY ===
+    def progress(self, job_id):
+        """The progress saved for the job's current cycle, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT progress FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def unfinished(self, states=ACTIVE_STATES):
+        """JournalEntries of the jobs in the given states, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT job_id, kind, state, attempt, printer_id, printer_name, final_status FROM jobs "
+                f"WHERE state IN ({', '.join('?' * len(states))}) ORDER BY updated_at", tuple(states)).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+    def prune(self, max_age):
+        """Drops finished jobs older than max_age seconds. Returns how many were dropped."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            old = [job_id for job_id, in self._db.execute(
+                "SELECT job_id FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?", (cutoff,))]
+            if old:
+                self._write(("DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?", (cutoff,)))
+                for job_id in old:
+                    self._finished.pop(job_id, None)
+            return len(old)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,52 @@
+"""
+Deferred imports and memoized factories for the PrintEase Local Connector.
+
+Importing local_connector used to connect to Firebase and Drive and pull in
+win32print, the Firestore client (with gRPC) and the Drive API client before
+a single line of main() ran. Every CPU worker process re-imports the script
+it was spawned from, so each of them paid for all of that too. Instead:
+- LazyModule stands in for a module and imports it on first attribute
+  access, so a process that never prints never loads win32print;
+- memoized() turns a function that creates a client into one that creates
+  it on first call and returns the same object from then on.
+"""
+import functools
+import importlib
+import threading
+
+
+class LazyModule:
+    """A module imported the first time one of its attributes is used."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        # Only called for attributes not set in __init__, i.e. the module's own
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'{' (loaded)' if self._module else ''}>"
+
+
+def memoized(factory):
+    """
+    Calls factory() once, on first use, and returns its result to every later
+    caller. Concurrent first callers wait for the one creating it. If the
+    factory raises, nothing is kept and the next call tries again.
+    """
+    lock = threading.Lock()
+    result = []
+
+    @functools.wraps(factory)
+    def get():
+        if not result:
+            with lock:
+                if not result:
+                    result.append(factory())
+        return result[0]
+
+    return get
@@ -0,0 +1,149 @@
+"""
+Job leases for running several PrintEase Local Connectors against one shop.
+
+Each connector listens only for jobs on the printers installed on its PC,
+but a network printer can be installed on more than one PC and page count
+requests go to every connector. Before a connector starts a job it claims a
+lease on the job document in a transaction:
+
+    lease: {'owner': <connector id>, 'expiresAt': <epoch seconds>}
+
+A job can be claimed while it waits, or once the lease of the connector
+printing it has lapsed (that connector crashed or lost its connection). The
+owner renews its leases in the background every `lease_seconds / 3` and
+clears the lease with the job's final status write. A connector that could
+not renew a lease before it expired stops printing the job, since another
+connector may have taken it over.
+
+Leases compare wall clocks of different PCs, so keep them synchronised
+(Windows does by default) and `lease_seconds` well above any clock drift.
+"""
+import threading
+import time
+
+
+class LeaseLost(Exception):
+    """The connector no longer holds the lease of a job it is working on."""
+
+
+def lease_available(lease, owner, now):
+    """True if `owner` may take a job with this lease: there is none, it is its own, or it lapsed."""
+    return not lease or lease.get('owner') == owner or lease.get('expiresAt', 0) <= now
+
+
+class JobLeases:
+    """
+    `transactional` is firestore.transactional; functions it wraps are
+    called with a fresh db.transaction() and retried on contention.
+    """
+
+    def __init__(self, db, owner, transactional, lease_seconds=60, collection='print_jobs', clock=time.time):
+        self.db = db
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.collection = collection
+        self.clock = clock
+        self.renewals = 0
+        self._held = {} # job_id -> expiresAt we last wrote successfully
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._claim = transactional(self._claim_in)
+        self._renew = transactional(self._renew_in)
+
+    def _lease(self, now):
+        return {'owner': self.owner, 'expiresAt': now + self.lease_seconds}
+
+    def _claim_in(self, transaction, job_ref, waiting_statuses, running_statuses, now):
+        snapshot = job_ref.get(transaction=transaction)
+        data = snapshot.to_dict() if snapshot.exists else None
+        if not data:
+            return False
+        status, lease = data.get('status'), data.get('lease')
+        if status in running_statuses:
+            if not lease: # Started before leases existed, or by hand; never take those over
+                return False
+        elif status not in waiting_statuses:
+            return False
+        if not lease_available(lease, self.owner, now):
+            return False
+        transaction.update(job_ref, {'lease': self._lease(now)})
+        return True
+
+    def claim(self, job_id, waiting_statuses, running_statuses=()):
+        """
+        Takes the lease of a job in one of `waiting_statuses`, or of one in
+        `running_statuses` whose lease lapsed. Returns False if another
+        connector holds it or the job moved on. Raises if Firestore can't be reached.
+        """
+        now = self.clock()
+        job_ref = self.db.collection(self.collection).document(job_id)
+        if not self._claim(self.db.transaction(), job_ref, tuple(waiting_statuses), tuple(running_statuses), now):
+            return False
+        with self._lock:
+            self._held[job_id] = now + self.lease_seconds
+        return True
+
+    def holds(self, job_id):
+        """True while the lease is ours and has not run out without a renewal."""
+        with self._lock:
+            expires_at = self._held.get(job_id)
+        return expires_at is not None and expires_at > self.clock()
+
+    def release(self, job_id):
+        """Stops renewing a job's lease. The lease itself is cleared by the job's final status write."""
+        with self._lock:
+            self._held.pop(job_id, None)
+
+    def release_fields(self):
+        """Fields to add to a job's final status write."""
+        return {'lease': None}
+
+    def held(self):
+        with self._lock:
+            return list(self._held)
+
+    # === RENEWAL ===
+    def _renew_in(self, transaction, job_ref, now):
+        snapshot = job_ref.get(transaction=transaction)
+        lease = (snapshot.to_dict() or {}).get('lease') if snapshot.exists else None
+        if not lease or lease.get('owner') != self.owner:
+            return False
+        transaction.update(job_ref, {'lease': self._lease(now)})
+        return True
+
+    def renew_all(self):
+        """Extends every lease held. Returns the job IDs whose lease turned out to be gone."""
+        lost = []
+        for job_id in self.held():
+            now = self.clock()
+            try:
+                renewed = self._renew(self.db.transaction(), self.db.collection(self.collection).document(job_id), now)
+            except Exception as e:
+                print(f"⚠️ Could not renew the lease of job {job_id}: {e}")
+                continue # holds() turns False by itself if this goes on until the lease runs out
+            with self._lock:
+                if job_id not in self._held:
+                    continue # Released meanwhile
+                if renewed:
+                    self._held[job_id] = now + self.lease_seconds
+                    self.renewals += 1
+                else:
+                    del self._held[job_id]
+                    lost.append(job_id)
+        for job_id in lost:
+            print(f"⚠️ Lost the lease of job {job_id} to another connector.")
+        return lost
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.renew_all()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='lease-renewal', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
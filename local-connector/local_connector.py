@@ -2,42 +2,137 @@
 import os
 import time
 import threading
-import firebase_admin
-from firebase_admin import credentials, firestore
-import win32print
 import datetime
-import subprocess
+import importlib.util
 import re
 import sys
 import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from googleapiclient.errors import HttpError
-import io
-try:
-    from PyPDF2 import PdfReader, PdfWriter
-except ImportError:
-    from PyPDF2 import PdfFileReader as PdfReader, PdfFileWriter as PdfWriter
-from PIL import Image
-import win32com.client
-import pythoncom # Required for multithreading COM objects
+import socket
+import contextlib
+from lazy import LazyModule, memoized
+from dispatcher import JobDispatcher
+from converters import CONVERTER_BACKENDS, ConverterPool
+from print_backends import PRINT_BACKENDS, PrintError
+from metrics import Metrics, MetricsServer, stage_timer
+from artifact_cache import ArtifactCache, artifact_key, file_digest
+from drive_store import DriveFileStore, GoogleDriveSource
+from page_count import fast_page_count
+from pdf_transform import merge_pdfs, pdf_info, transform_document
+from spool_plan import COVER_FILE_INFO, plan_spool_chunks, plan_spool_groups
+from imaging import create_image_layout_pdf, image_to_pdf
+from cpu_pool import CpuPool
+from pipeline import Prefetcher, StagedPipeline
+from printer_status import PrinterQueues, PrinterStatusPublisher
+from estimator import WaitTimeEstimator, file_features, job_features
+from routing import PrinterRouter
+from journal import JobJournal
+from checkpoint import JobProgress, parse_selection
+from outbox import StatusOutbox
+from leasing import JobLeases, LeaseLost, lease_available
 
 # === CONFIGURATION ===
 TEMP_DIR = "printed_jobs"
-PRINTER_REFRESH_INTERVAL = 20 # seconds
+PRINTER_REFRESH_INTERVAL = 20 # seconds between checks for installed printers (local only)
+PRINTER_HEARTBEAT_INTERVAL = 60 # seconds between 'lastSeen' updates
+DEFAULT_PRINTER_CAPABILITIES = ['bw', 'color', 'A4', 'A3', 'A2', 'A1', 'A0', 'duplex', 'single-sided'] # When the driver can't be asked
+
+# Routing jobs between this shop's printers
+ROUTE_ON_LOAD_MIN_SAVING = 120 # seconds a job must start sooner elsewhere to leave the printer it was assigned
 
 DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
 DRIVE_FOLDER_ID = '0AAg0HgehhXVRUk9PVA' # Replace with your Google Drive Folder ID
 
-# A4 paper size in inches for layout calculations
-A4_WIDTH_IN = 8.27
-A4_HEIGHT_IN = 11.69
-DPI = 300 # Standard print quality
-AVG_SECONDS_PER_JOB = 120 # 2 minutes per job for wait time estimation
-
-# === INITIALIZATION ===
-try:
+# A4 paper size and print DPI for layout calculations are defined in imaging.py
+COLLAGE_RENDER_MODE = 'vector' # 'vector' embeds the photo once; 'raster' renders each page as a bitmap
+
+# Wait time estimation learns from the timings of finished jobs
+WAIT_TIME_MODEL_FILE = "wait_time_model.json"
+TIMING_TRACE_FILE = "timing_trace.jsonl" # One line of stage timings per finished job; None to disable
+
+# Several connectors can share one shop; each claims a job with a lease before printing it
+CONNECTOR_ID = os.getenv('CONNECTOR_ID') or socket.gethostname()
+JOB_LEASE_SECONDS = 60 # A crashed connector's jobs are taken over this long after its last renewal
+LEASE_CLAIM_ATTEMPTS = 3 # Tries to reach Firestore before a job is left for later
+ABANDONED_JOB_SWEEP_INTERVAL = 60 # seconds between checks for jobs whose connector stopped renewing
+
+# Job journal: which jobs are being handled and which files reached the spooler, across restarts
+JOURNAL_FILE = "job_journal.db"
+JOURNAL_RETENTION = 7 * 24 * 60 * 60 # seconds finished jobs are remembered, to ignore replayed snapshots
+
+# Job status writes are queued on disk and sent in batches, so workers never wait for Firestore
+STATUS_OUTBOX_FILE = "status_outbox.db"
+STATUS_OUTBOX_MAX_BACKOFF = 60 # seconds between retries while Firestore is unreachable
+
+# Concurrency limits for the job dispatcher
+WORKERS_PER_PRINTER = 1 # Jobs printed at the same time on one printer
+PAGE_COUNT_WORKERS = 2 # Page count requests handled in parallel
+MAX_QUEUED_JOBS_PER_PRINTER = 20 # Extra jobs are parked until the queue drains
+SCHEDULING_POLICY = 'sejf' # 'sejf' starts the shortest expected job first; 'fifo' keeps arrival order
+SCHEDULER_AGING_RATE = 0.1 # A job can only be overtaken by jobs arriving within 1/rate times its expected duration
+FAIR_SHARE = 'customer' # Printers take turns between 'customer's (username, else phone number) or 'order's; None for one shared queue
+FAIR_SHARE_QUANTUM = 60 # seconds of printing credited to every waiting customer per round
+
+# Download and conversion run ahead of the printer
+PIPELINE_DEPTH = 2 # Files of the current job prepared ahead of the one printing
+PREFETCH_NEXT_JOB_FILES = 2 # Files of the next queued job prepared before it starts
+PREFETCH_MAX_AGE = 600 # seconds before an unclaimed prefetched file is deleted
+
+# Consecutive files of a job with the same paper size, duplex, orientation and color are spooled as one merged PDF
+SPOOL_MERGE_MAX_PAGES = 500 # Largest merged submission, copies included; 0 spools every file on its own
+SPOOL_CHUNK_PAGES = 100 # Unbound orders go out in submissions of about this many pages, letting other jobs print in between; 0 disables
+
+# Collages, image conversion and PDF transforms run in warm worker processes, off the listener's GIL
+CPU_WORKERS = min(4, max((os.cpu_count() or 2) - 1, 1)) # 0 runs them on the print worker threads
+CPU_WORKER_MAX_TASKS = 200 # Replace a worker process after this many tasks
+
+# Stage timings, queue depths and cache hits in Prometheus format on http://127.0.0.1:<port>/metrics
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464')) # 0 disables the endpoint
+JOB_TIMING_SUMMARY = True # Adds the seconds spent per stage to each finished job as 'timings'
+
+# How PDFs reach the printer
+PRINT_BACKEND = os.getenv('PRINT_BACKEND', 'sumatra') # 'sumatra', 'lp' (CUPS) or 'simulated' (no paper)
+PRINT_TIMEOUT = 120 # seconds before a print command is considered hung and killed...
+PRINT_TIMEOUT_PER_MB = 10 # ...plus this many seconds per MB of the PDF
+
+# Document conversion (doc/docx/txt -> PDF)
+CONVERTER_BACKEND = os.getenv('CONVERTER_BACKEND', 'word') # 'word', 'libreoffice' or 'fake'
+CONVERTER_POOL_SIZE = 1 # Long-lived converter instances shared by all jobs
+CONVERTER_MAX_CONVERSIONS = 50 # Restart an instance after this many documents
+CONVERTER_TIMEOUT = 180 # seconds before a conversion is considered hung
+
+# Converted PDFs, rotated/subset variants and page counts, keyed by file contents
+ARTIFACT_CACHE_DIR = "artifact_cache"
+ARTIFACT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024 # 2 GB
+
+# Downloaded Drive files, keyed by file ID and md5Checksum so reprints and retries skip the download
+DRIVE_CACHE_DIR = "drive_cache"
+DRIVE_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024 # 5 GB
+DRIVE_CACHE_TTL = 7 * 24 * 60 * 60 # seconds; reprints rarely come later than a week
+DOWNLOAD_WORKERS = 4 # Byte ranges of a large file fetched in parallel
+
+# === SERVICES ===
+# Nothing below connects or imports a platform library until it is used, so importing this
+# module has no side effects: CPU worker processes, benchmarks and tools get only what they touch
+firestore = LazyModule('firebase_admin.firestore')
+win32print = LazyModule('win32print')
+win32con = LazyModule('win32con')
+
+# Libraries the connector can't run without, checked in main() before anything is started
+REQUIRED_LIBRARIES = {'PIL': 'Pillow', 'PyPDF2': 'PyPDF2', 'firebase_admin': 'firebase-admin',
+                      'googleapiclient': 'google-api-python-client', 'win32print': 'pypiwin32'}
+
+def missing_libraries():
+    """Required libraries that are not installed, found without importing them."""
+    required = dict(REQUIRED_LIBRARIES)
+    if CONVERTER_BACKEND == 'word':
+        required['win32com'] = 'pypiwin32'
+    return list(dict.fromkeys(package for name, package in required.items() if importlib.util.find_spec(name) is None))
+
+@memoized
+def firestore_client():
+    """Connects to Firebase on first call. Raises if the credentials are missing or invalid."""
+    import firebase_admin
+    from firebase_admin import credentials
     # Load Firebase credentials from environment variable or file
     firebase_cred_json = os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON')
     if firebase_cred_json:
@@ -47,37 +142,114 @@ try:
     else:
         print("🔧 Initializing Firebase from file 'serviceAccountKey.json'...")
         cred = credentials.Certificate('serviceAccountKey.json')
-    
+
     firebase_admin.initialize_app(cred)
-    db = firestore.client()
+    client = firestore.client()
     print("✅ Firebase Firestore initialized successfully.")
-except Exception as e:
-    print(f"❌ Error initializing Firebase: {e}")
-    sys.exit(1)
-
-drive_service = None
-try:
-    # Load Drive credentials from environment variable or file
-    drive_cred_json = os.getenv('DRIVE_SERVICE_ACCOUNT_JSON')
-    if drive_cred_json:
-        print("🔧 Initializing Google Drive from environment variable...")
-        drive_creds_dict = json.loads(drive_cred_json)
-        drive_creds = service_account.Credentials.from_service_account_info(drive_creds_dict, scopes=DRIVE_SCOPES)
-    else:
-        print("🔧 Initializing Google Drive from file 'driveServiceAccountKey.json'...")
-        drive_creds = service_account.Credentials.from_service_account_file('driveServiceAccountKey.json', scopes=DRIVE_SCOPES)
-    
-    drive_service = build('drive', 'v3', credentials=drive_creds)
-    print("✅ Google Drive service initialized successfully.")
-except FileNotFoundError:
-    print(f"⚠️ WARNING: Google Drive credentials not found via file or environment variable. File operations will fail.")
-except Exception as e:
-    print(f"❌ Error initializing Google Drive service: {e}")
+    return client
 
+@memoized
+def drive_file_store():
+    """Connects to Google Drive on first call and returns its cached file store, or None without credentials."""
+    try:
+        from google.oauth2 import service_account
+        from google.auth.transport.requests import AuthorizedSession
+        from googleapiclient.discovery import build
+        from ranged_download import make_session
+        # Load Drive credentials from environment variable or file
+        drive_cred_json = os.getenv('DRIVE_SERVICE_ACCOUNT_JSON')
+        if drive_cred_json:
+            print("🔧 Initializing Google Drive from environment variable...")
+            drive_creds_dict = json.loads(drive_cred_json)
+            drive_creds = service_account.Credentials.from_service_account_info(drive_creds_dict, scopes=DRIVE_SCOPES)
+        else:
+            print("🔧 Initializing Google Drive from file 'driveServiceAccountKey.json'...")
+            drive_creds = service_account.Credentials.from_service_account_file('driveServiceAccountKey.json', scopes=DRIVE_SCOPES)
+
+        drive_service = build('drive', 'v3', credentials=drive_creds)
+        print("✅ Google Drive service initialized successfully.")
+    except FileNotFoundError:
+        print(f"⚠️ WARNING: Google Drive credentials not found via file or environment variable. File operations will fail.")
+        return None
+    except Exception as e:
+        print(f"❌ Error initializing Google Drive service: {e}")
+        return None
+    drive_cache = ArtifactCache(DRIVE_CACHE_DIR, DRIVE_CACHE_MAX_BYTES, ttl=DRIVE_CACHE_TTL)
+    drive_session = make_session(DOWNLOAD_WORKERS, AuthorizedSession(drive_creds))
+    print(f"🗃️  Drive cache: {len(drive_cache)} files, {drive_cache.total_bytes // (1024 * 1024)} MB.")
+    return DriveFileStore(GoogleDriveSource(drive_service, drive_session, DOWNLOAD_WORKERS), drive_cache)
 
 # === GLOBALS ===
-processed_jobs = set()
+db = None # Set by Connector.start()
+journal = None # Created by Connector.start()
+status_outbox = None # Created by Connector.start()
+job_leases = None # Created by Connector.start()
+job_watches = [] # Listeners for this connector's jobs
 shutdown_event = threading.Event()
+dispatcher = None # Created by Connector.start()
+converter_pool = None # Created by Connector.start()
+cpu_pool = None # Created by Connector.start()
+print_backend = None # Created by Connector.start()
+artifact_cache = None # Created by Connector.start()
+drive_store = None # Created by Connector.start()
+prefetcher = None # Created by Connector.start()
+printer_queues = PrinterQueues()
+wait_time_estimator = WaitTimeEstimator(workers_per_printer=WORKERS_PER_PRINTER)
+printer_router = None # Created by Connector.start()
+job_routes = {} # job_id -> printer assignment made by the router, written to the job when it starts
+detected_capabilities = {} # printer_id -> capabilities reported by the driver
+printer_status = None # Created by Connector.start()
+metrics_server = None # Created by Connector.start()
+job_queue_waits = {} # job_id -> seconds it waited for a worker, for its timing summary
+startup_seconds = {} # Phase of Connector.start() -> seconds it took
+
+# === METRICS ===
+metrics = Metrics()
+stage_seconds = metrics.histogram(
+    'printease_stage_seconds', 'Seconds spent in each stage of a job.', ('stage', 'printer', 'file_type'))
+job_seconds = metrics.histogram(
+    'printease_job_seconds', 'Seconds from a job starting on a worker to its final status.', ('kind', 'printer', 'status'))
+
+def observe_stages(stages, printer_name, file_type=''):
+    for stage, seconds in stages.items():
+        stage_seconds.observe(seconds, stage=stage, printer=printer_name or '', file_type=file_type)
+
+def on_job_start(pool_name, job_id, waited):
+    """Called by the dispatcher as a worker picks a job up."""
+    job_queue_waits[job_id] = waited
+    stage_seconds.observe(waited, stage='queue_wait', printer=pool_name[len('printer-'):] if pool_name.startswith('printer-') else '')
+
+def timing_summary(stages, total):
+    """The compact form of a job's stage timings written to its document."""
+    return {'timings': {**{stage: round(seconds, 2) for stage, seconds in stages.items()}, 'total': round(total, 2)}} if JOB_TIMING_SUMMARY else {}
+
+@metrics.collector
+def connector_metrics():
+    if dispatcher:
+        pools = dispatcher.pools()
+        yield ('printease_queue_depth', 'gauge', 'Jobs queued or running per worker pool.',
+               [({'pool': pool.name}, pool.depth()) for pool in pools])
+        yield ('printease_workers', 'gauge', 'Worker threads per pool.',
+               [({'pool': pool.name}, pool.workers) for pool in pools])
+        yield ('printease_workers_busy', 'gauge', 'Workers running a job right now, per pool.',
+               [({'pool': pool.name}, pool.active) for pool in pools])
+        yield ('printease_worker_busy_seconds_total', 'counter', 'Seconds workers spent on jobs; divide its rate by printease_workers for utilization.',
+               [({'pool': pool.name}, round(pool.busy_seconds, 3)) for pool in pools])
+        yield ('printease_parked_jobs', 'gauge', 'Jobs waiting for room in a full queue.', [({}, dispatcher.deferred_count())])
+    caches = [('artifact', artifact_cache)] + ([('drive', drive_store.cache)] if drive_store else [])
+    caches = [(name, cache) for name, cache in caches if cache]
+    if caches:
+        yield ('printease_cache_requests_total', 'counter', 'Cache lookups by result.',
+               [({'cache': name, 'result': result}, getattr(cache, result + 's')) for name, cache in caches for result in ('hit', 'miss')])
+        yield ('printease_cache_bytes', 'gauge', 'Bytes held per cache.', [({'cache': name}, cache.total_bytes) for name, cache in caches])
+    if status_outbox:
+        yield ('printease_outbox_pending', 'gauge', 'Job status updates not yet written to Firestore.', [({}, status_outbox.pending_count())])
+    if cpu_pool:
+        yield ('printease_cpu_tasks_total', 'counter', 'Tasks run in the CPU worker processes.', [({}, cpu_pool.tasks)])
+        yield ('printease_cpu_pool_restarts_total', 'counter', 'Times a CPU worker process died and the pool was restarted.', [({}, cpu_pool.restarts)])
+    if startup_seconds:
+        yield ('printease_startup_seconds', 'gauge', 'Seconds the last start took, per phase and in total.',
+               [({'phase': phase}, round(seconds, 3)) for phase, seconds in startup_seconds.items()])
 
 # === PRINTER MANAGEMENT ===
 def sanitize_for_firestore_id(name):
@@ -92,201 +264,167 @@ def get_installed_printers():
     printers = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL, None, 1)
     return [p[2] for p in printers]
 
+# Driver paper IDs for the ISO sizes that have one; A1 and A0 are matched by paper name
+PAPER_IDS = {9: 'A4', 10: 'A4', 8: 'A3', 66: 'A2'} # DMPAPER_A4, DMPAPER_A4SMALL, DMPAPER_A3, DMPAPER_A2
+
+def get_printer_capabilities(name):
+    """Asks the printer driver which colors, paper sizes and duplex modes it supports."""
+    try:
+        handle = win32print.OpenPrinter(name)
+        try:
+            port = win32print.GetPrinter(handle, 2)['pPortName']
+        finally:
+            win32print.ClosePrinter(handle)
+        capabilities = {'bw', 'single-sided'}
+        if win32print.DeviceCapabilities(name, port, win32con.DC_COLORDEVICE) == 1:
+            capabilities.add('color')
+        if win32print.DeviceCapabilities(name, port, win32con.DC_DUPLEX) == 1:
+            capabilities.add('duplex')
+        capabilities.update(PAPER_IDS[paper] for paper in win32print.DeviceCapabilities(name, port, win32con.DC_PAPERS) if paper in PAPER_IDS)
+        for paper_name in win32print.DeviceCapabilities(name, port, win32con.DC_PAPERNAMES):
+            match = re.match(r'\s*(A[0-4])\b', paper_name)
+            if match: capabilities.add(match.group(1))
+        return sorted(capabilities)
+    except Exception as e:
+        print(f"⚠️ Could not read capabilities of {name}, assuming all: {e}")
+        return list(DEFAULT_PRINTER_CAPABILITIES)
+
+# Printer states (win32print.PRINTER_STATUS_*) that stop a printer from making progress on its queue
+PRINTER_PROBLEMS = (
+    ('PAPER_JAM', 'paper jam'),
+    ('PAPER_OUT', 'out of paper'),
+    ('PAPER_PROBLEM', 'paper problem'),
+    ('NO_TONER', 'out of toner'),
+    ('DOOR_OPEN', 'door open'),
+    ('USER_INTERVENTION', 'needs attention'),
+    ('OFFLINE', 'offline'),
+    ('NOT_AVAILABLE', 'not available'),
+    ('PAUSED', 'paused'),
+    ('ERROR', 'error'),
+)
+
+def get_printer_problem(name):
+    """Returns why a printer can't print right now, or None if it can."""
+    try:
+        handle = win32print.OpenPrinter(name)
+        try:
+            info = win32print.GetPrinter(handle, 2)
+        finally:
+            win32print.ClosePrinter(handle)
+    except Exception as e:
+        return f"unreachable ({e})"
+    problems = [text for flag, text in PRINTER_PROBLEMS if info['Status'] & getattr(win32print, 'PRINTER_STATUS_' + flag)]
+    if info['Attributes'] & win32print.PRINTER_ATTRIBUTE_WORK_OFFLINE:
+        problems.append('set to work offline')
+    return ', '.join(problems) or None
+
+def routing_capabilities(printer_id):
+    """What the driver supports, narrowed to what the admin enabled on the printer document."""
+    capabilities = set(detected_capabilities.get(printer_id, DEFAULT_PRINTER_CAPABILITIES))
+    configured = printer_status.configured.get(printer_id)
+    return capabilities & set(configured) if configured is not None else capabilities
+
 def update_printers_in_firestore():
     """
-    Updates the status, queue length, and estimated wait time for each
-    printer managed by this connector instance.
+    Hands the printers installed on this machine to the status publisher and
+    the router. Queue length and wait time are published when they change, not here.
     """
     try:
-        printer_names = get_installed_printers()
-        printers_ref = db.collection('printers')
-        print(f"🖨️  Checking for printers... Found: {', '.join(printer_names)}")
-
-        for name in printer_names:
-            printer_doc_id = sanitize_for_firestore_id(name)
-            
-            # Get the current queue length for this specific printer
-            try:
-                query = db.collection('print_jobs').where(
-                    filter=firestore.And(filters=[
-                        firestore.FieldFilter('printerId', '==', printer_doc_id),
-                        firestore.FieldFilter('status', 'in', ['ready', 'printing'])
-                    ])
-                )
-                queue_snapshot = query.get()
-                queue_length = len(queue_snapshot)
-            except Exception as e:
-                print(f"⚠️ Could not get queue length for {name}: {e}")
-                queue_length = 0 # Default to 0 on error
-            
-            estimated_wait_time = queue_length * AVG_SECONDS_PER_JOB
-
-            printer_doc = printers_ref.document(printer_doc_id)
-            doc_snapshot = printer_doc.get()
-            
-            update_data = {
-                'status': 'online',
-                'lastSeen': firestore.SERVER_TIMESTAMP,
-                'queueLength': queue_length,
-                'estimatedWaitTime': estimated_wait_time,
-            }
-            
-            if doc_snapshot.exists:
-                printer_doc.update(update_data)
-            else:
-                print(f"✨ Found new printer, adding to Firestore: {name}")
-                # For new printers, also set the name and initial capabilities
-                initial_data = {
-                    'name': name,
-                    'capabilities': ['bw', 'color', 'A4', 'A3', 'A2', 'A1', 'A0', 'duplex', 'single-sided'],
-                    **update_data
-                }
-                printer_doc.set(initial_data)
-
+        printers = {sanitize_for_firestore_id(name): name for name in get_installed_printers()}
+        previous = printer_status.printers
+        if previous != printers:
+            print(f"🖨️  Checking for printers... Found: {', '.join(printers.values())}")
+        for printer_id, name in printers.items():
+            if printer_id not in detected_capabilities:
+                detected_capabilities[printer_id] = get_printer_capabilities(name)
+        printer_status.set_printers(printers, detected_capabilities)
+        printer_status.flush() # Creates documents for new printers and loads existing ones
+
+        for printer_id in set(previous) - set(printers):
+            printer_router.remove_printer(printer_id)
+        for printer_id, name in printers.items():
+            printer_router.set_printer(printer_id, name, routing_capabilities(printer_id))
+            problem = get_printer_problem(name)
+            if printer_router.set_health(printer_id, problem):
+                print(f"⚠️ Printer {name} stalled: {problem}" if problem else f"✅ Printer {name} is ready again.")
+        if job_watches and set(previous) != set(printers):
+            restart_job_listener()
     except Exception as e:
         print(f"⚠️ Could not update printers in Firestore: {e}")
 
+def on_printers_snapshot(doc_snapshot, changes, read_time):
+    """Picks up capabilities an admin changed on a printer document, and which other connectors have the printer."""
+    printers = printer_status.printers
+    for change in changes:
+        printer_id = change.document.id
+        data = change.document.to_dict() or {}
+        capabilities = data.get('capabilities')
+        if printer_id in printers and change.type.name != "REMOVED":
+            printer_status.seen(printer_id, data)
+        if printer_id in printers and capabilities is not None and change.type.name != "REMOVED":
+            printer_status.configured[printer_id] = capabilities
+            printer_router.set_printer(printer_id, printers[printer_id], routing_capabilities(printer_id))
+
+def reroute_from_stalled_printers():
+    """Moves jobs that have not started yet off printers that can't print, when another printer can take them."""
+    for printer_id, problem in printer_router.stalled_printers().items():
+        for task in dispatcher.withdraw_waiting(printer_id):
+            job_id, processor, args = task.as_tuple()
+            dispatch_job(job_id, args[1], processor, enqueued_at=task.enqueued_at)
+
+def printer_load(printer_id, job_id=None):
+    return estimate_wait_time(printer_id, printer_queues.jobs(printer_id, exclude=job_id))
+
+def estimate_wait_time(printer_id, jobs):
+    """Seconds until a job queued now would start printing, from the learned throughput model."""
+    return wait_time_estimator.wait_time(printer_id, [(job_features(job_data), elapsed) for job_data, elapsed in jobs])
+
+def record_job_timing(job_data, file_timings, total_seconds):
+    """Teaches the wait time model how long this job took and appends it to the timing trace."""
+    printer_id = job_data.get('printerId')
+    record = {'printerId': printer_id, 'files': file_timings, 'total': round(total_seconds, 3)}
+    try:
+        wait_time_estimator.observe(printer_id, record)
+        wait_time_estimator.save(WAIT_TIME_MODEL_FILE)
+        if TIMING_TRACE_FILE:
+            with open(TIMING_TRACE_FILE, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        print(f"⚠️ Could not record job timings: {e}")
+
 # === FILE PROCESSING & PRINTING ===
 def download_file_from_drive(file_id, local_path):
-    """Downloads a file from Google Drive using its file ID."""
-    if not drive_service:
+    """Downloads a file from Google Drive using its file ID, or copies it from the local Drive cache."""
+    if not drive_store:
         raise Exception("Google Drive service not available for download.")
     try:
-        # First, get file metadata to ensure it exists and we have permissions.
-        # This can help stabilize the connection before the download begins.
-        print(f"⬇️  Verifying Google Drive file (ID: {file_id})...")
-        drive_service.files().get(fileId=file_id, supportsAllDrives=True).execute()
-        
-        print(f"⬇️  Downloading from Google Drive...")
-        request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
-        fh = io.FileIO(local_path, 'wb')
-        downloader = MediaIoBaseDownload(fh, request)
-        
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            if status:
-                print(f"   Download {int(status.progress() * 100)}%.")
-        
-        print(f"✅ File downloaded successfully to '{os.path.basename(local_path)}'")
-        return local_path
-        
-    except HttpError as error:
-        if error.resp.status == 404:
-             raise Exception(f"File not found in Google Drive (ID: {file_id}). It may have been deleted or the ID is incorrect.")
-        raise Exception(f"Google Drive API error: {error}")
+        return drive_store.fetch(file_id, local_path)
     except Exception as e:
         # This will catch other errors, including potential WinError exceptions
         raise Exception(f"Failed during file download: {e}")
 
 
-def create_image_layout_pdf(image_path, copies, layout_info, print_type, orientation, output_pdf_path):
-    """Creates a PDF with multiple copies of a single image on one or more pages."""
-    layout_type = layout_info.get('type', 'full-page')
-    fit_mode = layout_info.get('fit', 'contain')
-    
-    print(f"🎨 Creating collage '{layout_type}' for {copies} copies of one photo...")
-
-    try:
-        if orientation == 'landscape':
-            a4_pixel_width, a4_pixel_height = int(A4_HEIGHT_IN * DPI), int(A4_WIDTH_IN * DPI)
-        else: # Portrait
-            a4_pixel_width, a4_pixel_height = int(A4_WIDTH_IN * DPI), int(A4_HEIGHT_IN * DPI)
-
-        grid_cols, grid_rows = 1, 1
-        if layout_type == '2-up': grid_cols, grid_rows = (2, 1) if orientation == 'landscape' else (1, 2)
-        elif layout_type == '4-up': grid_cols, grid_rows = 2, 2
-        elif layout_type == '9-up': grid_cols, grid_rows = 3, 3
-        elif layout_type == 'contact-sheet': grid_cols, grid_rows = (7, 5) if orientation == 'landscape' else (5, 7)
-        
-        photos_per_page = grid_cols * grid_rows
-        total_pages_needed = (copies + photos_per_page - 1) // photos_per_page # Ceiling division
-
-        cell_width = a4_pixel_width // grid_cols
-        cell_height = a4_pixel_height // grid_rows
-
-        source_image = Image.open(image_path)
-        if print_type == 'bw':
-            source_image = source_image.convert('L').convert('RGB')
-        
-        # Resize the source image to fit the cell once
-        resized_image = source_image.copy()
-        if fit_mode == 'contain':
-            resized_image.thumbnail((cell_width, cell_height), Image.Resampling.LANCZOS)
-        else: # 'cover'
-            img_aspect, cell_aspect = resized_image.width / resized_image.height, cell_width / cell_height
-            if img_aspect > cell_aspect:
-                new_height, new_width = cell_height, int(cell_height * img_aspect)
-            else:
-                new_width, new_height = cell_width, int(cell_width / img_aspect)
-            resized_image = resized_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            left, top = (new_width - cell_width) / 2, (new_height - cell_height) / 2
-            resized_image = resized_image.crop((left, top, left + cell_width, top + cell_height))
-
-        pdf_pages = []
-        copies_placed = 0
-        
-        for _ in range(total_pages_needed):
-            page_canvas = Image.new('RGB', (a4_pixel_width, a4_pixel_height), 'white')
-            
-            for i in range(photos_per_page):
-                if copies_placed >= copies:
-                    break
-                
-                row, col = (i // grid_cols), (i % grid_cols)
-                paste_x = col * cell_width + (cell_width - resized_image.width) // 2
-                paste_y = row * cell_height + (cell_height - resized_image.height) // 2
-                page_canvas.paste(resized_image, (paste_x, paste_y))
-                copies_placed += 1
-            
-            pdf_pages.append(page_canvas)
-
-        if pdf_pages:
-            pdf_pages[0].save(output_pdf_path, "PDF", resolution=DPI, save_all=True, append_images=pdf_pages[1:])
-        
-        print(f"✅ Saved collage PDF to '{os.path.basename(output_pdf_path)}'")
-        
-    except Exception as e:
-        raise Exception(f"Failed to create image collage PDF: {e}")
-
-
-def convert_to_pdf(input_path, word_app):
-    """Converts various file types to PDF. A word_app instance must be provided for doc/docx/txt."""
+def convert_to_pdf(input_path, converter=None, output_path=None):
+    """Converts various file types to PDF. A converter (or ConverterPool) must be provided for doc/docx/txt."""
     file_ext = os.path.splitext(input_path)[1].lower()
-    output_path = os.path.splitext(input_path)[0] + "_converted.pdf"
+    output_path = output_path or os.path.splitext(input_path)[0] + "_converted.pdf"
 
     if file_ext == '.pdf':
         return input_path  # No conversion needed
 
     try:
         if file_ext in ['.doc', '.docx', '.txt']:
-            if not word_app:
-                raise Exception("Word application instance not provided for document conversion.")
+            if not converter:
+                raise Exception("Document converter not provided for document conversion.")
             
-            print(f"🔄 Converting document using MS Word: {os.path.basename(input_path)}")
-            doc = None
-            doc = word_app.Documents.Open(os.path.abspath(input_path))
-            doc.SaveAs(os.path.abspath(output_path), FileFormat=17)  # 17 = wdFormatPDF
-            doc.Close(False) # Close without saving changes
+            print(f"🔄 Converting document to PDF: {os.path.basename(input_path)}")
+            converter.convert(input_path, output_path)
             print("✅ Document to PDF conversion successful.")
         
         elif file_ext in ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff']:
             print(f"🖼️  Converting image to PDF: {os.path.basename(input_path)}")
-            image = Image.open(input_path)
-            # Create a new blank A4 page and paste the image onto it
-            a4_pixel_width = int(A4_WIDTH_IN * DPI)
-            a4_pixel_height = int(A4_HEIGHT_IN * DPI)
-            
-            # If image is larger than A4, scale it down to fit
-            image.thumbnail((a4_pixel_width, a4_pixel_height), Image.Resampling.LANCZOS)
-            
-            a4_page = Image.new('RGB', (a4_pixel_width, a4_pixel_height), 'white')
-            # Center the image on the page
-            paste_x = (a4_pixel_width - image.width) // 2
-            paste_y = (a4_pixel_height - image.height) // 2
-            a4_page.paste(image, (paste_x, paste_y))
-            
-            a4_page.save(output_path, "PDF", resolution=DPI)
+            # A blank A4 page with the image centred on it, scaled down if it is larger
+            cpu_pool.run(image_to_pdf, input_path, output_path)
             print("✅ Image to PDF conversion successful.")
         
         else:
@@ -294,112 +432,220 @@ def convert_to_pdf(input_path, word_app):
 
         return output_path
     except Exception as e:
-        if 'win32com' in str(e):
-             raise Exception(f"MS Word conversion failed for '{os.path.basename(input_path)}'. Ensure Word is installed and not busy. Error: {e}")
+        if file_ext in ['.doc', '.docx', '.txt']:
+             raise Exception(f"Document conversion failed for '{os.path.basename(input_path)}'. Ensure the {CONVERTER_BACKEND} converter is installed and not busy. Error: {e}")
         raise Exception(f"Conversion to PDF failed for '{os.path.basename(input_path)}': {e}")
 
 
-def get_pdf_page_count(pdf_path):
-    try:
-        with open(pdf_path, 'rb') as f:
-            reader = PdfReader(f)
-            return len(reader.pages)
-    except Exception as e:
-        raise Exception(f"Failed to count pages in PDF: {e}")
-
-def find_sumatra():
-    """Locate SumatraPDF executable automatically."""
-    possible_paths = [
-        os.path.join(os.environ.get("ProgramFiles", ""), "SumatraPDF", "SumatraPDF.exe"),
-        os.path.join(os.environ.get("ProgramFiles(x86)", ""), "SumatraPDF", "SumatraPDF.exe"),
-        os.path.join(os.environ.get("LOCALAPPDATA", ""), "SumatraPDF", "SumatraPDF.exe"),
-        r"C:\\Users\\DELL\\AppData\\Local\\SumatraPDF\\SumatraPDF.exe",
-    ]
-    for path in possible_paths:
-        if os.path.exists(path): return path
-    return None
-
-def print_file(printer_name, file_path, job_id, copies=1, duplex_mode='one-sided', page_range_str='', orientation='portrait', paper_size='A4'):
-    sumatra_path = find_sumatra()
-    if not sumatra_path:
-        raise Exception("SumatraPDF not found. Please install it.")
-
+def convert_to_cached_pdf(input_path, digest, leases):
+    """
+    Converts a file to PDF through the artifact cache, so a document seen before
+    skips conversion. The cached file stays leased until `leases` is closed.
+    """
+    if os.path.splitext(input_path)[1].lower() == '.pdf':
+        return input_path
+    return leases.enter_context(artifact_cache.get_or_create(
+        artifact_key(digest, 'pdf'),
+        lambda output_path: convert_to_pdf(input_path, converter=converter_pool, output_path=output_path),
+    ))
+
+def get_pdf_info(pdf_path, digest):
+    """Page count and first-page orientation of a PDF, cached by the source file's content hash."""
+    return artifact_cache.get_or_create_value(artifact_key(digest, 'info'), lambda: cpu_pool.run(pdf_info, pdf_path))
+
+def transform_document_pdf(pdf_path, rotate_pages, page_range_str, output_path):
+    """Writes the pages selected by page_range_str to output_path in one pass, rotating only those pages."""
+    pages_written = cpu_pool.run(transform_document, pdf_path, output_path, page_range_str or 'all', 90 if rotate_pages else 0)
+    print(f"   ✅ Wrote {pages_written} page(s){' rotated' if rotate_pages else ''} for range '{page_range_str or 'all'}'.")
+
+def print_file(printer_name, file_path, job_id, copies=1, duplex_mode='one-sided', page_range_str='', orientation='portrait', paper_size='A4', print_type=None):
     try:
         print(f"🖨️  Printing '{os.path.basename(file_path)}' for job {job_id}...")
-        
-        settings = [f"{copies}x"]
-        
-        # Set duplexing based on the mode provided from Firestore
-        if duplex_mode == 'duplex-long-edge':
-            settings.append("duplex")
-        elif duplex_mode == 'duplex-short-edge':
-            settings.append("duplexshort")
-        else: # 'one-sided' or any other value
-            settings.append("simplex")
-
-        # Always add orientation to prevent manual tray selection
-        if orientation == 'landscape':
-            settings.append("landscape")
-        else: # Default to portrait
-            settings.append("portrait")
-            
-        # Always add paper size to ensure correct tray selection
-        settings.append(f"papersize={paper_size}")
-
-        if page_range_str and page_range_str.lower() != 'all':
-            settings.append(page_range_str)
-
-        command = [sumatra_path, "-print-to", printer_name, "-silent", "-exit-on-print"]
-        # Filter out any empty settings and join them
-        final_settings = ",".join(filter(None, settings))
-        if final_settings:
-            command.extend(["-print-settings", final_settings])
-        command.append(file_path)
-        
-        print(f"   Executing command: {' '.join(command)}")
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-
-        if result.returncode != 0:
-            raise Exception(f"SumatraPDF Error: {result.stderr.strip() if result.stderr else 'Unknown error'}")
-
+        print_backend.print_pdf(
+            printer_name, file_path, f"PrintEase {job_id}",
+            copies=copies,
+            duplex_mode=duplex_mode,
+            orientation=orientation,
+            paper_size=paper_size,
+            print_type=print_type,
+            page_range=page_range_str or 'all',
+        )
         print(f"✅ Job {job_id} sent to printer successfully.")
         return True
     except Exception as e:
         raise Exception(f"Printing failed: {e}")
         
-def parse_page_range(range_str, max_pages):
-    """Parses a page range string (e.g., '1-3,5,7') into a list of 0-indexed page numbers."""
-    if not range_str or range_str.lower() == 'all':
-        return list(range(max_pages))
-    
-    pages = set()
-    parts = range_str.split(',')
-    for part in parts:
-        part = part.strip()
-        if '-' in part:
-            start_str, end_str = part.split('-')
-            if start_str.isdigit() and end_str.isdigit():
-                start, end = int(start_str), int(end_str)
-                for i in range(start, end + 1):
-                    if 1 <= i <= max_pages:
-                        pages.add(i - 1)
-        elif part.isdigit():
-            page_num = int(part)
-            if 1 <= page_num <= max_pages:
-                pages.add(page_num - 1)
-    return sorted(list(pages))
+# === JOB JOURNAL ===
+def document_version(result):
+    """The update time of a snapshot or WriteResult in seconds, as the journal compares them."""
+    update_time = getattr(result, 'update_time', None)
+    return update_time.timestamp() if update_time else None
+
+def update_job(job_id, fields, on_commit=None):
+    """Queues a write to the job document; the worker doesn't wait for Firestore."""
+    status_outbox.update('print_jobs', job_id, fields, on_commit)
+
+def finish_job(job_id, fields, state='done'):
+    """Queues the job's final status and gives up its lease. Its cycle in the journal ends once the write is committed."""
+    job_leases.release(job_id)
+    update_job(job_id, {**fields, **job_leases.release_fields()},
+               lambda result: journal.finish(job_id, state, document_version(result)))
+
+def fail_job(job_id, error):
+    print(f"❌ Job {job_id} failed: {error}")
+    finish_job(job_id, {'status': 'error', 'error_message': str(error)}, 'failed')
+
+def finalize_spooled_jobs():
+    """Writes the final status of jobs that printed completely before the last run could record it."""
+    for entry in journal.unfinished(('spooled',)):
+        print(f"✅ Job {entry.job_id} printed before the restart, marking it as {entry.final_status}.")
+        finish_job(entry.job_id, completed_fields(entry.final_status, journal.progress(entry.job_id)))
+
+def completed_fields(final_status, progress):
+    """The final write of a print job that printed completely; `progress` is its JobProgress.to_dict(), if any."""
+    fields = {'status': final_status, 'printedAt': firestore.SERVER_TIMESTAMP}
+    if progress:
+        fields['progress'] = {**progress, 'complete': True}
+        if progress.get('selection'):
+            fields['reprintSelection'] = None # The next reprint prints the whole job again
+    return fields
+
+def load_progress(job_id, job_data, has_cover):
+    """
+    Where a print job starts: the progress saved here earlier in this cycle,
+    else the unfinished run recorded on the job by a connector that stopped
+    or failed (unless a different reprintSelection was made since), else a
+    new run of the whole job or of its reprintSelection.
+    Raises ValueError for a reprintSelection that doesn't fit the job.
+    """
+    file_count = len(job_data.get('files', []))
+    selection = parse_selection(job_data.get('reprintSelection'), file_count)
+    progress = JobProgress.from_dict(journal.progress(job_id), file_count)
+    if progress is None:
+        progress = JobProgress.from_dict(job_data.get('progress'), file_count)
+        if progress and selection and progress.selection != selection:
+            progress = None # The admin picked other files this time
+    return progress or JobProgress.start(file_count, has_cover, selection)
+
+def takeover_possible(printer_id):
+    """True if another connector has the printer installed and could take a job on it over from this one."""
+    return printer_status is not None and printer_status.shared(printer_id)
+
+def save_progress(job_id, progress, confirm=False):
+    """
+    Saves a print job's progress in the journal and queues it for the job
+    document. With `confirm`, waits until the document has it, so that a
+    connector taking the job over knows what may have printed; only worth
+    it when takeover_possible().
+    """
+    with progress.save_lock:
+        fields = progress.to_dict()
+        journal.save_progress(job_id, fields)
+        update_job(job_id, {'progress': fields})
+    while confirm and not status_outbox.wait_committed('print_jobs', job_id, timeout=1):
+        check_lease(job_id) # Firestore unreachable for longer than the lease: another connector may take over
+
+def acquire_job_lease(job_id, waiting_status):
+    """
+    Claims a job for this connector before it starts. Returns False when
+    another connector has it, or Firestore could not be reached; the job is
+    then forgotten here so a later snapshot or sweep can offer it again.
+    """
+    running_statuses = ('printing',) if waiting_status == 'ready' else ()
+    for attempt in range(LEASE_CLAIM_ATTEMPTS):
+        try:
+            if job_leases.claim(job_id, (waiting_status,), running_statuses):
+                return True
+            print(f"🤝 Job {job_id} is handled by another connector.")
+            break
+        except Exception as e:
+            print(f"⚠️ Could not claim job {job_id}: {e}")
+            if shutdown_event.wait(2 ** attempt):
+                break
+    journal.release(job_id)
+    job_routes.pop(job_id, None)
+    return False
+
+def check_lease(job_id):
+    """Stops a job whose lease ran out, since another connector may be printing it now."""
+    if not job_leases.holds(job_id):
+        raise LeaseLost(f"Lost the lease of job {job_id}")
+
+def give_up_job(job_id, error):
+    print(f"🤝 Stopping job {job_id}, another connector may take it over: {error}")
+    journal.release(job_id)
+
+def adopt_abandoned_jobs():
+    """
+    Looks for jobs on this connector's printers, or on no printer yet, that
+    nobody is handling: jobs whose connector stopped renewing its lease, and
+    ready jobs a failed claim left behind. Claims happen in the workers as usual.
+    """
+    # One query per status: combined with a 30-printer 'in' filter, a status 'in' would need more than 30 disjunctions
+    queries = [(status, printer_filter) for status in ('ready', 'printing') for printer_filter in printer_filters()]
+    for status, printer_filter in queries:
+        try:
+            snapshots = (db.collection('print_jobs')
+                         .where(filter=firestore.FieldFilter('status', '==', status))
+                         .where(filter=printer_filter)
+                         .get())
+        except Exception as e:
+            print(f"⚠️ Could not look for abandoned {status} jobs: {e}")
+            continue
+        now = time.time()
+        for snapshot in snapshots:
+            job_data = snapshot.to_dict()
+            kind = job_kind('ready', job_data.get('orderType'))
+            lease = job_data.get('lease')
+            if not kind or journal.is_active(snapshot.id):
+                continue
+            if not lease_available(lease, CONNECTOR_ID, now) or (job_data.get('status') == 'printing' and not lease):
+                continue # Still renewed by its connector, or printed before leases existed
+            if journal.claim(snapshot.id, kind, document_version(snapshot)):
+                print(f"♻️ Taking over job {snapshot.id}" + (f" from {lease['owner']}" if lease else ""))
+                dispatch_job(snapshot.id, job_data, JOB_PROCESSORS[kind], resume=job_data.get('status') == 'printing')
+
+def recover_unfinished_jobs():
+    """
+    Picks up where the last run stopped. Jobs that never started are left to
+    the listener, jobs that were printing resume with their first file not
+    yet spooled, and jobs that printed completely only get their status written.
+    """
+    for entry in journal.unfinished():
+        if entry.state == 'queued' or entry.kind == 'page-count':
+            journal.release(entry.job_id) # Its document still matches the listener's query
+        elif entry.state == 'running':
+            try:
+                snapshot = db.collection('print_jobs').document(entry.job_id).get()
+            except Exception as e:
+                print(f"⚠️ Could not read interrupted job {entry.job_id}, will retry on restart: {e}")
+                continue
+            job_data = snapshot.to_dict() if snapshot.exists else None
+            if not job_data or job_data.get('status') not in ('ready', 'printing'):
+                print(f"ℹ️ Interrupted job {entry.job_id} was cancelled or changed meanwhile, not resuming it.")
+                journal.finish(entry.job_id, 'failed')
+                continue
+            if entry.printer_id:
+                job_data.update({'printerId': entry.printer_id, 'name': entry.printer_name})
+            print(f"♻️ Resuming job {entry.job_id} interrupted by a restart.")
+            dispatch_job(entry.job_id, job_data, JOB_PROCESSORS[entry.kind], resume=True)
+    finalize_spooled_jobs()
 
 # === JOB PROCESSORS ===
 
 def process_page_count_request(job_id, job_data):
     print(f"\n--- Processing page count request {job_id} ---")
-    job_ref = db.collection('print_jobs').document(job_id)
     local_file_path = None
-    pdf_path = None
-    word = None
+    leases = contextlib.ExitStack()
+    stages = {}
+    started = time.monotonic()
+    final_status = 'error'
+    if not acquire_job_lease(job_id, 'page-count-request'):
+        job_queue_waits.pop(job_id, None)
+        return
 
     try:
-        pythoncom.CoInitialize() # Initialize COM for this thread
+        journal.job_started(job_id)
         drive_file_id = job_data.get('googleDriveFileId')
         unique_file_name = job_data.get('fileName') 
         
@@ -407,53 +653,322 @@ def process_page_count_request(job_id, job_data):
             raise Exception("Missing Google Drive File ID in page count request.")
 
         local_file_path = os.path.join(TEMP_DIR, f"{job_id}_{unique_file_name}")
-        download_file_from_drive(drive_file_id, local_file_path)
-
-        word = win32com.client.Dispatch("Word.Application")
-        word.Visible = False
-
-        pdf_path = convert_to_pdf(local_file_path, word_app=word)
-        page_count = get_pdf_page_count(pdf_path)
-
-        job_ref.update({'status': 'page-count-completed', 'pageCount': page_count})
+        with stage_timer(stages, 'download'):
+            download_file_from_drive(drive_file_id, local_file_path)
+
+        # PDFs, images and Word-saved .docx files are counted without a conversion
+        with stage_timer(stages, 'count'):
+            page_count = fast_page_count(local_file_path)
+        if page_count is None:
+            print("   No fast page count available, converting to PDF...")
+            with stage_timer(stages, 'convert'):
+                digest = file_digest(local_file_path)
+                pdf_path = convert_to_cached_pdf(local_file_path, digest, leases)
+            with stage_timer(stages, 'inspect'):
+                page_count = get_pdf_info(pdf_path, digest)['pageCount']
+
+        final_status = 'page-count-completed'
+        if job_id in job_queue_waits:
+            stages['queue_wait'] = job_queue_waits[job_id]
+        finish_job(job_id, {'status': final_status, 'pageCount': page_count, **timing_summary(stages, time.monotonic() - started)})
         print(f"✅ Page count for job {job_id} is {page_count}. Updated Firestore.")
 
     except Exception as e:
-        print(f"❌ Job {job_id} failed: {e}")
-        job_ref.update({'status': 'error', 'error_message': str(e)})
+        fail_job(job_id, e)
     finally:
-        if word:
-            word.Quit()
+        job_leases.release(job_id)
+        leases.close()
         if local_file_path and os.path.exists(local_file_path): os.remove(local_file_path)
-        if pdf_path and pdf_path != local_file_path and os.path.exists(pdf_path): os.remove(pdf_path)
-        processed_jobs.discard(job_id)
-        pythoncom.CoUninitialize() # Uninitialize COM for this thread
+        job_queue_waits.pop(job_id, None)
+        observe_stages({stage: seconds for stage, seconds in stages.items() if stage != 'queue_wait'}, '', 'page-count')
+        job_seconds.observe(time.monotonic() - started, kind='page-count', printer='', status=final_status)
+
+# === FILE PIPELINE ===
+class PreparedFile:
+    """One file of a print job on its way to the printer, with the temp files and cache leases it holds."""
+
+    def __init__(self, job_id, index, file_info):
+        self.job_id = job_id
+        self.index = index
+        self.file_info = file_info
+        self.local_path = None
+        self.pdf_path = None
+        self.copies = file_info.get('copies', 1)
+        self.temp_files = []
+        self.leases = contextlib.ExitStack() # Cached PDFs in use by this file
+        self.timings = {'download': 0.0, 'convert': 0.0, 'spool': 0.0} # seconds per stage
+        self.stages = {} # seconds per finer stage (word, collage, transform, ...), for metrics
+
+    @property
+    def file_type(self):
+        return 'cover' if self.index < 0 else file_features(self.file_info)['kind']
+
+    @property
+    def name(self):
+        return self.file_info.get('originalFileName', f'file_{self.index+1}')
+
+    def cleanup(self):
+        self.leases.close()
+        for f in self.temp_files:
+            if os.path.exists(f):
+                try: os.remove(f)
+                except Exception as e: print(f"Could not remove temp file {f}: {e}")
+        self.temp_files = []
+
+def download_job_file(prepared):
+    """Pipeline stage 1: fetch one job file from Google Drive."""
+    file_info = prepared.file_info
+    print(f"\n📄 Downloading file {prepared.index+1} of job {prepared.job_id}: {prepared.name}")
+
+    drive_file_id = file_info.get('googleDriveFileId')
+    if not drive_file_id: raise Exception(f"Missing Google Drive ID for file '{prepared.name}'.")
+
+    prepared.local_path = os.path.join(TEMP_DIR, f"{prepared.job_id}_{prepared.index}_{prepared.name}")
+    prepared.temp_files.append(prepared.local_path)
+    with stage_timer(prepared.stages, 'download'):
+        download_file_from_drive(drive_file_id, prepared.local_path)
+    prepared.timings['download'] = prepared.stages['download']
+    return prepared
+
+def convert_job_file(prepared):
+    """Pipeline stage 2: produce the PDF that will be spooled for one job file."""
+    file_info = prepared.file_info
+    job_id, i, local_path = prepared.job_id, prepared.index, prepared.local_path
+    desired_orientation = file_info.get('orientation', 'portrait')
+    print(f"🔧 Preparing file {i+1} of job {job_id}: {prepared.name}")
+    started = time.monotonic()
+
+    if file_info.get('isImageFile', False):
+        layout_info = file_info.get('imageLayout')
+        layout_type = layout_info.get('type', 'full-page') if layout_info else 'full-page'
+        
+        if layout_type == 'full-page':
+            # For full-page, just convert the single image to a PDF. The copies will be handled by the print command.
+            with stage_timer(prepared.stages, 'image'):
+                prepared.pdf_path = convert_to_cached_pdf(local_path, file_digest(local_path), prepared.leases)
+        else:
+            # For collages, create a PDF with the specified number of image copies laid out on pages.
+            collage_pdf_path = os.path.join(TEMP_DIR, f"{job_id}_collage_{i}.pdf")
+            prepared.temp_files.append(collage_pdf_path)
+            
+            with stage_timer(prepared.stages, 'collage'):
+                cpu_pool.run(
+                    create_image_layout_pdf,
+                    image_path=local_path,
+                    copies=prepared.copies,
+                    layout_info=layout_info,
+                    print_type=file_info.get('printType'),
+                    orientation=desired_orientation,
+                    output_pdf_path=collage_pdf_path,
+                    render_mode=COLLAGE_RENDER_MODE
+                )
+            prepared.pdf_path = collage_pdf_path
+            # For collages, the PDF itself contains all copies, so the printer should only print it once.
+            prepared.copies = 1 
+    else: # Document file
+        with stage_timer(prepared.stages, 'convert'):
+            digest = file_digest(local_path)
+            converted_pdf_path = convert_to_cached_pdf(local_path, digest, prepared.leases)
+
+        # --- Orientation and Rotation Logic for Documents ---
+        print(f"   Desired orientation: {desired_orientation}")
+        with stage_timer(prepared.stages, 'inspect'):
+            pdf_info = get_pdf_info(converted_pdf_path, digest)
+        source_orientation = pdf_info['orientation']
+        needs_rotation = pdf_info['pageCount'] > 0 and source_orientation != desired_orientation
+        if pdf_info['pageCount'] > 0:
+            print(f"   Detected source orientation: {source_orientation}")
+        if needs_rotation:
+            print(f"   🔄 Rotating from {source_orientation} to {desired_orientation}...")
+
+        # Apply page range selection. Both steps are cached, so a repeated document goes straight to the printer.
+        page_range_str = file_info.get('pageRange', 'all')
+        has_range = page_range_str and page_range_str.lower() != 'all'
+        if needs_rotation or has_range:
+            with stage_timer(prepared.stages, 'transform'):
+                prepared.pdf_path = prepared.leases.enter_context(artifact_cache.get_or_create(
+                    artifact_key(digest, 'transform', needs_rotation, page_range_str if has_range else 'all'),
+                    lambda output_path: transform_document_pdf(converted_pdf_path, needs_rotation, page_range_str, output_path),
+                ))
+        else:
+            prepared.pdf_path = converted_pdf_path
+    prepared.timings['convert'] = time.monotonic() - started
+    return prepared
+
+def select_pages(prepared, entry):
+    """Narrows a prepared file to the pages and copies a reprint selection asks for."""
+    if not entry:
+        return prepared
+    if entry['copies']:
+        prepared.copies = entry['copies']
+    if entry['pageRange']:
+        selected_pdf_path = os.path.join(TEMP_DIR, f"{prepared.job_id}_reprint_{prepared.index}.pdf")
+        prepared.temp_files.append(selected_pdf_path)
+        with stage_timer(prepared.stages, 'transform'):
+            transform_document_pdf(prepared.pdf_path, False, entry['pageRange'], selected_pdf_path)
+        prepared.pdf_path = selected_pdf_path
+    return prepared
+
+def prefetch_job_file(prepared):
+    """Downloads and converts a file of a job that has not started yet."""
+    try:
+        return convert_job_file(download_job_file(prepared))
+    except Exception:
+        prepared.cleanup()
+        raise
+
+def prefetch_next_job(job_data):
+    """Starts preparing the first files of the next job queued on the same printer."""
+    task = dispatcher.peek_next(printer_key_for(job_data))
+    if not task:
+        return
+    next_job_id, processor, args = task
+    if processor is not process_print_job:
+        return
+    next_files = args[1].get('files', [])[:PREFETCH_NEXT_JOB_FILES]
+    for i, file_info in enumerate(next_files):
+        if prefetcher.start((next_job_id, i), prefetch_job_file, PreparedFile(next_job_id, i, file_info)):
+            print(f"⏩ Prefetching file {i+1} of next job {next_job_id}")
+
+def spool_files(job_id, printer_id, printer_name, group, stages, progress, chunk_pages=0, next_turn=None):
+    """
+    Sends a run of prepared files with the same printer settings to the
+    printer as a single spool job, adding the time spent to `stages`. A
+    single file of more than `chunk_pages` pages is sent in page-range
+    chunks instead, skipping those an earlier run printed. next_turn(pages)
+    is called before every submission and may pause the job while others
+    print. Every submission is recorded in `progress`. Returns the seconds it
+    took, pauses left out.
+    """
+    first = group[0]
+    file_info = first.file_info
+    started = time.monotonic()
+    paused = 0.0
+    chunks = [('', first.copies)]
+    parts_done = 0
+    if len(group) == 1:
+        pdf_path, copies = first.pdf_path, first.copies
+        parts_done, planned_chunk_pages = progress.parts_done(first.index)
+        chunk_pages = planned_chunk_pages or chunk_pages # A resumed file is split as before
+        if chunk_pages and (parts_done or file_features(file_info)['pages'] > chunk_pages):
+            with stage_timer(stages, 'inspect'):
+                pages = cpu_pool.run(pdf_info, pdf_path)['pageCount']
+            chunks = plan_spool_chunks(pages, copies, chunk_pages, file_info.get('duplex', 'one-sided') != 'one-sided')
+            if parts_done:
+                print(f"♻️ Parts 1-{parts_done} of {len(chunks)} were printed before, carrying on with part {parts_done + 1}.")
+            elif len(chunks) > 1:
+                print(f"✂️  Sending {pages} page(s) x {copies} in {len(chunks)} parts so other jobs can print in between.")
+    else:
+        # Copies are repeated inside the merged PDF, so each file still prints all its copies before the next file
+        pdf_path, copies = os.path.join(TEMP_DIR, f"{job_id}_spool_{first.index + 1}.pdf"), 1
+        first.temp_files.append(pdf_path)
+        duplex = file_info.get('duplex', 'one-sided') != 'one-sided'
+        with stage_timer(stages, 'merge'):
+            pages = cpu_pool.run(merge_pdfs, [(prepared.pdf_path, prepared.copies) for prepared in group], pdf_path, duplex)
+        print(f"📚 Merged {len(group)} files into one {pages}-page spool job.")
+        chunks = [('', 1)]
+    label = f"{job_id}-{'-'.join('cover' if prepared.index < 0 else str(prepared.index + 1) for prepared in group)}"
+    indexes = [prepared.index for prepared in group]
+    for n, (page_range, chunk_copies) in enumerate(chunks):
+        if n < parts_done:
+            continue
+        if next_turn:
+            pause_started = time.monotonic()
+            pages = sum(file_features(prepared.file_info)['pages'] for prepared in group) // len(chunks)
+            next_turn(pages)
+            paused += time.monotonic() - pause_started
+        check_lease(job_id)
+        progress.sending([(prepared.index, page_range, chunk_copies if len(group) == 1 else prepared.copies) for prepared in group],
+                         n, n == len(chunks) - 1, chunk_pages if len(chunks) > 1 else None)
+        try:
+            # Only sent once the journal, and the job document when another connector could take over, says it may
+            # have printed, so neither a restart nor a takeover prints it twice. Losing the lease while waiting
+            # records it as not sent in both before giving up.
+            save_progress(job_id, progress, confirm=takeover_possible(printer_id))
+            with stage_timer(stages, 'spool'):
+                print_file(
+                    printer_name=printer_name,
+                    file_path=pdf_path,
+                    job_id=label + (f"-part{n + 1}" if len(chunks) > 1 else ''),
+                    copies=chunk_copies,
+                    duplex_mode=file_info.get('duplex', 'one-sided'),
+                    page_range_str=page_range,
+                    orientation=file_info.get('orientation', 'portrait'),
+                    paper_size=file_info.get('paperSize', 'A4'),
+                    print_type=file_info.get('printType'),
+                )
+        except Exception:
+            progress.not_sent(indexes)
+            save_progress(job_id, progress)
+            raise
+        progress.sent(indexes)
+        save_progress(job_id, progress)
+    return time.monotonic() - started - paused
 
 def process_print_job(job_id, job_data):
     print(f"\n--- Processing print job {job_id} ---")
-    job_ref = db.collection('print_jobs').document(job_id)
-    temp_files_to_clean = []
-    word = None
-    
+    cover = None
+    pipeline = None
+    printer_name = job_data.get('name')
+    job_started_at = time.monotonic()
+    final_status = 'error'
+    if not acquire_job_lease(job_id, 'ready'):
+        job_queue_waits.pop(job_id, None)
+        return
+
     try:
-        pythoncom.CoInitialize() # Initialize COM for this thread
-        job_ref.update({'status': 'printing'})
+        printer_queues.job_started(job_id, job_data)
+        journal.job_started(job_id, job_data.get('printerId'), job_data.get('name'))
+        # Records the printer the router picked, if it moved the job, with the status change
+        update_job(job_id, {'status': 'printing', **job_routes.get(job_id, {})})
 
         files_to_process = job_data.get('files', [])
         if not files_to_process:
             raise Exception("No files found in the job.")
-        
-        word = win32com.client.Dispatch("Word.Application")
-        word.Visible = False
-
-        # --- Cover Page Printing ---
         binding = job_data.get('binding')
         has_documents = any(not f.get('isImageFile', False) for f in files_to_process)
-        
-        if binding in ['spiral', 'soft'] and has_documents:
+
+        # After a crash, a failure or a takeover, files and parts that reached the spooler are not printed again
+        progress = load_progress(job_id, job_data, binding in ['spiral', 'soft'] and has_documents)
+        resumed = progress.started()
+        for entry in progress.settle():
+            print(f"⚠️ File {entry['file'] + 1}{' pages ' + entry['pageRange'] if entry['pageRange'] else ''} was being sent to the printer "
+                  f"when the connector stopped and may have printed; not sending it again. It is listed under 'uncertain' on the job.")
+        remaining = progress.remaining()
+        if resumed:
+            print(f"♻️ Job {job_id} already printed {len(files_to_process) - len(remaining)} of {len(files_to_process)} file(s), resuming.")
+        elif progress.selection:
+            print(f"🔁 Reprinting file(s) {', '.join(str(entry['file'] + 1) for entry in progress.selection)} of job {job_id}.")
+        save_progress(job_id, progress)
+
+        def download_stage(prepared):
+            prepared = prefetcher.claim((job_id, prepared.index)) or download_job_file(prepared)
+            if prepared.index == len(files_to_process) - 1:
+                prefetch_next_job(job_data) # The connection is free now; start on the next job
+            progress.mark(prepared.index, 'downloaded')
+            save_progress(job_id, progress)
+            return prepared
+
+        def convert_stage(prepared):
+            prepared = select_pages(prepared if prepared.pdf_path else convert_job_file(prepared), progress.selected(prepared.index))
+            progress.mark(prepared.index, 'converted')
+            save_progress(job_id, progress)
+            return prepared
+
+        # Files download and convert in the background while earlier files (and the cover page) print.
+        pipeline = StagedPipeline(
+            [PreparedFile(job_id, i, files_to_process[i]) for i in remaining],
+            [download_stage, convert_stage],
+            depth=PIPELINE_DEPTH,
+            discard=PreparedFile.cleanup,
+        )
+
+        # --- Cover Page ---
+        if not progress.is_done(-1):
             print("ℹ️ Binding detected. Printing cover page first...")
+            cover = PreparedFile(job_id, -1, COVER_FILE_INFO)
             cover_page_text_path = os.path.join(TEMP_DIR, f"{job_id}_cover.txt")
-            temp_files_to_clean.append(cover_page_text_path)
+            cover.temp_files.append(cover_page_text_path)
             
             with open(cover_page_text_path, 'w', encoding='utf-8') as f:
                 f.write("========= PrintEase Order Summary =========\n\n")
@@ -469,153 +984,89 @@ def process_print_job(job_id, job_data):
                     f.write(f"   - Copies: {f_info.get('copies', 1)}\n")
                     f.write("\n")
 
-            cover_pdf_path = convert_to_pdf(cover_page_text_path, word_app=word)
-            if cover_pdf_path != cover_page_text_path: temp_files_to_clean.append(cover_pdf_path)
-
-            print_file(
-                printer_name=job_data.get('name'),
-                file_path=cover_pdf_path,
-                job_id=f"{job_id}-cover",
-                copies=1,
-                paper_size='A4',
-                orientation='portrait',
-                duplex_mode='one-sided'
-            )
-            print("✅ Cover page sent to printer.")
+            cover.pdf_path = convert_to_pdf(cover_page_text_path, converter=converter_pool)
+            if cover.pdf_path != cover_page_text_path: cover.temp_files.append(cover.pdf_path)
 
-        # --- Individual File Printing Loop ---
-        for i, file_info in enumerate(files_to_process):
-            file_specific_temp_files = []
+        # --- Spooling ---
+        # The cover page and runs of files with the same printer settings go to the printer together.
+        # Other jobs may print between the submissions of an unbound order, which are kept to about SPOOL_CHUNK_PAGES.
+        interleave = can_interleave(job_data)
+        groups = plan_spool_groups(
+            ([(-1, COVER_FILE_INFO)] if cover else []) + [(i, files_to_process[i]) for i in remaining],
+            min(SPOOL_MERGE_MAX_PAGES, SPOOL_CHUNK_PAGES) if interleave else SPOOL_MERGE_MAX_PAGES,
+        )
+        submissions = []
+
+        def next_turn(pages):
+            """Before each submission after the first: lets jobs the queue prefers print, then carries on."""
+            if submissions and dispatcher.yield_turn(printer_key_for(job_data), turn_seconds(job_data, pages)):
+                print(f"⏯️  Job {job_id} carries on after other jobs took a turn.")
+            submissions.append(pages)
+
+        prepared_files = iter(pipeline)
+        file_timings = []
+        job_stages = {}
+        for indexes in groups:
+            group = []
             try:
-                original_file_name = file_info.get('originalFileName', f'file_{i+1}')
-                is_image = file_info.get('isImageFile', False)
-                print(f"\n📄 Processing file {i+1}/{len(files_to_process)}: {original_file_name}")
-
-                drive_file_id = file_info.get('googleDriveFileId')
-                if not drive_file_id: raise Exception(f"Missing Google Drive ID for file '{original_file_name}'.")
-
-                local_path = os.path.join(TEMP_DIR, f"{job_id}_{i}_{original_file_name}")
-                file_specific_temp_files.append(local_path)
-                download_file_from_drive(drive_file_id, local_path)
-                
-                final_pdf_for_this_file = None
-                desired_orientation = file_info.get('orientation', 'portrait')
-                copies = file_info.get('copies', 1)
-                
-                if is_image:
-                    layout_info = file_info.get('imageLayout')
-                    layout_type = layout_info.get('type', 'full-page') if layout_info else 'full-page'
-                    
-                    if layout_type == 'full-page':
-                        # For full-page, just convert the single image to a PDF. The copies will be handled by the print command.
-                        converted_pdf = convert_to_pdf(local_path, word_app=word)
-                        if converted_pdf != local_path: file_specific_temp_files.append(converted_pdf)
-                        final_pdf_for_this_file = converted_pdf
-                    else:
-                        # For collages, create a PDF with the specified number of image copies laid out on pages.
-                        collage_pdf_path = os.path.join(TEMP_DIR, f"{job_id}_collage_{i}.pdf")
-                        file_specific_temp_files.append(collage_pdf_path)
-                        
-                        create_image_layout_pdf(
-                            image_path=local_path,
-                            copies=copies,
-                            layout_info=layout_info,
-                            print_type=file_info.get('printType'),
-                            orientation=desired_orientation,
-                            output_pdf_path=collage_pdf_path
-                        )
-                        final_pdf_for_this_file = collage_pdf_path
-                        # For collages, the PDF itself contains all copies, so the printer should only print it once.
-                        copies = 1 
-                else: # Document file
-                    converted_pdf_path = convert_to_pdf(local_path, word_app=word)
-                    if converted_pdf_path != local_path: file_specific_temp_files.append(converted_pdf_path)
-
-                    rotated_pdf_path_for_doc = converted_pdf_path
-                    # --- Orientation and Rotation Logic for Documents ---
-                    print(f"   Desired orientation: {desired_orientation}")
-                    reader = PdfReader(converted_pdf_path)
-                    if len(reader.pages) > 0:
-                        first_page = reader.pages[0]
-                        media_box = first_page.mediabox
-                        
-                        source_is_portrait = media_box.height > media_box.width
-                        source_orientation = 'portrait' if source_is_portrait else 'landscape'
-                        print(f"   Detected source orientation: {source_orientation}")
-
-                        if source_orientation != desired_orientation:
-                            print(f"   🔄 Rotating from {source_orientation} to {desired_orientation}...")
-                            rotated_pdf_path = os.path.join(TEMP_DIR, f"{job_id}_{i}_rotated.pdf")
-                            file_specific_temp_files.append(rotated_pdf_path)
-                            writer = PdfWriter()
-                            for page in reader.pages:
-                                page.rotate(90)
-                                writer.add_page(page)
-                            
-                            with open(rotated_pdf_path, 'wb') as f_out:
-                                writer.write(f_out)
-                            
-                            rotated_pdf_path_for_doc = rotated_pdf_path
-                            print(f"   ✅ Created rotated PDF: {os.path.basename(rotated_pdf_path)}")
-                    
-                    # Apply page range selection
-                    page_range_str = file_info.get('pageRange', 'all')
-                    if page_range_str and page_range_str.lower() != 'all':
-                        subset_pdf_path = os.path.join(TEMP_DIR, f"{job_id}_{i}_subset.pdf")
-                        file_specific_temp_files.append(subset_pdf_path)
-                        
-                        with open(rotated_pdf_path_for_doc, 'rb') as f_in:
-                            reader = PdfReader(f_in)
-                            writer = PdfWriter()
-                            pages_to_include = parse_page_range(page_range_str, len(reader.pages))
-                            for page_index in pages_to_include:
-                                writer.add_page(reader.pages[page_index])
-                            
-                            with open(subset_pdf_path, 'wb') as f_out:
-                                writer.write(f_out)
-                        
-                        final_pdf_for_this_file = subset_pdf_path
-                        print(f"   Applied page range '{page_range_str}', created subset PDF.")
-                    else:
-                        final_pdf_for_this_file = rotated_pdf_path_for_doc
-
-                print_file(
-                    printer_name=job_data.get('name'),
-                    file_path=final_pdf_for_this_file,
-                    job_id=f"{job_id}-{i+1}",
-                    copies=copies,
-                    duplex_mode=file_info.get('duplex', 'one-sided'),
-                    orientation=desired_orientation,
-                    paper_size=file_info.get('paperSize', 'A4')
-                )
-            
+                for index in indexes:
+                    group.append(cover if index == -1 else next(prepared_files))
+                print("\n📄 Printing " + ", ".join("cover page" if prepared is cover else f"file {prepared.index+1}/{len(files_to_process)}: {prepared.name}"
+                                                for prepared in group))
+                group_stages = {}
+                spool_seconds = spool_files(job_id, job_data.get('printerId'), printer_name, group, group_stages, progress,
+                                            SPOOL_CHUNK_PAGES if interleave else 0, next_turn if interleave else None)
+                file_types = {prepared.file_type for prepared in group}
+                observe_stages(group_stages, printer_name, file_types.pop() if len(file_types) == 1 else 'mixed')
+                for stage, seconds in group_stages.items():
+                    job_stages[stage] = job_stages.get(stage, 0.0) + seconds
+                for prepared in group:
+                    observe_stages(prepared.stages, printer_name, prepared.file_type)
+                    for stage, seconds in prepared.stages.items():
+                        job_stages[stage] = job_stages.get(stage, 0.0) + seconds
+                    if prepared is cover:
+                        print("✅ Cover page sent to printer.")
+                        continue
+                    # A merged submission's time is shared between its files
+                    prepared.timings['spool'] = spool_seconds / len(group)
+                    file_timings.append({**file_features(prepared.file_info), **{k: round(v, 3) for k, v in prepared.timings.items()}})
             finally:
-                # Clean up temporary files for this specific file
-                for f in file_specific_temp_files:
-                    if os.path.exists(f):
-                        try: os.remove(f)
-                        except Exception as e: print(f"Could not remove temp file {f}: {e}")
+                # Clean up temporary files for these files
+                for prepared in group:
+                    prepared.cleanup()
 
         # Decide final status based on whether it was a reprint
         is_reprint = job_data.get('isReprint', False)
         final_status = 'reprint-completed' if is_reprint else 'completed'
 
-        job_ref.update({'status': final_status, 'printedAt': firestore.SERVER_TIMESTAMP})
+        journal.job_spooled(job_id, final_status)
+        if job_id in job_queue_waits:
+            job_stages['queue_wait'] = job_queue_waits[job_id]
+        finish_job(job_id, {**completed_fields(final_status, progress.to_dict()),
+                            **timing_summary(job_stages, time.monotonic() - job_started_at)})
         print(f"🎉 All files for job {job_id} have been processed. Final status: {final_status}.")
+        if not resumed and not progress.selection: # Timings of a partial run would mislead the model
+            record_job_timing(job_data, file_timings, time.monotonic() - job_started_at)
 
+    except LeaseLost as e:
+        final_status = 'lost'
+        give_up_job(job_id, e)
     except Exception as e:
-        print(f"❌ Job {job_id} failed: {e}")
-        job_ref.update({'status': 'error', 'error_message': str(e)})
+        if journal.state(job_id) in ('queued', 'running'):
+            fail_job(job_id, e)
+        else: # Every file printed and the final status is already queued
+            print(f"⚠️ Error after job {job_id} finished printing: {e}")
     finally:
-        if word:
-            word.Quit()
-        for f in temp_files_to_clean:
-            if os.path.exists(f):
-                try: os.remove(f)
-                except Exception as e: print(f"Could not remove temp file {f}: {e}")
+        if pipeline:
+            pipeline.close()
+        if cover:
+            cover.cleanup()
+        job_queue_waits.pop(job_id, None)
+        job_seconds.observe(time.monotonic() - job_started_at, kind='print', printer=printer_name or '', status=final_status)
             
-        processed_jobs.discard(job_id)
-        pythoncom.CoUninitialize() # Uninitialize COM for this thread
+        job_leases.release(job_id)
+        printer_queues.job_finished(job_id)
+        job_routes.pop(job_id, None)
 
 
 def create_test_page_file(job_id, printer_name):
@@ -627,106 +1078,379 @@ def create_test_page_file(job_id, printer_name):
 
 def process_test_job(job_id, job_data):
     print(f"\n--- Processing test job {job_id} ---")
-    job_ref = db.collection('print_jobs').document(job_id)
-    local_file_path, pdf_path, word = None, None, None
+    local_file_path, pdf_path = None, None
+    printer_name = job_data.get('name')
+    stages = {}
+    started = time.monotonic()
+    final_status = 'error'
+    if not acquire_job_lease(job_id, 'ready'):
+        job_queue_waits.pop(job_id, None)
+        return
     try:
-        pythoncom.CoInitialize() # Initialize COM for this thread
-        job_ref.update({'status': 'printing'})
-        printer_name = job_data.get('name')
+        printer_queues.job_started(job_id, job_data)
+        journal.job_started(job_id, job_data.get('printerId'), job_data.get('name'))
+        update_job(job_id, {'status': 'printing'})
         local_file_path = create_test_page_file(job_id, printer_name)
-        
-        word = win32com.client.Dispatch("Word.Application")
-        word.Visible = False
-
-        pdf_path = convert_to_pdf(local_file_path, word_app=word)
-        print_file(
-            printer_name=printer_name, 
-            file_path=pdf_path, 
-            job_id=job_id, 
-            copies=1, 
-            duplex_mode='one-sided', 
-            orientation='portrait', 
-            paper_size='A4'
-        )
-        job_ref.update({'status': 'completed', 'printedAt': firestore.SERVER_TIMESTAMP})
+
+        with stage_timer(stages, 'convert'):
+            pdf_path = convert_to_pdf(local_file_path, converter=converter_pool)
+        with stage_timer(stages, 'spool'):
+            print_file(
+                printer_name=printer_name, 
+                file_path=pdf_path, 
+                job_id=job_id, 
+                copies=1, 
+                duplex_mode='one-sided', 
+                orientation='portrait', 
+                paper_size='A4'
+            )
+        final_status = 'completed'
+        if job_id in job_queue_waits:
+            stages['queue_wait'] = job_queue_waits[job_id]
+        finish_job(job_id, {'status': final_status, 'printedAt': firestore.SERVER_TIMESTAMP, **timing_summary(stages, time.monotonic() - started)})
     except Exception as e:
-         print(f"❌ Test Job {job_id} failed: {e}")
-         job_ref.update({'status': 'error', 'error_message': str(e)})
+        fail_job(job_id, e)
     finally:
-        if word: word.Quit()
         if local_file_path and os.path.exists(local_file_path): os.remove(local_file_path)
         if pdf_path and pdf_path != local_file_path and os.path.exists(pdf_path): os.remove(pdf_path)
-        processed_jobs.discard(job_id)
-        pythoncom.CoUninitialize() # Uninitialize COM for this thread
+        job_leases.release(job_id)
+        printer_queues.job_finished(job_id)
+        job_queue_waits.pop(job_id, None)
+        observe_stages({stage: seconds for stage, seconds in stages.items() if stage != 'queue_wait'}, printer_name, 'test-page')
+        job_seconds.observe(time.monotonic() - started, kind='test-page', printer=printer_name or '', status=final_status)
+
+JOB_PROCESSORS = {'print': process_print_job, 'test-page': process_test_job, 'page-count': process_page_count_request}
+JOB_FOUND_MESSAGES = {'print': "🔔 Found new print order", 'test-page': "🔔 Found new test print job", 'page-count': "🔔 Found new page count request"}
 
 
 # === FIRESTORE LISTENER ===
+def printer_key_for(job_data):
+    return job_data.get('printerId') or job_data.get('name')
+
+def expected_job_seconds(job_data):
+    return wait_time_estimator.predict(job_data.get('printerId'), job_features(job_data))
+
+def share_key_for(job_id, job_data):
+    """Whom a job counts against for fair share."""
+    if FAIR_SHARE == 'order':
+        return job_data.get('orderId') or job_id
+    return job_data.get('username') or job_data.get('phoneNumber') or job_id
+
+def can_interleave(job_data):
+    """Whether other jobs may print between this job's submissions; a bound order must come out in one piece."""
+    return bool(SPOOL_CHUNK_PAGES) and job_data.get('binding') not in ('spiral', 'soft')
+
+def turn_seconds(job_data, pages):
+    """Expected seconds the job holds the printer for its next `pages` pages, which fair share charges per turn."""
+    total_pages = sum(features['pages'] for features in job_features(job_data)) or 1
+    return expected_job_seconds(job_data) * min(pages / total_pages, 1.0)
+
+def first_turn_seconds(job_data):
+    return turn_seconds(job_data, SPOOL_CHUNK_PAGES) if can_interleave(job_data) else None
+
+def with_route(job_id, job_data):
+    """The job as the router assigned it, which may differ from the printer still on the document."""
+    assignment = job_routes.get(job_id)
+    return {**job_data, **assignment} if assignment else job_data
+
+def route_job(job_id, job_data):
+    """Picks the printer for a print order. Reprints stay on the printer the admin chose unless it stalls."""
+    route = printer_router.route(job_id, job_data, allow_rebalance=not job_data.get('isReprint'))
+    if route and route.moved:
+        print(f"🔀 Routing job {job_id} to {route.name} ({route.reason})")
+        job_routes[job_id] = {
+            'printerId': route.printer_id,
+            'name': route.name,
+            'routing': {'from': route.routed_from, 'reason': route.reason},
+        }
+        job_data = with_route(job_id, job_data)
+        printer_queues.job_ready(job_id, job_data)
+    return job_data
+
+def job_kind(status, order_type):
+    """Which processor handles a job document in this state, as a JOB_PROCESSORS key, or None."""
+    if status == 'page-count-request':
+        return 'page-count'
+    if status == 'ready' and order_type in ('print', 'test-page'):
+        return order_type
+    return None
+
+def dispatch_job(job_id, job_data, processor, enqueued_at=None, resume=False):
+    """
+    Hands a job claimed in the journal to the dispatcher. A resumed job stays
+    on the printer it started on.
+    """
+    if processor is process_print_job and not resume:
+        job_data = route_job(job_id, job_data)
+    if processor is not process_page_count_request and not printer_key_for(job_data):
+        print(f"ℹ️ No printer here can take job {job_id}, leaving it to other connectors.")
+        journal.release(job_id) # The sweep offers it again, in case a printer turns up
+        return
+    if processor is process_page_count_request:
+        queued = dispatcher.submit_page_count(job_id, processor, job_id, job_data)
+    else:
+        queued = dispatcher.submit_print(printer_key_for(job_data), job_id, processor, job_id, job_data,
+                                         expected_seconds=expected_job_seconds(job_data), enqueued_at=enqueued_at,
+                                         share_key=share_key_for(job_id, job_data), turn_seconds=first_turn_seconds(job_data))
+    if not queued:
+        print(f"⏳ Queue is full, job {job_id} will start when a worker frees up.")
+
 def on_new_job_snapshot(doc_snapshot, changes, read_time):
     for change in changes:
-        if change.type.name in ("ADDED", "MODIFIED"):
-            job_id, job_data = change.document.id, change.document.to_dict()
+        if change.type.name == "REMOVED":
+            printer_queues.job_removed(change.document.id)
+        elif change.type.name in ("ADDED", "MODIFIED"):
+            job_id = change.document.id
+            job_data = with_route(job_id, change.document.to_dict())
             status, order_type = job_data.get('status'), job_data.get('orderType')
 
-            if job_id in processed_jobs: continue
-
             if status == 'ready':
-                processed_jobs.add(job_id)
-                if order_type == 'print':
-                    print(f"🔔 Found new print order: {job_id}")
-                    threading.Thread(target=process_print_job, args=(job_id, job_data), daemon=True).start()
-                elif order_type == 'test-page':
-                    print(f"🔔 Found new test print job: {job_id}")
-                    threading.Thread(target=process_test_job, args=(job_id, job_data), daemon=True).start()
-            elif status == 'page-count-request':
-                processed_jobs.add(job_id)
-                print(f"🔔 Found new page count request: {job_id}")
-                threading.Thread(target=process_page_count_request, args=(job_id, job_data), daemon=True).start()
+                printer_queues.job_ready(job_id, job_data)
+            else:
+                printer_queues.job_removed(job_id)
+
+            if journal.is_active(job_id):
+                if status == 'ready' and change.type.name == "MODIFIED":
+                    # Files changed while the job waits: move it within its printer's queue
+                    dispatcher.reprioritize(job_id, expected_job_seconds(job_data), job_id, job_data,
+                                            turn_seconds=first_turn_seconds(job_data))
+                continue
+
+            # Claimed once per cycle of the document, also across restarts
+            kind = job_kind(status, order_type)
+            if kind and journal.claim(job_id, kind, document_version(change.document)):
+                print(f"{JOB_FOUND_MESSAGES[kind]}: {job_id}")
+                dispatch_job(job_id, job_data, JOB_PROCESSORS[kind])
+
+def start_printers_listener():
+    try:
+        return db.collection('printers').on_snapshot(on_printers_snapshot)
+    except Exception as e:
+        print(f"⚠️ Firestore printers listener error: {e}")
+        return None
+
+def printer_id_chunks():
+    """This connector's printer IDs in groups small enough for an 'in' filter."""
+    printer_ids = sorted(printer_status.printers)
+    return [printer_ids[i:i + 30] for i in range(0, len(printer_ids), 30)]
+
+def printer_filters():
+    """
+    Filters for the jobs this connector may print: those on its printers, and
+    those with `printerId: null`, which the router places on one of its
+    printers. Every connector sees the latter; the lease decides who prints them.
+    """
+    return ([firestore.FieldFilter('printerId', 'in', printer_ids) for printer_ids in printer_id_chunks()]
+            + [firestore.FieldFilter('printerId', '==', None)])
 
 def start_job_listener():
+    """
+    Listens for ready jobs on the printers installed here or on no printer
+    yet, and for page count requests, which any connector can answer.
+    Returns the watches, or an empty list if the listener could not start.
+    """
+    jobs = db.collection('print_jobs')
     try:
-        query = db.collection('print_jobs').where(filter=firestore.FieldFilter('status', 'in', ['ready', 'page-count-request']))
-        return query.on_snapshot(on_new_job_snapshot)
+        queries = [jobs.where(filter=firestore.FieldFilter('status', '==', 'page-count-request'))]
+        for printer_filter in printer_filters():
+            queries.append(jobs.where(filter=firestore.FieldFilter('status', '==', 'ready')).where(filter=printer_filter))
+        return [query.on_snapshot(on_new_job_snapshot) for query in queries]
     except Exception as e:
         print(f"⚠️ Firestore listener error: {e}")
-        return None
+        return []
+
+def restart_job_listener():
+    """Follows the printers installed here after one was added or removed."""
+    global job_watches
+    for watch in job_watches:
+        watch.unsubscribe()
+    job_watches = start_job_listener()
+
+# === CONNECTOR ===
+class ConnectorError(Exception):
+    pass
+
+class Connector:
+    """
+    Brings the connector's services, workers and listeners up in start() and
+    down in stop(), filling in the module globals the job processors use.
+    Anything passed in is used as is instead of being created, which is how
+    the benchmarks run the connector against fakes. With listen=False the
+    installed printers are not looked up and no Firestore listeners or metrics
+    endpoint are started; the caller sets up printer_router and hands jobs to
+    on_new_job_snapshot() itself.
+    """
+
+    def __init__(self, db=None, drive_store=None, print_backend=None, converter_factory=None, listen=True):
+        self.db = db
+        self.drive_store = drive_store
+        self.print_backend = print_backend
+        self.converter_factory = converter_factory
+        self.listen = listen
+        self._resources = contextlib.ExitStack() # What stop() releases, in reverse order of creation
+
+    def start(self):
+        """Starts everything, timing each phase into startup_seconds. Raises ConnectorError after undoing a failed start."""
+        global db, dispatcher, converter_pool, artifact_cache, drive_store, prefetcher, printer_status, printer_router, journal, status_outbox
+        global job_leases, job_watches, cpu_pool, print_backend, metrics_server
+        started = time.monotonic()
+        shutdown_event.clear()
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        try:
+            with stage_timer(startup_seconds, 'print_backend'):
+                print_backend = self.print_backend or PRINT_BACKENDS[PRINT_BACKEND](timeout=PRINT_TIMEOUT, timeout_per_mb=PRINT_TIMEOUT_PER_MB)
+                print_backend.open()
+            self._resources.callback(print_backend.close)
+            print(f"🖨️  Printing with the '{print_backend.name}' backend.")
+
+            with stage_timer(startup_seconds, 'firestore'):
+                try:
+                    db = self.db or firestore_client()
+                except Exception as e:
+                    raise ConnectorError(f"Error initializing Firebase: {e}") from e
+            with stage_timer(startup_seconds, 'drive'):
+                drive_store = self.drive_store or drive_file_store()
+
+            printer_status = PrinterStatusPublisher(
+                db, printer_queues, estimate_wait_time, firestore.SERVER_TIMESTAMP,
+                heartbeat_interval=PRINTER_HEARTBEAT_INTERVAL,
+                capabilities=DEFAULT_PRINTER_CAPABILITIES,
+                connector_id=CONNECTOR_ID,
+            )
+            printer_queues.on_change = printer_status.mark_dirty
+            printer_router = PrinterRouter(printer_load, min_saving=ROUTE_ON_LOAD_MIN_SAVING)
+            wait_time_estimator.load(WAIT_TIME_MODEL_FILE)
+            if self.listen:
+                with stage_timer(startup_seconds, 'printers'):
+                    update_printers_in_firestore()
+                    printer_status.flush()
+
+            with stage_timer(startup_seconds, 'journal'):
+                journal = JobJournal(JOURNAL_FILE)
+                self._resources.callback(journal.close)
+                status_outbox = StatusOutbox(db, STATUS_OUTBOX_FILE, firestore.SERVER_TIMESTAMP, max_backoff=STATUS_OUTBOX_MAX_BACKOFF)
+                self._resources.callback(status_outbox.close)
+                job_leases = JobLeases(db, CONNECTOR_ID, firestore.transactional, lease_seconds=JOB_LEASE_SECONDS)
+                job_leases.start()
+                self._resources.callback(job_leases.stop)
+            print(f"🪪 Connector ID: {CONNECTOR_ID}")
+
+            with stage_timer(startup_seconds, 'caches'):
+                artifact_cache = ArtifactCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES)
+            print(f"🗃️  Artifact cache: {len(artifact_cache)} entries, {artifact_cache.total_bytes // (1024 * 1024)} MB.")
+
+            converter_factory = self.converter_factory or CONVERTER_BACKENDS[CONVERTER_BACKEND]
+            print(f"🔧 Starting {CONVERTER_POOL_SIZE} '{getattr(converter_factory, 'name', 'custom')}' document converter(s)...")
+            with stage_timer(startup_seconds, 'converters'):
+                converter_pool = ConverterPool(
+                    converter_factory,
+                    size=CONVERTER_POOL_SIZE,
+                    max_conversions=CONVERTER_MAX_CONVERSIONS,
+                    timeout=CONVERTER_TIMEOUT,
+                )
+            self._resources.callback(converter_pool.close)
+            cpu_pool = CpuPool(CPU_WORKERS, max_tasks_per_worker=CPU_WORKER_MAX_TASKS)
+            self._resources.callback(cpu_pool.close)
+            if CPU_WORKERS:
+                print(f"🔧 Starting {CPU_WORKERS} CPU worker process(es)...")
+                with stage_timer(startup_seconds, 'cpu_workers'):
+                    cpu_pool.start()
+            prefetcher = Prefetcher(workers=1, max_age=PREFETCH_MAX_AGE, discard=PreparedFile.cleanup)
+            self._resources.callback(prefetcher.stop)
+            dispatcher = JobDispatcher(
+                workers_per_printer=WORKERS_PER_PRINTER,
+                page_count_workers=PAGE_COUNT_WORKERS,
+                max_queue_per_printer=MAX_QUEUED_JOBS_PER_PRINTER,
+                policy=SCHEDULING_POLICY,
+                aging_rate=SCHEDULER_AGING_RATE,
+                on_start=on_job_start,
+                fair_share_quantum=FAIR_SHARE_QUANTUM if FAIR_SHARE else None,
+            )
+            self._resources.callback(dispatcher.stop, timeout=5)
+            self._resources.callback(shutdown_event.set) # Runs before dispatcher.stop
+
+            with stage_timer(startup_seconds, 'recovery'):
+                status_outbox.flush(timeout=10) # Interrupted jobs are recovered from their documents, so send what the last run owed first
+                recover_unfinished_jobs()
+
+            if self.listen and METRICS_PORT:
+                try:
+                    metrics_server = MetricsServer(metrics, METRICS_PORT)
+                    self._resources.callback(metrics_server.close)
+                    print(f"📈 Metrics at {metrics_server.url}")
+                except OSError as e:
+                    print(f"⚠️ Could not start the metrics endpoint on port {METRICS_PORT}: {e}")
+
+            if self.listen:
+                with stage_timer(startup_seconds, 'listeners'):
+                    printers_watch = start_printers_listener()
+                    if printers_watch:
+                        self._resources.callback(printers_watch.unsubscribe)
+                    print("👂 Listening for jobs...")
+                    job_watches = start_job_listener()
+                    self._resources.callback(self._stop_job_listeners)
+                    if not job_watches:
+                        raise ConnectorError("Listener failed to start. Exiting.")
+        except PrintError as e:
+            self.stop()
+            raise ConnectorError(str(e)) from e
+        except BaseException:
+            self.stop()
+            raise
+        startup_seconds['total'] = time.monotonic() - started
+        phases = ', '.join(f"{phase} {seconds:.1f}s" for phase, seconds in startup_seconds.items() if phase != 'total')
+        print(f"🚀 Started in {startup_seconds['total']:.1f}s ({phases}).")
+
+    def _stop_job_listeners(self):
+        global job_watches
+        for watch in job_watches:
+            watch.unsubscribe()
+        job_watches = []
+
+    def serve(self):
+        """Runs the periodic housekeeping until stop() is called or shutdown_event is set."""
+        last_printer_refresh = last_sweep = time.time()
+        while not shutdown_event.is_set():
+            if time.time() - last_printer_refresh > PRINTER_REFRESH_INTERVAL:
+                update_printers_in_firestore()
+                reroute_from_stalled_printers()
+                journal.prune(JOURNAL_RETENTION)
+                if drive_store: drive_store.cache.purge_expired()
+                last_printer_refresh = time.time()
+            if time.time() - last_sweep > ABANDONED_JOB_SWEEP_INTERVAL:
+                adopt_abandoned_jobs()
+                last_sweep = time.time()
+            dispatcher.retry_deferred()
+            prefetcher.discard_stale()
+            printer_status.flush() # Writes only what changed, plus the heartbeat when due
+            shutdown_event.wait(1)
+
+    def stop(self):
+        """Stops listening, gives running jobs 5 seconds to finish and releases what start() created. Safe to call twice."""
+        self._resources.close()
 
 # === MAIN ===
 def main():
     print("--- PrintEase Local Connector ---")
-    os.makedirs(TEMP_DIR, exist_ok=True)
-
-    try:
-        from PIL import Image
-        import win32com.client
-        from googleapiclient.discovery import build
-    except ImportError as e:
-        print(f"❌ Missing required library: {e.name}. Please run:\npip install Pillow pypiwin32 google-api-python-client PyPDF2")
+    missing = missing_libraries()
+    if missing:
+        print(f"❌ Missing required libraries: {', '.join(missing)}. Please run:\npip install {' '.join(missing)}")
         sys.exit(1)
 
-    update_printers_in_firestore()
-
-    print("👂 Listening for jobs...")
-    job_watch = start_job_listener()
-    if not job_watch:
-        print("❌ Listener failed to start. Exiting.")
+    connector = Connector()
+    try:
+        connector.start()
+    except ConnectorError as e:
+        print(f"❌ {e}")
         sys.exit(1)
-
     try:
         print("✅ Connector running. Press Ctrl+C to exit.")
-        last_printer_refresh = time.time()
-        while not shutdown_event.is_set():
-            if time.time() - last_printer_refresh > PRINTER_REFRESH_INTERVAL:
-                update_printers_in_firestore()
-                last_printer_refresh = time.time()
-            time.sleep(1)
+        connector.serve()
     except KeyboardInterrupt:
         print("\n🛑 Shutting down...")
     finally:
-        if job_watch: job_watch.unsubscribe()
-        shutdown_event.set()
+        connector.stop()
         print("👋 Connector stopped.")
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,189 @@
+"""
+Lightweight metrics for the PrintEase Local Connector.
+
+Stage latencies go into fixed-bucket histograms: recording one costs a
+bisect and two additions under a lock, so the print workers don't notice.
+Percentiles (p50/p95/p99) are estimated from the buckets the same way
+Prometheus' histogram_quantile() does. Queue depths, worker utilization and
+cache hit counts are not recorded on the hot path at all; collectors read
+them from the components that already keep them when the endpoint is scraped.
+
+MetricsServer serves everything in the Prometheus text format on
+http://127.0.0.1:<port>/metrics.
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+# Seconds, from a cache hit to a long Word conversion or print run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 1.5, 2, 3, 4, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300, 600, 1200)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per combination of label values."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def _merged(self, labels):
+        """Bucket counts and sum over every series matching the given label values."""
+        wanted = {self.labelnames.index(name): str(value) for name, value in labels.items()}
+        merged = [0] * (len(self.buckets) + 2)
+        with self._lock:
+            for key, series in self._series.items():
+                if all(key[i] == value for i, value in wanted.items()):
+                    merged = [a + b for a, b in zip(merged, series)]
+        return merged
+
+    def count(self, **labels):
+        return sum(self._merged(labels)[:-1])
+
+    def quantile(self, q, **labels):
+        """Estimates the q-quantile of the matching series, or None if there are none."""
+        merged = self._merged(labels)
+        counts = merged[:-1]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for slot, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if slot == len(self.buckets):
+                    return self.buckets[-1] # Beyond the last bucket; report its bound, as Prometheus does
+                lower = self.buckets[slot - 1] if slot else 0.0
+                return lower + (self.buckets[slot] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def collect(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, values in sorted(series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(round(values[-1], 6))}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """
+    A registry of histograms and collectors. A collector is a function
+    returning (name, type, help, [(labels, value), ...]) tuples; it runs only
+    when the metrics are rendered.
+    """
+
+    def __init__(self):
+        self._histograms = []
+        self._collectors = []
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(name, help_text, labelnames, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.collect())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+@contextlib.contextmanager
+def stage_timer(stages, stage):
+    """Adds the time spent in the `with` block to stages[stage]."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        stages[stage] = stages.get(stage, 0.0) + time.monotonic() - started
+
+
+class MetricsServer:
+    """Serves Metrics.render() at /metrics from a background thread."""
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+        self.httpd = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/metrics"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,235 @@
+"""
+Write-behind status outbox for the PrintEase Local Connector.
+
+Print workers used to write every status change ('printing', 'completed',
+'error', page counts) to Firestore themselves, so a slow or flapping
+connection stalled printing and a failed write was lost. Workers now hand
+their writes to the StatusOutbox and carry on:
+- writes are saved to a small SQLite database before update() returns, so
+  they survive a crash or restart;
+- writes to the same document are merged while they wait, later fields
+  winning, so a burst of updates becomes one write;
+- a background thread commits up to `max_batch` documents per WriteBatch
+  and retries with exponential backoff while Firestore is unreachable;
+- a write that can never succeed (the job document was deleted) is split
+  out of its batch and dropped, so it can't hold up the others.
+
+`on_commit(result)` callbacks run on the outbox thread with the document's
+WriteResult once the write is committed, or None if it was dropped.
+Callbacks are not persisted: after a restart the writes are still sent, but
+nobody is told.
+"""
+import collections
+import json
+import random
+import sqlite3
+import threading
+import time
+
+SENTINEL_MARKER = '__outbox__'
+
+
+def is_permanent(error):
+    """True for errors a retry can't fix, like updating a document that doesn't exist."""
+    return isinstance(error, KeyError) or type(error).__name__ in ('NotFound', 'InvalidArgument')
+
+
+class StatusOutbox:
+    """
+    `server_timestamp` is firestore.SERVER_TIMESTAMP; it is the only value
+    besides plain JSON types that can be written through the outbox.
+    """
+
+    def __init__(self, db, path, server_timestamp=None, max_batch=500, flush_delay=0.2, min_backoff=1.0, max_backoff=60.0):
+        self.db = db
+        self.path = path
+        self.server_timestamp = server_timestamp
+        self.max_batch = max_batch
+        self.flush_delay = flush_delay # seconds to wait for more writes to the same documents
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.commits = 0
+        self.writes = 0 # Document writes sent to Firestore
+        self.updates = 0 # update() calls, before merging
+        self.failures = 0
+        self._store = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._store.execute("PRAGMA journal_mode=WAL")
+        self._store.execute("PRAGMA synchronous=FULL")
+        self._store.execute("CREATE TABLE IF NOT EXISTS outbox (collection TEXT NOT NULL, doc_id TEXT NOT NULL, "
+                            "fields TEXT NOT NULL, PRIMARY KEY (collection, doc_id))")
+        self._pending = collections.OrderedDict() # (collection, doc_id) -> fields, oldest first
+        self._in_flight = {} # (collection, doc_id) -> fields being committed
+        self._callbacks = {} # (collection, doc_id) -> [on_commit]
+        self._cond = threading.Condition()
+        self._closing = False
+        for collection, doc_id, fields in self._store.execute("SELECT collection, doc_id, fields FROM outbox ORDER BY rowid"):
+            self._pending[(collection, doc_id)] = self._decode(fields)
+        if self._pending:
+            print(f"📮 {len(self._pending)} status update(s) from the last run are waiting to be sent.")
+        self._thread = threading.Thread(target=self._run, name='status-outbox', daemon=True)
+        self._thread.start()
+
+    # === ENCODING ===
+    def _encode(self, fields):
+        def default(value):
+            if self.server_timestamp is not None and value is self.server_timestamp:
+                return {SENTINEL_MARKER: 'server_timestamp'}
+            raise TypeError(f"Can't queue a value of type {type(value).__name__}")
+        return json.dumps(fields, default=default)
+
+    def _decode(self, text):
+        def object_hook(value):
+            return self.server_timestamp if value.get(SENTINEL_MARKER) == 'server_timestamp' else value
+        return json.loads(text, object_hook=object_hook)
+
+    def _save(self, key, fields):
+        """Persists what is still owed to a document, or forgets it. Call with the lock held."""
+        if self._store is None:
+            return # Closed; whatever is still saved is sent on the next start
+        if fields:
+            self._store.execute("INSERT OR REPLACE INTO outbox (collection, doc_id, fields) VALUES (?, ?, ?)",
+                                (*key, self._encode(fields)))
+        else:
+            self._store.execute("DELETE FROM outbox WHERE collection = ? AND doc_id = ?", key)
+
+    # === PRODUCERS ===
+    def update(self, collection, doc_id, fields, on_commit=None):
+        """Queues fields to be merged into a document, like DocumentReference.update(). Never waits for the network."""
+        key = (collection, doc_id)
+        with self._cond:
+            merged = {**self._pending.get(key, {}), **fields}
+            self._save(key, {**self._in_flight.get(key, {}), **merged})
+            self._pending[key] = merged
+            if on_commit:
+                self._callbacks.setdefault(key, []).append(on_commit)
+            self.updates += 1
+            self._cond.notify_all()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending) + len(self._in_flight)
+
+    def flush(self, timeout=None):
+        """Waits until everything queued so far is committed or dropped. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def wait_committed(self, collection, doc_id, timeout=None):
+        """Waits until everything queued so far for one document is committed or dropped. Returns False on timeout."""
+        key = (collection, doc_id)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while key in self._pending or key in self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=10):
+        """Sends what it can within `timeout` seconds; the rest stays saved for the next start."""
+        sent = self.flush(timeout)
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            self._store.close()
+            self._store = None
+        if not sent:
+            print(f"📮 {self.pending_count()} status update(s) will be sent on the next start.")
+
+    # === SENDER ===
+    def _take(self):
+        with self._cond:
+            keys = list(self._pending)[:self.max_batch]
+            batch = {key: self._pending.pop(key) for key in keys}
+            callbacks = {key: self._callbacks.pop(key, []) for key in keys}
+            self._in_flight.update(batch)
+            return batch, callbacks
+
+    def _commit(self, writes):
+        """Commits {key: fields} in one WriteBatch and returns {key: WriteResult}."""
+        batch = self.db.batch()
+        keys = list(writes)
+        for key in keys:
+            batch.update(self.db.collection(key[0]).document(key[1]), writes[key])
+        results = batch.commit() or [None] * len(keys)
+        self.commits += 1
+        self.writes += len(keys)
+        return dict(zip(keys, results))
+
+    def _commit_separately(self, writes):
+        """Commits documents one at a time after a batch failed for good, dropping the ones that can't be written."""
+        results = {}
+        for key, fields in writes.items():
+            try:
+                results.update(self._commit({key: fields}))
+            except Exception as e:
+                if not is_permanent(e):
+                    raise
+                print(f"⚠️ Dropping status update for {key[0]}/{key[1]}: {e}")
+                results[key] = None
+        return results
+
+    def _finish(self, batch, callbacks, results):
+        with self._cond:
+            for key in batch:
+                if key not in results:
+                    continue
+                del self._in_flight[key]
+                self._save(key, self._pending.get(key))
+            self._cond.notify_all()
+        for key, result in results.items():
+            for on_commit in callbacks.get(key, []):
+                try:
+                    on_commit(result)
+                except Exception as e:
+                    print(f"⚠️ Status update callback for {key[1]} failed: {e}")
+
+    def _give_back(self, batch, callbacks):
+        """Puts writes that failed back in front of anything queued after them."""
+        with self._cond:
+            for key, fields in batch.items():
+                if key not in self._in_flight:
+                    continue
+                del self._in_flight[key]
+                self._pending[key] = {**fields, **self._pending.get(key, {})}
+                self._pending.move_to_end(key, last=False)
+                self._callbacks[key] = callbacks.get(key, []) + self._callbacks.get(key, [])
+            self._cond.notify_all()
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if self._closing:
+                    return
+            time.sleep(self.flush_delay if not backoff else 0)
+            batch, callbacks = self._take()
+            if not batch:
+                continue
+            try:
+                try:
+                    results = self._commit(batch)
+                except Exception as e:
+                    if not is_permanent(e):
+                        raise
+                    results = self._commit_separately(batch)
+                self._finish(batch, callbacks, results)
+                backoff = 0.0
+            except Exception as e:
+                self.failures += 1
+                self._give_back(batch, callbacks)
+                backoff = min(max(backoff * 2, self.min_backoff), self.max_backoff)
+                print(f"⚠️ Could not send {len(batch)} status update(s), retrying in {backoff:g}s: {e}")
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closing, timeout=backoff * random.uniform(0.8, 1.2))
@@ -0,0 +1,178 @@
+"""
+Fast page counting for page count requests.
+
+Customers wait on this number at checkout, so the common file types are
+counted without starting a converter:
+- PDF: follows startxref to the cross-reference table and reads only the
+  trailer, the document catalog and the root of the page tree.
+- Images: reads the header only; an image prints as one page.
+- .docx: uses the page count Word stored in docProps/app.xml when the file
+  was last saved by Word itself.
+
+fast_page_count() returns None when none of these apply and the caller has
+to convert the document instead.
+"""
+import os
+import re
+import zipfile
+from xml.etree import ElementTree
+
+PDF_TAIL_BYTES = 2048
+PDF_OBJECT_READ_BYTES = 4096
+XREF_ENTRY_BYTES = 20
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff')
+# Applications whose stored page count matches what Word will print
+TRUSTED_DOCX_APPLICATIONS = ('Microsoft Office Word', 'Microsoft Macintosh Word')
+
+_STARTXREF = re.compile(rb'startxref\s+(\d+)')
+_SUBSECTION = re.compile(rb'\s*(\d+)\s+(\d+)\s*?\r?\n')
+_XREF_ENTRY = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+_TRAILER_ROOT = re.compile(rb'/Root\s+(\d+)\s+(\d+)\s+R')
+_TRAILER_PREV = re.compile(rb'/Prev\s+(\d+)')
+_CATALOG_PAGES = re.compile(rb'/Pages\s+(\d+)\s+(\d+)\s+R')
+_PAGES_COUNT = re.compile(rb'/Count\s+(\d+)(\s+\d+\s+R)?') # A trailing 'N G R' makes it a reference
+
+
+class PageCountUnavailable(Exception):
+    pass
+
+
+# === PDF ===
+def _read_xref_section(f, offset):
+    """
+    Reads the subsection headers of one classic xref table and its trailer.
+    Returns ([(first, count, entries_offset)], trailer_bytes). Entries are not read.
+    """
+    f.seek(offset)
+    if f.read(4) != b'xref':
+        # Cross-reference streams (PDF 1.5+) need a real parser
+        raise PageCountUnavailable("PDF uses a cross-reference stream")
+    f.readline()
+    subsections = []
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if line.strip().startswith(b'trailer'):
+            f.seek(position)
+            return subsections, f.read(PDF_OBJECT_READ_BYTES)
+        match = _SUBSECTION.fullmatch(line)
+        if not match:
+            raise PageCountUnavailable("Malformed xref table")
+        first, count = int(match.group(1)), int(match.group(2))
+        subsections.append((first, count, f.tell()))
+        f.seek(f.tell() + count * XREF_ENTRY_BYTES)
+
+
+def _find_object_offset(f, sections, number):
+    """Looks an object up in the xref chain, newest section first, reading one entry."""
+    for subsections in sections:
+        for first, count, entries_offset in subsections:
+            if first <= number < first + count:
+                f.seek(entries_offset + (number - first) * XREF_ENTRY_BYTES)
+                match = _XREF_ENTRY.match(f.read(XREF_ENTRY_BYTES))
+                if not match:
+                    raise PageCountUnavailable("Malformed xref entry")
+                if match.group(3) == b'f':
+                    raise PageCountUnavailable(f"Object {number} is free")
+                return int(match.group(1))
+    raise PageCountUnavailable(f"Object {number} is not in the xref table")
+
+
+def _read_object(f, sections, number, generation):
+    f.seek(_find_object_offset(f, sections, number))
+    data = f.read(PDF_OBJECT_READ_BYTES)
+    header = re.match(rb'\s*%d\s+%d\s+obj' % (number, generation), data)
+    if not header:
+        raise PageCountUnavailable(f"xref offset for object {number} is wrong")
+    return data[header.end():data.find(b'endobj')]
+
+
+def count_pdf_pages(f):
+    """
+    Reads the page count from the /Count of the page tree root, touching only
+    the file tail, a few xref entries and two objects. `f` is a binary file
+    opened for reading. Raises PageCountUnavailable for layouts it cannot read
+    this way, such as cross-reference streams.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - PDF_TAIL_BYTES))
+    matches = list(_STARTXREF.finditer(f.read()))
+    if not matches:
+        raise PageCountUnavailable("No startxref found")
+
+    sections, root = [], None
+    offset, seen = int(matches[-1].group(1)), set()
+    while offset is not None and offset not in seen:
+        seen.add(offset)
+        subsections, trailer = _read_xref_section(f, offset)
+        sections.append(subsections)
+        if root is None:
+            root = _TRAILER_ROOT.search(trailer)
+        prev = _TRAILER_PREV.search(trailer)
+        offset = int(prev.group(1)) if prev else None
+    if root is None:
+        raise PageCountUnavailable("Trailer has no /Root")
+
+    catalog = _read_object(f, sections, int(root.group(1)), int(root.group(2)))
+    pages_ref = _CATALOG_PAGES.search(catalog)
+    if not pages_ref:
+        raise PageCountUnavailable("Catalog has no /Pages")
+    pages = _read_object(f, sections, int(pages_ref.group(1)), int(pages_ref.group(2)))
+    count = _PAGES_COUNT.search(pages)
+    if not count or count.group(2):
+        raise PageCountUnavailable("Page tree root has no direct /Count")
+    return int(count.group(1))
+
+
+def count_pdf_pages_with_reader(f):
+    """Reads /Count through PyPDF2 without loading every page object."""
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfFileReader as PdfReader
+    reader = PdfReader(f, strict=False)
+    return int(reader.trailer['/Root']['/Pages']['/Count'])
+
+
+# === IMAGES ===
+def count_image_pages(path):
+    """An image prints on one page. Only the header is read, to check it is an image."""
+    from PIL import Image
+    with Image.open(path) as image:
+        image.size # Parsed from the header; no pixels are decoded
+    return 1
+
+
+# === WORD ===
+def count_docx_pages(path):
+    """Returns the page count Word stored in docProps/app.xml, or None if it can't be trusted."""
+    try:
+        with zipfile.ZipFile(path) as docx:
+            app_xml = docx.read('docProps/app.xml')
+    except (KeyError, zipfile.BadZipFile):
+        return None
+    properties = {element.tag.rsplit('}', 1)[-1]: (element.text or '').strip() for element in ElementTree.fromstring(app_xml)}
+    application = properties.get('Application', '')
+    pages = properties.get('Pages', '')
+    if not application.startswith(TRUSTED_DOCX_APPLICATIONS) or not pages.isdigit() or int(pages) < 1:
+        return None
+    return int(pages)
+
+
+def fast_page_count(path):
+    """Returns the page count without converting the file, or None if a conversion is needed."""
+    file_ext = os.path.splitext(path)[1].lower()
+    if file_ext == '.pdf':
+        with open(path, 'rb') as f:
+            try:
+                return count_pdf_pages(f)
+            except PageCountUnavailable:
+                f.seek(0)
+                return count_pdf_pages_with_reader(f)
+    if file_ext in IMAGE_EXTENSIONS:
+        return count_image_pages(path)
+    if file_ext == '.docx':
+        return count_docx_pages(path)
+    return None
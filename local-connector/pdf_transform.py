@@ -0,0 +1,144 @@
+"""
+Single-pass PDF transforms for the PrintEase Local Connector.
+
+A page range such as "1-3,5" is kept as a PageSelection of merged intervals,
+so "1-100000" costs the same as "1-3". transform_pdf() then reads the source
+once, applies the per-page operations to the selected pages only and writes
+a single output file.
+"""
+import bisect
+import contextlib
+
+try:
+    from PyPDF2 import PdfReader, PdfWriter
+except ImportError:
+    from PyPDF2 import PdfFileReader as PdfReader, PdfFileWriter as PdfWriter
+
+
+class PageSelection:
+    """Sorted, non-overlapping half-open intervals of 0-indexed page numbers."""
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.intervals = [tuple(interval) for interval in merged]
+        self._starts = [start for start, _ in self.intervals]
+
+    @classmethod
+    def all(cls, page_count):
+        return cls([(0, page_count)])
+
+    def __iter__(self):
+        for start, end in self.intervals:
+            yield from range(start, end)
+
+    def __len__(self):
+        return sum(end - start for start, end in self.intervals)
+
+    def __contains__(self, page_index):
+        n = bisect.bisect_right(self._starts, page_index) - 1
+        return n >= 0 and page_index < self.intervals[n][1]
+
+    def __eq__(self, other):
+        return isinstance(other, PageSelection) and self.intervals == other.intervals
+
+    def __repr__(self):
+        return f"PageSelection({self.intervals})"
+
+    def is_all(self, page_count):
+        return self.intervals == [(0, page_count)] or (page_count == 0 and not self.intervals)
+
+
+def parse_page_range(range_str, max_pages):
+    """Parses a page range string (e.g., '1-3,5,7') into a PageSelection of 0-indexed pages."""
+    if not range_str or range_str.lower() == 'all':
+        return PageSelection.all(max_pages)
+
+    intervals = []
+    for part in range_str.split(','):
+        part = part.strip()
+        if '-' in part:
+            start_str, end_str = (s.strip() for s in part.split('-', 1))
+            if start_str.isdigit() and end_str.isdigit():
+                start, end = max(int(start_str), 1), min(int(end_str), max_pages)
+                intervals.append((start - 1, end))
+        elif part.isdigit():
+            page_num = int(part)
+            if 1 <= page_num <= max_pages:
+                intervals.append((page_num - 1, page_num))
+    return PageSelection(intervals)
+
+
+# === PAGE OPERATIONS ===
+def rotate(degrees):
+    """Page operation that rotates a page clockwise by a multiple of 90 degrees."""
+    def apply(page):
+        page.rotate(degrees)
+    return apply
+
+
+def transform_pdf(input_path, output_path, page_range='all', operations=()):
+    """
+    Writes the selected pages of input_path to output_path, applying each
+    operation (a callable taking a page) to every selected page in order.
+    page_range is a PageSelection or a range string for parse_page_range().
+    Returns the number of pages written.
+    """
+    with open(input_path, 'rb') as f_in:
+        reader = PdfReader(f_in)
+        if not isinstance(page_range, PageSelection):
+            page_range = parse_page_range(page_range, len(reader.pages))
+        writer = PdfWriter()
+        for page_index in page_range:
+            page = reader.pages[page_index]
+            for operation in operations:
+                operation(page)
+            writer.add_page(page)
+        with open(output_path, 'wb') as f_out:
+            writer.write(f_out)
+    return len(page_range)
+
+
+def transform_document(input_path, output_path, page_range='all', rotate_degrees=0):
+    """transform_pdf() with its operations given as plain values, so it can run in a worker process."""
+    return transform_pdf(input_path, output_path, page_range, [rotate(rotate_degrees)] if rotate_degrees else [])
+
+
+def pdf_info(pdf_path):
+    """Page count and first-page orientation of a PDF."""
+    reader = PdfReader(pdf_path)
+    if len(reader.pages) == 0:
+        return {'pageCount': 0, 'orientation': None}
+    media_box = reader.pages[0].mediabox
+    orientation = 'portrait' if media_box.height > media_box.width else 'landscape'
+    return {'pageCount': len(reader.pages), 'orientation': orientation}
+
+
+def merge_pdfs(segments, output_path, duplex=False):
+    """
+    Writes the PDFs in `segments`, a list of (path, copies), one after the
+    other to output_path, each repeated `copies` times. With duplex, a blank
+    page is added after each copy with an odd page count, so every copy
+    starts on a new sheet as it would when spooled on its own. Returns the
+    number of pages written.
+    """
+    with contextlib.ExitStack() as stack:
+        writer = PdfWriter()
+        for path, copies in segments:
+            reader = PdfReader(stack.enter_context(open(path, 'rb'))) # Pages are read when the writer writes
+            pages = list(reader.pages)
+            for _ in range(max(int(copies or 1), 1)):
+                for page in pages:
+                    writer.add_page(page)
+                if duplex and len(pages) % 2:
+                    media_box = pages[-1].mediabox
+                    writer.add_blank_page(float(media_box.width), float(media_box.height))
+        with open(output_path, 'wb') as f_out:
+            writer.write(f_out)
+        return len(writer.pages)
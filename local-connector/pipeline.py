@@ -0,0 +1,221 @@
+"""
+Staged file pipeline for the PrintEase Local Connector.
+
+While the printer is busy with file N of a job, files N+1 and N+2 are
+already being downloaded and converted. Each stage runs on its own thread
+with a small bounded queue in front of the next one, and results come out
+in the job's file order. The Prefetcher does the same across jobs: it
+prepares the first files of the next queued job for a printer before that
+job starts.
+"""
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class _Failure:
+    """Travels down the pipeline in place of an item whose stage raised."""
+
+    def __init__(self, error, item):
+        self.error = error
+        self.item = item
+
+
+class StagedPipeline:
+    """
+    Pushes items through `stages` (functions taking and returning an item),
+    each on its own thread. At most `depth` finished items wait between two
+    stages. Iterate the pipeline to receive items in input order; an item
+    whose stage failed raises that stage's error at its position. `discard`
+    is called for every item the caller never received, so temp files can be
+    cleaned up when a job stops early.
+    """
+
+    def __init__(self, items, stages, depth=2, discard=None):
+        self.items = list(items)
+        self.discard = discard
+        self._stop = threading.Event()
+        self._queues = [queue.Queue(maxsize=depth) for _ in stages]
+        self._threads = []
+        inbox = None
+        for stage, outbox in zip(stages, self._queues):
+            thread = threading.Thread(target=self._run_stage, args=(stage, inbox, outbox), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            inbox = outbox
+
+    def _inputs(self, inbox):
+        if inbox is None:
+            yield from self.items
+            return
+        while True:
+            item = self._get(inbox)
+            if item is _DONE:
+                return
+            yield item
+
+    def _get(self, inbox):
+        while True:
+            try:
+                return inbox.get(timeout=0.2)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _put(self, outbox, item):
+        while not self._stop.is_set():
+            try:
+                outbox.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_stage(self, stage, inbox, outbox):
+        for item in self._inputs(inbox):
+            if not isinstance(item, _Failure):
+                try:
+                    item = stage(item)
+                except Exception as e:
+                    item = _Failure(e, item)
+            if not self._put(outbox, item):
+                self._discard(item)
+                break
+        self._put(outbox, _DONE)
+
+    def _discard(self, item):
+        if isinstance(item, _Failure):
+            item = item.item
+        if self.discard and item is not _DONE:
+            try:
+                self.discard(item)
+            except Exception as e:
+                print(f"⚠️ Could not clean up pipeline item: {e}")
+
+    def __iter__(self):
+        output = self._queues[-1]
+        for _ in self.items:
+            item = self._get(output)
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                self._discard(item)
+                raise item.error
+            yield item
+
+    def close(self):
+        """Stops all stages and discards items that were prepared but not taken."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        for q in self._queues:
+            while True:
+                try:
+                    self._discard(q.get_nowait())
+                except queue.Empty:
+                    break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Prefetch:
+    def __init__(self):
+        self.done = threading.Event()
+        self.started = False
+        self.result = None
+        self.error = None
+        self.created_at = time.monotonic()
+
+
+class Prefetcher:
+    """
+    Prepares items ahead of time on a few background threads. Results are
+    claimed by key; anything left unclaimed for `max_age` seconds (for example
+    because the job was cancelled) is handed to `discard`.
+    """
+
+    def __init__(self, workers=1, max_age=600, discard=None):
+        self.max_age = max_age
+        self.discard = discard
+        self._tasks = queue.Queue()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._run, name=f"prefetch-{n + 1}", daemon=True) for n in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def start(self, key, fn, *args):
+        """Schedules fn(*args) under `key` unless it is already scheduled."""
+        with self._lock:
+            if key in self._entries:
+                return False
+            self._entries[key] = _Prefetch()
+        self._tasks.put((key, fn, args))
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                key, fn, args = self._tasks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None: # Claimed or discarded before it started
+                    continue
+                entry.started = True
+            try:
+                entry.result = fn(*args)
+            except Exception as e:
+                entry.error = e
+            entry.done.set()
+
+    def claim(self, key):
+        """
+        Returns the prefetched result for `key`, waiting if it is still being
+        prepared, or None if nothing usable was prefetched.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or not entry.started:
+            return None
+        entry.done.wait()
+        if entry.error is not None:
+            print(f"⚠️ Prefetch of {key} failed, preparing it again: {entry.error}")
+            return None
+        return entry.result
+
+    def discard_stale(self):
+        """Drops finished results nobody claimed within max_age. Returns how many were dropped."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.done.is_set() and now - entry.created_at > self.max_age]
+            entries = [self._entries.pop(key) for key in stale]
+        for entry in entries:
+            self._discard(entry)
+        return len(entries)
+
+    def _discard(self, entry):
+        if entry.result is not None and self.discard:
+            try:
+                self.discard(entry.result)
+            except Exception as e:
+                print(f"⚠️ Could not clean up prefetched item: {e}")
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            if entry.done.is_set():
+                self._discard(entry)
@@ -0,0 +1,208 @@
+"""
+Print backends for the PrintEase Local Connector.
+
+A backend sends one PDF to a printer with the job's settings. Backends that
+run an external program resolve it once when they are opened and supervise
+every run: a print command that does not finish within its timeout is
+killed and the job fails, instead of blocking its print worker forever.
+
+Backends:
+- SumatraBackend: SumatraPDF's silent printing (Windows).
+- LpBackend: CUPS/IPP through `lp` (Linux and macOS).
+- SimulatedPrinter: prints nothing and takes as long as a printer with a
+  given speed would, for benchmarks and load tests without paper.
+"""
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+from pdf_transform import parse_page_range, pdf_info
+
+
+class PrintError(Exception):
+    pass
+
+
+def run_supervised(command, timeout):
+    """Runs a print command, killing it if it takes longer than `timeout` seconds. Returns its stdout."""
+    print(f"   Executing command: {' '.join(command)}")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise PrintError(f"{os.path.basename(command[0])} did not finish within {timeout:.0f}s and was stopped")
+    if process.returncode != 0:
+        raise PrintError(f"{os.path.basename(command[0])} Error: {stderr.strip() if stderr else 'Unknown error'}")
+    return stdout
+
+
+def spool_timeout(timeout, timeout_per_mb, pdf_path):
+    """A large merged PDF takes longer to spool, so the timeout grows with the file."""
+    return timeout + timeout_per_mb * os.path.getsize(pdf_path) / (1024 * 1024)
+
+
+class PrintBackend:
+    """Sends PDFs to printers. Subclasses implement print_pdf()."""
+
+    name = 'backend'
+
+    def __init__(self, timeout=120, timeout_per_mb=10):
+        self.timeout = timeout
+        self.timeout_per_mb = timeout_per_mb
+
+    def open(self):
+        """Checks the backend can print. Raises PrintError if it can't."""
+
+    def print_pdf(self, printer_name, pdf_path, title, copies=1, duplex_mode='one-sided', orientation='portrait',
+                  paper_size='A4', print_type=None, page_range='all'):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# === SUMATRAPDF ===
+def find_sumatra():
+    """Locate SumatraPDF executable automatically."""
+    possible_paths = [
+        os.path.join(os.environ.get("ProgramFiles", ""), "SumatraPDF", "SumatraPDF.exe"),
+        os.path.join(os.environ.get("ProgramFiles(x86)", ""), "SumatraPDF", "SumatraPDF.exe"),
+        os.path.join(os.environ.get("LOCALAPPDATA", ""), "SumatraPDF", "SumatraPDF.exe"),
+        r"C:\\Users\\DELL\\AppData\\Local\\SumatraPDF\\SumatraPDF.exe",
+    ]
+    for path in possible_paths:
+        if os.path.exists(path): return path
+    return shutil.which("SumatraPDF")
+
+
+class SumatraBackend(PrintBackend):
+    name = 'sumatra'
+
+    def __init__(self, sumatra_path=None, **options):
+        super().__init__(**options)
+        self.sumatra_path = sumatra_path
+
+    def open(self):
+        self.sumatra_path = self.sumatra_path or find_sumatra()
+        if not self.sumatra_path:
+            raise PrintError("SumatraPDF not found. Please install it.")
+
+    def print_pdf(self, printer_name, pdf_path, title, copies=1, duplex_mode='one-sided', orientation='portrait',
+                  paper_size='A4', print_type=None, page_range='all'):
+        settings = [f"{copies}x"]
+
+        # Set duplexing based on the mode provided from Firestore
+        if duplex_mode == 'duplex-long-edge':
+            settings.append("duplex")
+        elif duplex_mode == 'duplex-short-edge':
+            settings.append("duplexshort")
+        else: # 'one-sided' or any other value
+            settings.append("simplex")
+
+        # Always add orientation to prevent manual tray selection
+        settings.append("landscape" if orientation == 'landscape' else "portrait")
+
+        # Always add paper size to ensure correct tray selection
+        settings.append(f"papersize={paper_size}")
+
+        if print_type == 'bw':
+            settings.append("monochrome")
+        elif print_type == 'color':
+            settings.append("color")
+
+        if page_range and page_range.lower() != 'all':
+            settings.append(page_range)
+
+        command = [self.sumatra_path, "-print-to", printer_name, "-silent", "-exit-on-print",
+                   "-print-settings", ",".join(filter(None, settings)), pdf_path]
+        run_supervised(command, spool_timeout(self.timeout, self.timeout_per_mb, pdf_path))
+
+
+# === CUPS ===
+LP_SIDES = {
+    'duplex-long-edge': 'two-sided-long-edge',
+    'duplex-short-edge': 'two-sided-short-edge',
+}
+
+
+class LpBackend(PrintBackend):
+    """Submits straight to the CUPS spooler with `lp`, which also reaches IPP printers added to CUPS."""
+
+    name = 'lp'
+
+    def __init__(self, lp_path=None, **options):
+        super().__init__(**options)
+        self.lp_path = lp_path
+        self.last_request_id = None
+
+    def open(self):
+        self.lp_path = self.lp_path or shutil.which("lp")
+        if not self.lp_path:
+            raise PrintError("lp not found. Please install CUPS.")
+
+    def print_pdf(self, printer_name, pdf_path, title, copies=1, duplex_mode='one-sided', orientation='portrait',
+                  paper_size='A4', print_type=None, page_range='all'):
+        command = [self.lp_path, "-d", printer_name, "-t", title, "-n", str(copies),
+                   "-o", f"sides={LP_SIDES.get(duplex_mode, 'one-sided')}",
+                   "-o", f"orientation-requested={4 if orientation == 'landscape' else 3}",
+                   "-o", f"media={paper_size}"]
+        if print_type in ('bw', 'color'):
+            command += ["-o", f"print-color-mode={'monochrome' if print_type == 'bw' else 'color'}"]
+        if page_range and page_range.lower() != 'all':
+            command += ["-o", f"page-ranges={page_range.replace(' ', '')}"]
+        command.append(pdf_path)
+        stdout = run_supervised(command, spool_timeout(self.timeout, self.timeout_per_mb, pdf_path))
+        match = re.search(r"request id is (\S+)", stdout)
+        self.last_request_id = match.group(1) if match else None
+
+
+# === SIMULATED ===
+class SimulatedPrinter(PrintBackend):
+    """
+    Takes as long as a printer printing `pages_per_minute` pages, after a
+    `warmup_seconds` start for every submission. Each printer name is one
+    device printing one submission at a time, and the call returns when its
+    last page is out. Submissions that would take longer than the timeout
+    fail as a hung print command would.
+    """
+
+    name = 'simulated'
+
+    def __init__(self, pages_per_minute=30, warmup_seconds=5.0, **options):
+        super().__init__(**options)
+        self.seconds_per_page = 60.0 / pages_per_minute
+        self.warmup_seconds = warmup_seconds
+        self.submissions = 0
+        self.pages_printed = 0
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def _device(self, printer_name):
+        with self._lock:
+            return self._devices.setdefault(printer_name, threading.Lock())
+
+    def print_pdf(self, printer_name, pdf_path, title, copies=1, duplex_mode='one-sided', orientation='portrait',
+                  paper_size='A4', print_type=None, page_range='all'):
+        pages = len(parse_page_range(page_range, pdf_info(pdf_path)['pageCount'])) * max(int(copies), 1)
+        seconds = self.warmup_seconds + pages * self.seconds_per_page
+        timeout = spool_timeout(self.timeout, self.timeout_per_mb, pdf_path) if self.timeout else None
+        with self._device(printer_name):
+            if timeout and seconds > timeout:
+                time.sleep(timeout)
+                raise PrintError(f"Simulated printer did not finish within {timeout:.0f}s")
+            time.sleep(seconds)
+        with self._lock:
+            self.submissions += 1
+            self.pages_printed += pages
+
+
+PRINT_BACKENDS = {
+    'sumatra': SumatraBackend,
+    'lp': LpBackend,
+    'simulated': SimulatedPrinter,
+}
@@ -0,0 +1,220 @@
+"""
+Printer status publishing for the PrintEase Local Connector.
+
+Queue lengths used to be recomputed every refresh with one print_jobs query
+and one printer document read per printer, followed by a write whether or
+not anything had changed. Here the connector keeps the queue of every
+printer in memory: PrinterQueues is fed by the job listener's snapshots
+(jobs waiting in 'ready') and by the print workers (jobs being printed).
+PrinterStatusPublisher remembers what it last wrote for each printer and
+sends only the fields that changed, all in one batched commit. The
+'lastSeen' heartbeat is written on its own, slower schedule.
+"""
+import re
+import threading
+import time
+
+
+class PrinterQueues:
+    """Tracks the ready and printing jobs of each printer from events the connector already sees."""
+
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self._ready = {} # job_id -> (printer_id, job_data), from the listener, in arrival order
+        self._printing = {} # job_id -> (printer_id, job_data, started_at), from the print workers
+        self._lock = threading.Lock()
+
+    def _changed(self, printer_ids):
+        if self.on_change:
+            for printer_id in printer_ids:
+                if printer_id: self.on_change(printer_id)
+
+    def job_ready(self, job_id, job_data):
+        printer_id = job_data.get('printerId')
+        with self._lock:
+            if job_id in self._printing:
+                return
+            previous = self._ready.get(job_id, (None, None))[0]
+            self._ready[job_id] = (printer_id, job_data)
+        self._changed({previous, printer_id})
+
+    def job_removed(self, job_id):
+        """The job left the listener's query: it was started, cancelled or deleted."""
+        with self._lock:
+            printer_id = self._ready.pop(job_id, (None, None))[0]
+        self._changed({printer_id})
+
+    def job_started(self, job_id, job_data):
+        printer_id = job_data.get('printerId')
+        with self._lock:
+            previous = self._ready.pop(job_id, (None, None))[0]
+            self._printing[job_id] = (printer_id, job_data, time.monotonic())
+        self._changed({previous, printer_id})
+
+    def job_finished(self, job_id):
+        with self._lock:
+            printer_id = self._printing.pop(job_id, (None,))[0]
+        self._changed({printer_id})
+
+    def jobs(self, printer_id, exclude=None):
+        """(job_data, seconds printing so far or None if waiting) for each job, in print order."""
+        now = time.monotonic()
+        with self._lock:
+            return ([(job_data, now - started_at) for job_id, (p, job_data, started_at) in self._printing.items()
+                     if p == printer_id and job_id != exclude]
+                    + [(job_data, None) for job_id, (p, job_data) in self._ready.items() if p == printer_id and job_id != exclude])
+
+    def length(self, printer_id):
+        return len(self.jobs(printer_id))
+
+
+class PrinterStatusPublisher:
+    """
+    Publishes status, queueLength and estimatedWaitTime for the printers
+    installed on this machine. `estimate_wait(printer_id, jobs)` returns
+    seconds for the jobs listed by PrinterQueues.jobs(). `server_timestamp` is firestore.SERVER_TIMESTAMP.
+
+    With a `connector_id`, the heartbeat also records this connector under
+    the printer document's `connectors` map, in seconds since the epoch, so
+    each connector knows which of its printers others have installed too.
+    """
+
+    def __init__(self, db, queues, estimate_wait, server_timestamp, heartbeat_interval=60, capabilities=(), connector_id=None):
+        self.db = db
+        self.queues = queues
+        self.estimate_wait = estimate_wait
+        self.server_timestamp = server_timestamp
+        self.heartbeat_interval = heartbeat_interval
+        self.capabilities = list(capabilities)
+        self.connector_key = re.sub(r'[^A-Za-z0-9_]', '_', connector_id) if connector_id else None
+        self.writes = 0
+        self.commits = 0
+        self._printers = {} # printer_id -> name, for the printers installed here
+        self._detected = {} # printer_id -> capabilities read from the driver
+        self.configured = {} # printer_id -> capabilities on the printer document, as set by the admin
+        self._published = {} # printer_id -> fields last written
+        self._others = {} # printer_id -> {connector key: last heartbeat} of the other connectors that have it
+        self._dirty = set()
+        self._last_heartbeat = None
+        self._lock = threading.Lock()
+
+    @property
+    def printers(self):
+        with self._lock:
+            return dict(self._printers)
+
+    def mark_dirty(self, printer_id):
+        with self._lock:
+            if printer_id in self._printers:
+                self._dirty.add(printer_id)
+
+    def set_printers(self, printers, capabilities=None):
+        """
+        `printers` maps printer document IDs to printer names, as found on
+        this machine; `capabilities` maps them to what the driver reports,
+        which is written when a printer document is first created.
+        """
+        with self._lock:
+            for printer_id in printers:
+                if printer_id not in self._printers:
+                    self._dirty.add(printer_id)
+            self._printers = dict(printers)
+            self._detected.update(capabilities or {})
+
+    def seen(self, printer_id, data):
+        """Takes note of the other connectors listed on a printer document that was read or changed."""
+        connectors = data.get('connectors')
+        if isinstance(connectors, dict):
+            with self._lock:
+                self._others[printer_id] = {key: when for key, when in connectors.items()
+                                            if key != self.connector_key and isinstance(when, (int, float))}
+
+    def shared(self, printer_id, now=None):
+        """True if another connector sent a heartbeat for the printer in the last three heartbeat intervals."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return any(now - when < 3 * self.heartbeat_interval for when in self._others.get(printer_id, {}).values())
+
+    def _status_for(self, printer_id):
+        jobs = self.queues.jobs(printer_id)
+        return {
+            'status': 'online',
+            'queueLength': len(jobs),
+            'estimatedWaitTime': int(round(self.estimate_wait(printer_id, jobs))),
+        }
+
+    def _load_unknown(self, printer_ids):
+        """Reads the document of each printer not seen since start-up, once. Returns the IDs that don't exist yet."""
+        missing = []
+        for printer_id in printer_ids:
+            snapshot = self.db.collection('printers').document(printer_id).get()
+            if snapshot.exists:
+                data = snapshot.to_dict() or {}
+                if 'capabilities' in data:
+                    self.configured.setdefault(printer_id, data['capabilities'])
+                self.seen(printer_id, data)
+                self._published[printer_id] = {field: data.get(field) for field in ('status', 'queueLength', 'estimatedWaitTime')}
+            else:
+                missing.append(printer_id)
+        return missing
+
+    def flush(self, now=None):
+        """Writes whatever changed since the last flush, plus a heartbeat when one is due, in one commit."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            printers = dict(self._printers)
+        heartbeat_due = self._last_heartbeat is None or now - self._last_heartbeat >= self.heartbeat_interval
+        dirty &= set(printers)
+        if not dirty and not heartbeat_due:
+            return 0
+        heartbeat = {'lastSeen': self.server_timestamp}
+        if self.connector_key:
+            heartbeat[f'connectors.{self.connector_key}'] = time.time()
+
+        try:
+            new_printers = set(self._load_unknown([p for p in dirty if p not in self._published]))
+            batch = self.db.batch()
+            operations = 0
+            published = {}
+            for printer_id in sorted(dirty):
+                fields = self._status_for(printer_id)
+                printer_doc = self.db.collection('printers').document(printer_id)
+                if printer_id in new_printers:
+                    print(f"✨ Found new printer, adding to Firestore: {printers[printer_id]}")
+                    # For new printers, also set the name and initial capabilities
+                    capabilities = list(self._detected.get(printer_id) or self.capabilities)
+                    self.configured[printer_id] = capabilities
+                    document = {'name': printers[printer_id], 'capabilities': capabilities,
+                                'lastSeen': self.server_timestamp, **fields}
+                    if self.connector_key:
+                        document['connectors'] = {self.connector_key: heartbeat[f'connectors.{self.connector_key}']}
+                    batch.set(printer_doc, document)
+                else:
+                    last = self._published.get(printer_id, {})
+                    changes = {field: value for field, value in fields.items() if last.get(field) != value}
+                    if heartbeat_due:
+                        changes.update(heartbeat)
+                    if not changes:
+                        continue
+                    batch.update(printer_doc, changes)
+                operations += 1
+                published[printer_id] = fields
+            if heartbeat_due:
+                for printer_id in sorted(set(printers) - dirty):
+                    batch.update(self.db.collection('printers').document(printer_id), heartbeat)
+                    operations += 1
+            if operations:
+                batch.commit()
+                self.writes += operations
+                self.commits += 1
+        except Exception as e:
+            with self._lock:
+                self._dirty |= dirty # Try again on the next flush
+            print(f"⚠️ Could not update printers in Firestore: {e}")
+            return 0
+
+        self._published.update(published)
+        if heartbeat_due:
+            self._last_heartbeat = now
+        return operations
@@ -0,0 +1,241 @@
+"""
+Resumable, parallel HTTP downloads for the PrintEase Local Connector.
+
+Large files are split into parts that are fetched concurrently with Range
+requests over one pooled session. A part that is cut off by a dropped
+connection or a transient server error resumes from the last byte that was
+written instead of failing the job. The MD5 is computed while the data
+arrives, in file order, so no second pass over a multi-hundred-MB file is
+needed to check it against Drive's md5Checksum.
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PART_SIZE = 8 * 1024 * 1024 # Bytes fetched by one ranged request
+PARALLEL_THRESHOLD = 16 * 1024 * 1024 # Smaller files are fetched as a single stream
+STREAM_CHUNK_SIZE = 256 * 1024
+MAX_RETRIES = 5 # Per part, counted since the last byte received
+RETRY_BACKOFF = 0.5 # seconds, doubled after every failed attempt
+REQUEST_TIMEOUT = (10, 60) # (connect, read) seconds
+
+TRANSIENT_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _TransientError(Exception):
+    pass
+
+
+def make_session(workers, session=None):
+    """Returns a requests session whose connection pool fits `workers` concurrent parts."""
+    session = session or requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class _OrderedHasher:
+    """
+    Feeds parts to the hash in file order as they complete. A part finishing
+    ahead of its predecessors waits (on disk, not in memory) until the prefix
+    before it is done, then is hashed by whichever thread closed the gap.
+    """
+
+    def __init__(self, path, parts):
+        self.path = path
+        self.parts = parts
+        self.done = [False] * len(parts)
+        self.next_part = 0
+        self.md5 = hashlib.md5()
+        self._lock = threading.Lock()
+
+    def part_done(self, n):
+        with self._lock:
+            self.done[n] = True
+            with open(self.path, 'rb') as f:
+                while self.next_part < len(self.parts) and self.done[self.next_part]:
+                    start, end = self.parts[self.next_part]
+                    f.seek(start)
+                    remaining = end - start
+                    while remaining:
+                        chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise DownloadError("Downloaded part is shorter than expected")
+                        self.md5.update(chunk)
+                        remaining -= len(chunk)
+                    self.next_part += 1
+
+    def hexdigest(self):
+        return self.md5.hexdigest()
+
+
+class RangedDownloader:
+    """
+    Downloads `url` with `session` into a local file. Transient failures are
+    retried with backoff, each time resuming at the first missing byte.
+    """
+
+    def __init__(self, session, workers=4, part_size=PART_SIZE, parallel_threshold=PARALLEL_THRESHOLD,
+                 max_retries=MAX_RETRIES, retry_backoff=RETRY_BACKOFF, timeout=REQUEST_TIMEOUT, progress=None):
+        self.session = session
+        self.workers = workers
+        self.part_size = part_size
+        self.parallel_threshold = parallel_threshold
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.progress = progress # Called with (bytes_done, total_bytes)
+        self.retries = 0
+        self._bytes_done = 0
+        self._total = None
+        self._lock = threading.Lock()
+
+    def _report(self, count, total):
+        with self._lock:
+            self._bytes_done += count
+            done = self._bytes_done
+        if self.progress:
+            self.progress(done, total)
+
+    def _get(self, url, start, end=None):
+        """Opens a streaming GET from byte `start`. Returns the response and whether the server honoured the range."""
+        headers = {}
+        if start or end is not None:
+            headers['Range'] = f"bytes={start}-{'' if end is None else end - 1}"
+        response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            response.close()
+            raise _TransientError(f"HTTP {response.status_code}")
+        if response.status_code == 416 and start and end is None:
+            response.close()
+            return None, True # Nothing left to fetch
+        if response.status_code not in (200, 206):
+            response.close()
+            raise DownloadError(f"HTTP {response.status_code} while downloading: {response.text[:200]}")
+        return response, response.status_code == 206
+
+    def _with_retries(self, attempt, position):
+        """
+        Runs attempt() until it returns without a transient error. The retry
+        budget and backoff start over whenever position() shows new bytes arrived.
+        """
+        failures, delay, last_position = 0, self.retry_backoff, position()
+        while True:
+            try:
+                return attempt()
+            except TRANSIENT_ERRORS + (_TransientError,) as e:
+                error = e
+            if position() > last_position:
+                failures, delay, last_position = 0, self.retry_backoff, position()
+            failures += 1
+            with self._lock:
+                self.retries += 1
+            if failures > self.max_retries:
+                raise DownloadError(f"Download failed after {self.max_retries} retries: {error}")
+            print(f"   ⚠️ Download interrupted ({error}), resuming at byte {position()} in {delay:.1f}s...")
+            time.sleep(delay)
+            delay *= 2
+
+    # === SINGLE STREAM ===
+    def _download_stream(self, url, local_path, size):
+        state = {'offset': 0, 'md5': hashlib.md5()}
+
+        with open(local_path, 'wb') as f:
+            def attempt():
+                response, ranged = self._get(url, state['offset'])
+                if response is None:
+                    return
+                with response:
+                    if state['offset'] and not ranged:
+                        # The server ignored the Range header; start over from the first byte
+                        print("   ⚠️ Server does not support resuming, restarting the download...")
+                        f.seek(0)
+                        f.truncate()
+                        state['md5'] = hashlib.md5()
+                        self._report(-state['offset'], size)
+                        state['offset'] = 0
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        f.write(chunk)
+                        state['md5'].update(chunk)
+                        state['offset'] += len(chunk)
+                        self._report(len(chunk), size)
+                if size is not None and state['offset'] < size:
+                    raise _TransientError(f"connection closed at byte {state['offset']} of {size}")
+
+            self._with_retries(attempt, lambda: state['offset'])
+        if size is not None and state['offset'] != size:
+            raise DownloadError(f"Downloaded {state['offset']} bytes, expected {size}")
+        return state['md5'].hexdigest()
+
+    # === PARALLEL PARTS ===
+    def _download_part(self, url, local_path, n, part, hasher):
+        start, end = part
+        state = {'offset': start}
+
+        with open(local_path, 'r+b') as f:
+            def attempt():
+                response, ranged = self._get(url, state['offset'], end)
+                if response is None:
+                    return
+                with response:
+                    if not ranged:
+                        raise DownloadError("Server does not support ranged downloads")
+                    f.seek(state['offset'])
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        chunk = chunk[:end - state['offset']]
+                        f.write(chunk)
+                        state['offset'] += len(chunk)
+                        self._report(len(chunk), self._total)
+                        if state['offset'] >= end:
+                            break
+                if state['offset'] < end:
+                    raise _TransientError(f"connection closed at byte {state['offset']} of part {n + 1}")
+
+            self._with_retries(attempt, lambda: state['offset'])
+        hasher.part_done(n)
+
+    def _download_parallel(self, url, local_path, size):
+        parts = [(start, min(start + self.part_size, size)) for start in range(0, size, self.part_size)]
+        with open(local_path, 'wb') as f:
+            f.truncate(size) # Every part writes into its own slice of the file
+        hasher = _OrderedHasher(local_path, parts)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='download') as executor:
+            futures = [executor.submit(self._download_part, url, local_path, n, part, hasher) for n, part in enumerate(parts)]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return hasher.hexdigest()
+
+    def download(self, url, local_path, size=None, md5=None):
+        """
+        Downloads url to local_path and returns the MD5 hex digest of what was
+        written. `size` enables parallel parts; `md5` is checked when given.
+        """
+        self._bytes_done, self._total = 0, size
+        if size is not None and size >= self.parallel_threshold and self.workers > 1:
+            try:
+                digest = self._download_parallel(url, local_path, size)
+            except DownloadError as e:
+                if "ranged downloads" not in str(e):
+                    raise
+                print("   ⚠️ Server does not support ranged downloads, using a single stream...")
+                self._bytes_done = 0
+                digest = self._download_stream(url, local_path, size)
+        else:
+            digest = self._download_stream(url, local_path, size)
+        if md5 and digest != md5:
+            raise DownloadError(f"Checksum mismatch: expected {md5}, got {digest}")
+        return digest
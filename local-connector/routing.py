@@ -0,0 +1,131 @@
+"""
+Job routing across the printers of one shop for the PrintEase Local Connector.
+
+Orders arrive pinned to the printer the website picked at checkout, which
+knows nothing about a paper jam or a long queue that built up since. The
+PrinterRouter keeps what each printer can do (colors, paper sizes, duplex)
+and whether it is healthy, and picks a printer for a job:
+- a job without a printer goes to the least-loaded compatible printer;
+- a job pinned to a stalled printer (jammed, out of paper, offline, ...)
+  moves to the least-loaded compatible healthy printer;
+- a job pinned to a printer that can't print it (say, A3 on an A4-only
+  printer) moves to one that can;
+- a job pinned to a busy printer moves when a compatible printer would
+  start it at least `min_saving` seconds sooner.
+
+Capabilities use the same words as the website: 'bw', 'color', 'A4'..'A0',
+'duplex' and 'single-sided'.
+"""
+import threading
+
+
+def required_capabilities(job_data):
+    """The capabilities a printer needs to print every file of the job."""
+    required = set()
+    for file_info in job_data.get('files', []):
+        required.add(file_info.get('printType', 'bw'))
+        required.add(file_info.get('paperSize', 'A4'))
+        if file_info.get('duplex', 'one-sided') != 'one-sided':
+            required.add('duplex')
+    return required
+
+
+class Route:
+    def __init__(self, printer_id, name, reason=None, routed_from=None):
+        self.printer_id = printer_id
+        self.name = name
+        self.reason = reason # None when the job stays where it was pinned
+        self.routed_from = routed_from
+
+    @property
+    def moved(self):
+        return self.reason is not None
+
+
+class PrinterRouter:
+    """
+    `load(printer_id, job_id)` returns the seconds until a job queued on that
+    printer now would start, not counting job_id itself, so routing and the
+    published wait times agree.
+    """
+
+    def __init__(self, load, min_saving=120):
+        self.load = load
+        self.min_saving = min_saving
+        self._printers = {} # printer_id -> name
+        self._capabilities = {} # printer_id -> set of capabilities
+        self._problems = {} # printer_id -> why it can't print right now
+        self._lock = threading.Lock()
+
+    def set_printer(self, printer_id, name, capabilities):
+        with self._lock:
+            self._printers[printer_id] = name
+            self._capabilities[printer_id] = set(capabilities)
+
+    def remove_printer(self, printer_id):
+        with self._lock:
+            self._printers.pop(printer_id, None)
+            self._capabilities.pop(printer_id, None)
+            self._problems.pop(printer_id, None)
+
+    def set_health(self, printer_id, problem=None):
+        """Marks a printer stalled with a reason, or healthy again with None. Returns True if that changed."""
+        with self._lock:
+            previous = self._problems.get(printer_id)
+            if problem:
+                self._problems[printer_id] = problem
+            else:
+                self._problems.pop(printer_id, None)
+            return previous != problem
+
+    def problem(self, printer_id):
+        with self._lock:
+            return self._problems.get(printer_id)
+
+    def capabilities(self, printer_id):
+        with self._lock:
+            return set(self._capabilities.get(printer_id, ()))
+
+    def stalled_printers(self):
+        with self._lock:
+            return dict(self._problems)
+
+    def compatible(self, job_id, job_data):
+        """(load, printer_id) of the healthy printers that can print the whole job, least loaded first."""
+        required = required_capabilities(job_data)
+        with self._lock:
+            candidates = [printer_id for printer_id, capabilities in self._capabilities.items()
+                          if required <= capabilities and printer_id not in self._problems]
+        return sorted((self.load(printer_id, job_id), printer_id) for printer_id in candidates)
+
+    def _route_to(self, printer_id, reason, routed_from):
+        with self._lock:
+            name = self._printers[printer_id]
+        return Route(printer_id, name, reason, routed_from)
+
+    def route(self, job_id, job_data, allow_rebalance=True):
+        """
+        Returns the Route for a job, or None when it can't be placed on any
+        printer of this connector (it is then left where it is).
+        """
+        pinned = job_data.get('printerId')
+        with self._lock:
+            known = pinned in self._printers
+            problem = self._problems.get(pinned) if known else None
+            pinned_capabilities = self._capabilities.get(pinned, set())
+        if pinned and not known:
+            return None # Another connector's printer
+
+        candidates = self.compatible(job_id, job_data)
+        if not pinned:
+            return self._route_to(candidates[0][1], 'unassigned', None) if candidates else None
+        if not candidates:
+            return Route(pinned, job_data.get('name'))
+        best_load, best = candidates[0]
+        if not required_capabilities(job_data) <= pinned_capabilities:
+            return self._route_to(best, 'incompatible', pinned)
+        if problem:
+            return self._route_to(best, f"stalled: {problem}", pinned)
+        if allow_rebalance and best != pinned and self.load(pinned, job_id) - best_load >= self.min_saving:
+            return self._route_to(best, 'load', pinned)
+        return Route(pinned, job_data.get('name'))
@@ -0,0 +1,338 @@
+"""
+Job ordering for the PrintEase Local Connector's print queues.
+
+Jobs used to start in the order their snapshot changes arrived, so one
+500-page order held up every 1-page order behind it. The queues here start
+the job with the smallest expected cost first, where a job's cost is its
+expected print time and it ages while it waits:
+
+    priority = expected_seconds - aging_rate * seconds_waited
+
+The aging term grows at the same rate for every waiting job, so ordering by
+expected_seconds / aging_rate + enqueued_at gives the same order and never
+needs recomputing. A large job is overtaken only by jobs that arrive within
+expected_seconds / aging_rate of it, so it cannot starve.
+
+IndexedHeap is a binary heap that also knows where each job sits, so a job
+whose files change while it waits can be re-prioritized in place.
+
+Shortest-first alone lets one customer with ten large orders hold a printer
+for an hour: each of their orders is overtaken only briefly. With fair share
+on, FairShareQueue keeps one IndexedHeap per customer (or order) and picks
+between them by deficit round-robin: every round each customer with waiting
+jobs is credited `quantum` seconds of printing, and their next job starts
+once their credit covers its cost. A job that yields the printer between
+spool submissions (see WorkerPool.yield_turn) is charged per turn rather
+than for the whole job, so large unbound orders share the printer with
+everyone else instead of waiting for enough credit to print in one go.
+"""
+import collections
+import math
+import queue
+import time
+
+SCHEDULING_POLICIES = ('sejf', 'fifo')
+
+
+def priority_key(policy, expected_seconds, enqueued_at, aging_rate):
+    """Sort key for a waiting job; smaller starts first."""
+    if policy == 'fifo' or not aging_rate:
+        return enqueued_at
+    return enqueued_at + expected_seconds / aging_rate
+
+
+class IndexedHeap:
+    """A min-heap of (key, item) by item id with O(log n) push, pop, update and remove."""
+
+    def __init__(self):
+        self._heap = [] # [key, sequence, item_id, item]
+        self._positions = {} # item_id -> index in _heap
+        self._sequence = 0 # Breaks ties in arrival order
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item_id):
+        return item_id in self._positions
+
+    def push(self, item_id, key, item):
+        if item_id in self._positions:
+            raise KeyError(f"{item_id} is already queued")
+        self._sequence += 1
+        self._heap.append([key, self._sequence, item_id, item])
+        self._positions[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def peek(self):
+        """Returns (item_id, key, item) of the smallest key without removing it."""
+        key, _, item_id, item = self._heap[0]
+        return item_id, key, item
+
+    def pop(self):
+        item_id, key, item = self.peek()
+        self._remove_at(0)
+        return item_id, key, item
+
+    def remove(self, item_id):
+        item = self.get(item_id)
+        self._remove_at(self._positions[item_id])
+        return item
+
+    def key(self, item_id):
+        return self._heap[self._positions[item_id]][0]
+
+    def get(self, item_id):
+        return self._heap[self._positions[item_id]][3]
+
+    def update(self, item_id, key=None, item=None):
+        """Changes an entry's key and/or item in place, keeping its place among equal keys."""
+        index = self._positions[item_id]
+        entry = self._heap[index]
+        if item is not None:
+            entry[3] = item
+        if key is not None and key != entry[0]:
+            entry[0] = key
+            self._sift_up(index)
+            self._sift_down(self._positions[item_id])
+
+    def _remove_at(self, index):
+        del self._positions[self._heap[index][2]]
+        last = self._heap.pop()
+        if index < len(self._heap):
+            self._heap[index] = last
+            self._positions[last[2]] = index
+            self._sift_up(index)
+            self._sift_down(self._positions[last[2]])
+
+    def _less(self, a, b):
+        return (self._heap[a][0], self._heap[a][1]) < (self._heap[b][0], self._heap[b][1])
+
+    def _swap(self, a, b):
+        self._heap[a], self._heap[b] = self._heap[b], self._heap[a]
+        self._positions[self._heap[a][2]] = a
+        self._positions[self._heap[b][2]] = b
+
+    def _sift_up(self, index):
+        while index > 0:
+            parent = (index - 1) // 2
+            if not self._less(index, parent):
+                return
+            self._swap(index, parent)
+            index = parent
+
+    def _sift_down(self, index):
+        size = len(self._heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and self._less(child, smallest):
+                    smallest = child
+            if smallest == index:
+                return
+            self._swap(index, smallest)
+            index = smallest
+
+
+class FairShareQueue:
+    """
+    Deficit round-robin over flows, each an IndexedHeap, with the same
+    interface as IndexedHeap. `flow_of(item)` names an item's flow and
+    `cost_of(item)` is what serving it charges that flow's credit.
+    """
+
+    def __init__(self, quantum, flow_of, cost_of):
+        self.quantum = quantum
+        self.flow_of = flow_of
+        self.cost_of = cost_of
+        self._flows = collections.OrderedDict() # flow -> [IndexedHeap, credit], in round-robin order
+        self._flow_of_item = {}
+        self._in_turn = False # Whether the first flow has had its quantum this round and may go on
+
+    def __len__(self):
+        return len(self._flow_of_item)
+
+    def __contains__(self, item_id):
+        return item_id in self._flow_of_item
+
+    def _heap(self, item_id):
+        return self._flows[self._flow_of_item[item_id]][0]
+
+    def flow_length(self, item):
+        """How many items of `item`'s flow are queued."""
+        entry = self._flows.get(self.flow_of(item))
+        return len(entry[0]) if entry else 0
+
+    def push(self, item_id, key, item):
+        if item_id in self._flow_of_item:
+            raise KeyError(f"{item_id} is already queued")
+        flow = self.flow_of(item)
+        if flow not in self._flows:
+            self._flows[flow] = [IndexedHeap(), 0.0] # Joins at the end of the round
+        self._flows[flow][0].push(item_id, key, item)
+        self._flow_of_item[item_id] = flow
+
+    def _select(self):
+        """
+        Returns (order, position, visits): the flows in the order they are
+        visited from now on, which of them is served next and how many
+        visits (quanta) that takes, without changing anything.
+        """
+        flows = list(self._flows.items())
+        first_heap, first_credit = flows[0][1]
+        if self._in_turn and self.cost_of(first_heap.peek()[2]) <= first_credit:
+            return flows, 0, 0
+        order = flows[1:] + flows[:1] if self._in_turn else flows
+        best = None
+        for position, (_, (heap, credit)) in enumerate(order):
+            missing = self.cost_of(heap.peek()[2]) - credit
+            visits = max(math.ceil(missing / self.quantum), 1) if self.quantum > 0 else 1
+            step = (visits - 1) * len(order) + position # Visits before this flow can pay, counting every flow's
+            if best is None or step < best[0]:
+                best = (step, position, visits)
+        return order, best[1], best[2]
+
+    def peek(self):
+        order, position, _ = self._select()
+        return order[position][1][0].peek()
+
+    def pop(self):
+        order, position, visits = self._select()
+        if visits:
+            # Skip whole rounds in which nobody could pay: every flow gets the quanta it would have
+            for n, (_, entry) in enumerate(order):
+                entry[1] += self.quantum * (visits if n <= position else visits - 1)
+            order = order[position:] + order[:position]
+            self._flows = collections.OrderedDict(order)
+            self._in_turn = True
+        flow, entry = order[0]
+        item_id, key, item = entry[0].pop()
+        entry[1] -= self.cost_of(item)
+        del self._flow_of_item[item_id]
+        if not len(entry[0]):
+            del self._flows[flow] # An idle flow keeps no credit
+            self._in_turn = False
+        return item_id, key, item
+
+    def key(self, item_id):
+        return self._heap(item_id).key(item_id)
+
+    def get(self, item_id):
+        return self._heap(item_id).get(item_id)
+
+    def update(self, item_id, key=None, item=None):
+        self._heap(item_id).update(item_id, key, item)
+
+
+class ScheduledTask:
+    """
+    A (job_id, fn, args) task plus what the scheduler needs to order it.
+    `share_key` names the customer or order it counts against for fair
+    share, and `turn_seconds` is how long it holds the printer before it can
+    yield, if less than expected_seconds.
+    """
+
+    def __init__(self, job_id, fn, args, expected_seconds=0.0, enqueued_at=None, share_key=None, turn_seconds=None):
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.expected_seconds = expected_seconds
+        self.enqueued_at = time.monotonic() if enqueued_at is None else enqueued_at
+        self.share_key = share_key
+        self.turn_seconds = turn_seconds
+
+    @property
+    def turn_cost(self):
+        """What fair share charges for starting this task."""
+        return self.expected_seconds if self.turn_seconds is None else self.turn_seconds
+
+    def as_tuple(self):
+        return self.job_id, self.fn, self.args
+
+
+class PriorityTaskQueue(queue.Queue):
+    """
+    A bounded queue.Queue of ScheduledTasks that hands out the task with the
+    lowest priority_key() first instead of the oldest. With a
+    `fair_share_quantum`, tasks are first shared out between their
+    share_keys by deficit round-robin, and ordered by priority_key() within
+    one; maxsize then bounds each share key's tasks rather than all of them.
+    """
+
+    def __init__(self, maxsize=0, policy='sejf', aging_rate=0.1, fair_share_quantum=None):
+        self.policy = policy
+        self.aging_rate = aging_rate
+        self.fair_share_quantum = fair_share_quantum
+        super().__init__(maxsize)
+
+    # queue.Queue calls these with its mutex held
+    def _init(self, maxsize):
+        if self.fair_share_quantum is None:
+            self.queue = IndexedHeap()
+        else:
+            # A task without a share key is a flow of its own
+            self.queue = FairShareQueue(self.fair_share_quantum,
+                                        lambda task: task.share_key if task.share_key is not None else ('job', task.job_id),
+                                        lambda task: task.turn_cost)
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, task):
+        self.queue.push(task.job_id, self._key(task), task)
+
+    def _get(self):
+        return self.queue.pop()[2]
+
+    def _key(self, task):
+        return priority_key(self.policy, task.expected_seconds, task.enqueued_at, self.aging_rate)
+
+    def peek(self):
+        """The task that will be handed out next, or None."""
+        with self.mutex:
+            return self.queue.peek()[2] if len(self.queue) else None
+
+    def offer(self, task):
+        """Queues a task without blocking unless the queue, or its share key's part of it, is full. Returns whether it was queued."""
+        with self.mutex:
+            queued = len(self.queue) if self.fair_share_quantum is None else self.queue.flow_length(task)
+            if 0 < self.maxsize <= queued:
+                return False
+            self._put(task)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+            return True
+
+    def requeue(self, task):
+        """Queues a task even if the queue is full, for a running job that gives up its turn."""
+        with self.mutex:
+            self._put(task)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def withdraw_all(self, keep=None):
+        """Removes and returns every waiting task for which keep(task) is not true, as if each had been taken and finished."""
+        with self.mutex:
+            tasks, kept = [], []
+            while len(self.queue):
+                task = self.queue.pop()[2]
+                (kept if keep and keep(task) else tasks).append(task)
+            for task in kept:
+                self._put(task)
+            self.unfinished_tasks -= len(tasks)
+            if not self.unfinished_tasks:
+                self.all_tasks_done.notify_all()
+            self.not_full.notify_all()
+            return tasks
+
+    def reprioritize(self, job_id, expected_seconds, args=None, turn_seconds=None):
+        """Updates a waiting task's expected cost (and arguments) in place. Returns False if it is not waiting."""
+        with self.mutex:
+            if job_id not in self.queue:
+                return False
+            task = self.queue.get(job_id)
+            task.expected_seconds = expected_seconds
+            if args is not None:
+                task.args = args
+            task.turn_seconds = turn_seconds
+            self.queue.update(job_id, key=self._key(task))
+            return True
@@ -0,0 +1,73 @@
+"""
+Plans how the files of a print job are sent to the printer.
+
+Every spool submission costs a SumatraPDF start, a driver handshake and often
+a warm-up gap on the printer, which for a bound order of small files can take
+longer than the printing itself. Consecutive files (and the cover page) that
+print with the same paper size, duplex mode, orientation and color are sent
+as one merged PDF instead; a new submission starts only where one of those
+settings changes, or where the merged file would exceed `max_pages`.
+
+The opposite happens to a very large document in an unbound order: it is
+sent as several page-range submissions of about `chunk_pages` pages, so
+other customers' jobs can print between them (see plan_spool_chunks).
+"""
+from estimator import file_features
+
+# The cover page of a bound order, as a job file
+COVER_FILE_INFO = {
+    'originalFileName': 'Cover page',
+    'paperSize': 'A4',
+    'orientation': 'portrait',
+    'duplex': 'one-sided',
+    'printType': 'bw',
+}
+
+
+def spool_settings(file_info):
+    """The printer settings a file is spooled with; files can share a submission only if these are equal."""
+    return (
+        file_info.get('paperSize', 'A4'),
+        file_info.get('duplex', 'one-sided'),
+        file_info.get('orientation', 'portrait'),
+        file_info.get('printType'),
+    )
+
+
+def plan_spool_groups(files, max_pages):
+    """
+    Splits `files`, a list of (index, file_info) in printing order, into runs
+    of indexes that are spooled together. Runs never reorder files. With
+    max_pages=0 every file is spooled on its own.
+    """
+    groups = []
+    group_settings, group_pages = None, 0
+    for index, file_info in files:
+        settings = spool_settings(file_info)
+        pages = file_features(file_info)['pages'] # Includes copies and the page range
+        if groups and max_pages and settings == group_settings and group_pages + pages <= max_pages:
+            groups[-1].append(index)
+            group_pages += pages
+        else:
+            groups.append([index])
+            group_settings, group_pages = settings, pages
+    return groups
+
+
+def plan_spool_chunks(pages, copies, chunk_pages, duplex=False):
+    """
+    Splits a document of `pages` pages printed `copies` times into
+    submissions of about `chunk_pages` pages. Returns [(page_range, copies)]
+    in printing order, where '' is the whole document. Copies of a short
+    document are grouped whole; a long one is split into page ranges per
+    copy, so the pages still come out in order and collated. In duplex,
+    ranges start on odd pages so no sheet is split between submissions.
+    """
+    if not chunk_pages or pages * copies <= chunk_pages:
+        return [('', copies)]
+    if pages <= chunk_pages:
+        per_chunk = chunk_pages // pages
+        return [('', min(per_chunk, copies - done)) for done in range(0, copies, per_chunk)]
+    step = max(chunk_pages - chunk_pages % 2, 2) if duplex else chunk_pages
+    ranges = [f"{start}-{min(start + step - 1, pages)}" if start < pages else str(start) for start in range(1, pages + 1, step)]
+    return [(page_range, 1) for _ in range(copies) for page_range in ranges]
@@ -3,7 +3,7 @@
 
 import { collection, addDoc, serverTimestamp, doc, getDoc, setDoc, updateDoc, getDocs, writeBatch, query, orderBy, limit } from "firebase/firestore";
 import { db } from "./config";
-import type { PrintJob, Printer, Pricing, PaperSizes } from "@/lib/types";
+import type { PrintJob, Printer, Pricing, PaperSizes, ReprintSelection } from "@/lib/types";
 import { GoogleAuth } from 'google-auth-library';
 import { google } from 'googleapis';
 import Razorpay from 'razorpay';
@@ -370,7 +370,8 @@ export async function deleteAllPrintJobs(): Promise<{ success: boolean, count?:
     }
 }
 
-export async function reprintJob(jobId: string, newPrinterId: string, newPrinterName: string): Promise<{ success: boolean; message?: string }> {
+// An unfinished job carries on where it stopped; a completed one prints in full, or only `selection` when given
+export async function reprintJob(jobId: string, newPrinterId: string, newPrinterName: string, selection?: ReprintSelection[]): Promise<{ success: boolean; message?: string }> {
     if (!jobId || !newPrinterId || !newPrinterName) {
         return { success: false, message: 'Missing job ID or new printer information.' };
     }
@@ -381,6 +382,7 @@ export async function reprintJob(jobId: string, newPrinterId: string, newPrinter
             printerId: newPrinterId,
             name: newPrinterName,
             isReprint: true,
+            reprintSelection: selection?.length ? selection : null,
             error_message: null, // Clear previous error
         });
         return { success: true };
@@ -24,6 +24,28 @@ export interface FileInJob {
   imageLayout?: ImageLayout;
 }
 
+// A file of a job to reprint, or that may not have printed; `file` counts from 0, pages count as printed
+export interface ReprintSelection {
+  file: number;
+  pageRange?: string;
+  copies?: number | null;
+}
+
+export interface FileProgress {
+  state: 'pending' | 'downloaded' | 'converted' | 'printing' | 'spooled' | 'skipped';
+  parts?: number; // Parts of a large file already sent to the printer
+  chunkPages?: number;
+}
+
+// Written by the local connector while it prints a job
+export interface JobProgress {
+  files: FileProgress[];
+  cover: FileProgress | null;
+  uncertain: ReprintSelection[];
+  selection: ReprintSelection[] | null;
+  complete: boolean;
+}
+
 export interface PrintJob {
   id: string;
   orderType: OrderType;
@@ -40,6 +62,8 @@ export interface PrintJob {
   binding?: 'none' | 'spiral' | 'soft';
   files: FileInJob[];
   isReprint?: boolean;
+  reprintSelection?: ReprintSelection[] | null; // Only these files and pages are printed again
+  progress?: JobProgress;
 
   // Payment fields
   paymentId?: string;